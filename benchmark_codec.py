@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la codificación binaria frente a JSON
+
+Mide operaciones por segundo al codificar y decodificar un delta de
+sincronización (lista de operaciones) en JSON y en el formato binario de
+codec_binario, y los bytes que ocupa cada uno.
+
+Uso:
+    python benchmark_codec.py [--operaciones 100 1000 20000]
+"""
+
+import time
+import argparse
+import logging
+from chat_crdt import ChatCRDT, Operacion
+from codec_binario import codificar_mensaje, decodificar_mensaje
+from protocolo_red import codificar_payload, decodificar_payload
+
+
+def crear_delta(operaciones: int) -> dict:
+    chat = ChatCRDT("alice")
+    for i in range(operaciones):
+        chat.enviar_mensaje(f"Mensaje {i}: hola a todos, ¿cómo va el proyecto?")
+    return {'tipo': 'sync_delta', 'datos': {'tipo_sync': 'operaciones',
+                                             'operaciones': chat.obtener_operaciones_desde({})},
+            'vector_clock': chat.obtener_resumen_operaciones(), 'exito': True}
+
+
+def decodificar_json(payload: bytes) -> dict:
+    # Como lo hace el receptor: hasta tener objetos Operacion
+    mensaje = decodificar_payload(payload)
+    mensaje['datos']['operaciones'] = [Operacion.from_dict(op) for op in mensaje['datos']['operaciones']]
+    return mensaje
+
+
+def medir(funcion, argumento, operaciones: int, repeticiones: int) -> float:
+    """Devuelve operaciones por segundo"""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(argumento)
+    return operaciones * repeticiones / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Codificación binaria frente a JSON")
+    parser.add_argument("--operaciones", type=int, nargs="+", default=[100, 1000, 20000])
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    print("=== BENCHMARK DE CODIFICACIÓN ===")
+    for operaciones in args.operaciones:
+        delta = crear_delta(operaciones)
+        repeticiones = max(1, 50000 // operaciones)
+        print(f"\nDelta de {operaciones} operaciones")
+        for nombre, codificar, decodificar in (("json", codificar_payload, decodificar_json),
+                                               ("binario", codificar_mensaje, decodificar_mensaje)):
+            payload = codificar(delta)
+            ida = medir(codificar, delta, operaciones, repeticiones)
+            vuelta = medir(decodificar, payload, operaciones, repeticiones)
+            print(f"  {nombre:8} {len(payload):>12,} bytes  {ida:>12,.0f} ops/s codificar"
+                  f"  {vuelta:>12,.0f} ops/s decodificar")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark de compresión de payloads de sincronización
+
+Mide los bytes en la red y el tiempo de CPU (comprimir + descomprimir) de
+un sync_data con el estado completo y de deltas de operaciones, sin
+comprimir y con cada compresión de protocolo_red, en los dos formatos del
+payload. La combinación por defecto de los clientes es binario con
+zlib_diccionario, que usa el diccionario del formato binario.
+
+Uso:
+    python benchmark_compresion.py [--mensajes 1000 10000 100000]
+"""
+
+import time
+import argparse
+import logging
+from chat_crdt import ChatCRDT
+from protocolo_red import COMPRESIONES, FORMATOS, interpretar_payload, preparar_payload
+
+
+def crear_chat(mensajes: int) -> ChatCRDT:
+    chat = ChatCRDT("alice")
+    for i in range(mensajes):
+        chat.enviar_mensaje(f"Mensaje {i}: hola a todos, ¿cómo va el proyecto?")
+    return chat
+
+
+def medir(mensaje: dict, compresion: str, repeticiones: int, binario: bool) -> tuple:
+    """Devuelve (bytes en la red, ms de CPU por sincronización: codificar, comprimir y deshacerlo)"""
+    inicio = time.process_time()
+    for _ in range(repeticiones):
+        payload, flags = preparar_payload(mensaje, compresion, umbral=0, binario=binario)
+        interpretar_payload(payload, flags)
+    cpu = (time.process_time() - inicio) / repeticiones * 1000
+    return len(payload), cpu
+
+
+def imprimir(titulo: str, mensaje: dict, repeticiones: int):
+    print(f"\n{titulo}")
+    for formato in FORMATOS:
+        binario = formato == 'binario'
+        crudo, cpu_crudo = medir(mensaje, None, repeticiones, binario)
+        print(f"  {formato:8} {'sin comprimir':18} {crudo:>12,} bytes  {cpu_crudo:9.2f} ms CPU")
+        for compresion in COMPRESIONES:
+            bytes_, cpu = medir(mensaje, compresion, repeticiones, binario)
+            print(f"  {formato:8} {compresion:18} {bytes_:>12,} bytes  {cpu:9.2f} ms CPU  ({bytes_ / crudo:6.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes en la red y CPU por sincronización")
+    parser.add_argument("--mensajes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    print("=== BENCHMARK DE COMPRESIÓN ===")
+    for mensajes in args.mensajes:
+        chat = crear_chat(mensajes)
+        estado = {'tipo': 'sync_data', 'datos': {'tipo_sync': 'estado',
+                                                  'estado_completo': chat.obtener_estado_completo()}}
+        repeticiones = max(1, 10000 // mensajes)
+        imprimir(f"Estado completo, {mensajes} mensajes", estado, repeticiones)
+
+    # Delta típico de una ronda (unas pocas operaciones) y uno de un par que estuvo fuera
+    for operaciones in (10, 100):
+        chat = crear_chat(operaciones)
+        delta = {'tipo': 'sync_delta', 'datos': {'tipo_sync': 'operaciones',
+                                                  'operaciones': chat.obtener_operaciones(),
+                                                  'vector_clock': chat.obtener_resumen_operaciones()},
+                 'exito': True}
+        imprimir(f"Delta de {operaciones} operaciones", delta, 10000 // operaciones)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
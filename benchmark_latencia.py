@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia de entrega entre dos nodos locales
+
+Mide el tiempo desde enviar_mensaje() en un nodo hasta que el mensaje está
+en el chat del otro, con envío inmediato (push) o solo con la
+sincronización periódica.
+
+Uso:
+    python benchmark_latencia.py [--mensajes 50] [--red hilos|asyncio] [--sin-push]
+"""
+
+import time
+import random
+import argparse
+import logging
+import statistics
+from chat_crdt import ChatCRDT
+from descubrimiento_nodos import InfoNodo
+from sincronizacion_chat import crear_cliente_p2p, MODOS_RED
+
+
+def medir(mensajes: int, modo: str, push: bool, puerto_base: int = 12070) -> list:
+    """Devuelve las latencias de entrega en milisegundos"""
+    nodos = []
+    for i, nombre in enumerate(("alice", "bob")):
+        nodos.append(crear_cliente_p2p(ChatCRDT(nombre), nombre, puerto=puerto_base + i,
+                                       habilitar_autodescubrimiento=False, modo=modo,
+                                       habilitar_push=push))
+    alice, bob = nodos
+
+    for cliente in nodos:
+        cliente.iniciar()
+    alice._conectar_a_nodo(InfoNodo("bob", "bob", "127.0.0.1", puerto_base + 1, time.time()))
+    bob._conectar_a_nodo(InfoNodo("alice", "alice", "127.0.0.1", puerto_base, time.time()))
+    time.sleep(0.5)
+
+    latencias = []
+    try:
+        for i in range(mensajes):
+            inicio = time.perf_counter()
+            mensaje_id = alice.chat.enviar_mensaje(f"Mensaje {i}")
+            while mensaje_id not in bob.chat.mensajes:
+                time.sleep(0.0005)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            # Separar los envíos para no medir siempre la misma fase del bucle
+            time.sleep(random.uniform(0, 0.05))
+    finally:
+        for cliente in nodos:
+            cliente.detener()
+
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de entrega entre dos nodos locales")
+    parser.add_argument("--mensajes", type=int, default=50)
+    parser.add_argument("--red", choices=list(MODOS_RED), default="hilos")
+    parser.add_argument("--sin-push", action="store_true",
+                        help="Solo sincronización periódica (cada 3 s)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    push = not args.sin_push
+
+    print(f"=== LATENCIA DE ENTREGA ({args.red}, push={'sí' if push else 'no'}, {args.mensajes} mensajes) ===")
+    latencias = sorted(medir(args.mensajes, args.red, push))
+    p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+    print(f"Mediana: {statistics.median(latencias):8.2f} ms")
+    print(f"p95:     {p95:8.2f} ms")
+    print(f"Máxima:  {latencias[-1]:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria: bytes por mensaje con y sin __slots__
+
+Compara las representaciones actuales de Mensaje, Operacion y Timestamp
+con las dataclasses originales (con __dict__ y sin internado de cadenas).
+Los mensajes se materializan como al llegar por la red (from_dict), que es
+donde autor, canal y node_id llegan como copias independientes.
+Informa además lo que ocupa el índice de búsqueda por mensaje, con textos
+de chat de varias palabras.
+
+Uso:
+    python benchmark_memoria.py [--mensajes 1000000] [--mensajes-indice 100000]
+"""
+
+import gc
+import json
+import time
+import uuid
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+from typing import Any, Dict
+from chat_crdt import Mensaje, Operacion
+from indices_chat import IndiceBusqueda
+
+
+PALABRAS = ("hola", "que", "tal", "todo", "bien", "el", "la", "de", "en", "mañana", "reunión",
+            "proyecto", "sincronización", "mensaje", "nodo", "red", "gracias", "nos", "vemos",
+            "ok", "listo", "revisé", "cambios", "servidor", "prueba", "error", "versión")
+
+
+@dataclass
+class TimestampOriginal:
+    node_id: str
+    counter: int
+
+
+@dataclass
+class MensajeOriginal:
+    mensaje_id: str
+    contenido: str
+    autor: str
+    timestamp: datetime
+    canal: str = "general"
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MensajeOriginal':
+        return cls(data['mensaje_id'], data['contenido'], data['autor'],
+                   datetime.fromisoformat(data['timestamp']), data['canal'])
+
+
+@dataclass
+class OperacionOriginal:
+    tipo: str
+    clave: str
+    valor: Any
+    timestamp: TimestampOriginal
+    usuario: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'OperacionOriginal':
+        return cls(data['tipo'], data['clave'], data['valor'],
+                   TimestampOriginal(data['timestamp']['node_id'], data['timestamp']['counter']),
+                   data['usuario'])
+
+
+def generar_datos(i: int, base: datetime) -> str:
+    """Genera la operación de envío de un mensaje tal como viaja por la red"""
+    autor = f"usuario{i % 8}"
+    mensaje = {
+        'mensaje_id': str(uuid.UUID(int=i)),
+        'contenido': f"Mensaje {i}",
+        'autor': autor,
+        'timestamp': (base + timedelta(microseconds=i)).isoformat(),
+        'canal': "chat_principal"
+    }
+    return json.dumps({
+        'tipo': "enviar_mensaje",
+        'clave': mensaje['mensaje_id'],
+        'valor': mensaje,
+        'timestamp': {'node_id': autor, 'counter': i + 1},
+        'usuario': autor
+    })
+
+
+def medir(clase_mensaje, clase_operacion, cantidad: int) -> float:
+    """Devuelve los bytes retenidos por mensaje (Mensaje + Operacion)"""
+    base = datetime(2024, 1, 1)
+    lineas = [generar_datos(i, base) for i in range(cantidad)]
+
+    gc.collect()
+    tracemalloc.start()
+    mensajes = []
+    operaciones = []
+    for linea in lineas:
+        datos = json.loads(linea)
+        operaciones.append(clase_operacion.from_dict(datos))
+        mensajes.append(clase_mensaje.from_dict(datos['valor']))
+    del datos
+    gc.collect()
+    retenido, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return retenido / cantidad
+
+
+def medir_indice(cantidad: int):
+    """Devuelve los bytes retenidos por el índice y los microsegundos por indexar, por mensaje"""
+    aleatorio = random.Random(1)
+    textos = []
+    for i in range(cantidad):
+        palabras = aleatorio.choices(PALABRAS, k=aleatorio.randint(3, 12))
+        palabras.append(f"#{i}")  # Algo propio de cada mensaje, como un número o un nombre
+        textos.append((str(uuid.UUID(int=i)), " ".join(palabras), f"usuario{i % 8}"))
+
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    indice = IndiceBusqueda()
+    for mensaje_id, contenido, autor in textos:
+        indice.indexar(mensaje_id, contenido, autor)
+    duracion = time.perf_counter() - inicio
+    gc.collect()
+    retenido, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return retenido / cantidad, duracion / cantidad * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes por mensaje con y sin __slots__")
+    parser.add_argument("--mensajes", type=int, default=1_000_000)
+    parser.add_argument("--mensajes-indice", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"=== BENCHMARK DE MEMORIA ({args.mensajes} mensajes) ===")
+    antes = medir(MensajeOriginal, OperacionOriginal, args.mensajes)
+    print(f"Dataclasses originales: {antes:8.1f} bytes/mensaje")
+    despues = medir(Mensaje, Operacion, args.mensajes)
+    print(f"Slots + internado:      {despues:8.1f} bytes/mensaje")
+    print(f"Ahorro: {antes - despues:.1f} bytes/mensaje ({(1 - despues / antes) * 100:.1f}%)")
+
+    print(f"\n=== ÍNDICE DE BÚSQUEDA ({args.mensajes_indice} mensajes) ===")
+    bytes_indice, microsegundos = medir_indice(args.mensajes_indice)
+    print(f"Índice de palabras:     {bytes_indice:8.1f} bytes/mensaje, {microsegundos:.1f} µs por indexar")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
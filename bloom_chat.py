@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Filtro de Bloom para negociar la sincronización sin metadatos causales
+
+Cada lado resume en un filtro los mensajes (id + versión) que tiene y el
+otro responde solo con los que no están en él. El tamaño del filtro es
+proporcional al número de mensajes (~10 bits por mensaje con un 1% de
+falsos positivos), no a su contenido. Un falso positivo deja un mensaje
+sin enviar en esa ronda; la semilla cambia en cada ronda para que el
+siguiente intercambio lo recupere.
+"""
+
+import math
+import base64
+from hashlib import blake2b
+from typing import Any, Dict, Iterator, Optional
+
+
+class FiltroBloom:
+    """Filtro de Bloom con doble hashing (posiciones h1 + i*h2)"""
+
+    def __init__(self, num_bits: int, num_hashes: int, semilla: int = 0,
+                 bits: Optional[bytearray] = None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.semilla = semilla
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def para(cls, capacidad: int, tasa_falsos_positivos: float = 0.01,
+             semilla: int = 0) -> 'FiltroBloom':
+        """Dimensiona el filtro para capacidad elementos y la tasa de falsos positivos dada"""
+        capacidad = max(capacidad, 1)
+        num_bits = max(64, math.ceil(-capacidad * math.log(tasa_falsos_positivos) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / capacidad * math.log(2)))
+        return cls(num_bits, num_hashes, semilla)
+
+    def _posiciones(self, clave: str) -> Iterator[int]:
+        digest = blake2b(f"{self.semilla}\x00{clave}".encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def agregar(self, clave: str):
+        for posicion in self._posiciones(clave):
+            self.bits[posicion >> 3] |= 1 << (posicion & 7)
+
+    def __contains__(self, clave: str) -> bool:
+        return all(self.bits[posicion >> 3] & (1 << (posicion & 7))
+                   for posicion in self._posiciones(clave))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'num_bits': self.num_bits,
+            'num_hashes': self.num_hashes,
+            'semilla': self.semilla,
+            'bits': base64.b64encode(self.bits).decode('ascii')
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FiltroBloom':
+        bits = bytearray(base64.b64decode(data['bits']))
+        num_bits = data['num_bits']
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError("Filtro de Bloom con tamaño inconsistente")
+        return cls(num_bits, data['num_hashes'], data.get('semilla', 0), bits)
\ No newline at end of file
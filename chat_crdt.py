@@ -3,15 +3,37 @@
 Sistema de chat cooperativo usando CRDTs
 """
 
+import sys
 import json
 import uuid
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Iterable, Callable
+from contextlib import contextmanager
+from functools import wraps
 from dataclasses import dataclass
-from crdt_base import CRDTMap, Timestamp, Operation
+from crdt_base import CRDTMap, Timestamp, Operation, RegistroOperaciones, LogPorNodo
+from indices_chat import CanalMensajes, LineaTemporal, IndiceBusqueda
+from persistencia import LogPersistente
+from merkle_chat import ArbolMerkle
+from bloom_chat import FiltroBloom
+from estadisticas_chat import EstadisticasChat
+from presencia_chat import RegistroPresencia
+from eventos_chat import (EventoCambio, SuscripcionAsync, MENSAJE_AGREGADO, MENSAJE_EDITADO,
+                          MENSAJE_ELIMINADO)
 
 
-@dataclass
+def _con_lock(metodo):
+    """Ejecuta el método de ChatCRDT con el lock del chat tomado"""
+    @wraps(metodo)
+    def envoltorio(self, *args, **kwargs):
+        with self.lock:
+            return metodo(self, *args, **kwargs)
+    return envoltorio
+
+
+@dataclass(slots=True)
 class Mensaje:
     """Representa un mensaje de chat"""
     mensaje_id: str
@@ -19,35 +41,66 @@ class Mensaje:
     autor: str
     timestamp: datetime
     canal: str = "general"
+    # Timestamp de la operación que escribió esta versión (envío, edición o
+    # eliminación): decide el Last Writer Wins. None en datos antiguos
+    version: Optional[Timestamp] = None
     
     def to_dict(self) -> Dict[str, Any]:
-        return {
+        datos = {
             'mensaje_id': self.mensaje_id,
             'contenido': self.contenido,
             'autor': self.autor,
             'timestamp': self.timestamp.isoformat(),
             'canal': self.canal
         }
+        if self.version is not None:
+            datos['version'] = {'node_id': self.version.node_id, 'counter': self.version.counter}
+        return datos
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Mensaje':
+        # Autor y canal se repiten en miles de mensajes: se comparte una sola copia
+        version = data.get('version')
         return cls(
             data['mensaje_id'],
             data['contenido'],
-            data['autor'],
+            sys.intern(data['autor']),
             datetime.fromisoformat(data['timestamp']),
-            data['canal']
+            sys.intern(data['canal']),
+            Timestamp(sys.intern(version['node_id']), version['counter']) if version else None
         )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Operacion:
-    """Operación específica para el chat"""
+    """Operación específica para el chat (inmutable, sin __dict__)"""
     tipo: str
     clave: str
     valor: Any
     timestamp: Timestamp
     usuario: str
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'tipo': self.tipo,
+            'clave': self.clave,
+            'valor': self.valor,
+            'timestamp': {
+                'node_id': self.timestamp.node_id,
+                'counter': self.timestamp.counter
+            },
+            'usuario': self.usuario
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Operacion':
+        return cls(
+            tipo=sys.intern(data['tipo']),
+            clave=data['clave'],
+            valor=data['valor'],
+            timestamp=Timestamp(sys.intern(data['timestamp']['node_id']), data['timestamp']['counter']),
+            usuario=sys.intern(data['usuario'])
+        )
 
 
 class ChatCRDT:
@@ -56,36 +109,131 @@ class ChatCRDT:
     Permite múltiples usuarios chateando simultáneamente
     """
     
-    def __init__(self, usuario_id: str):
+    def __init__(self, usuario_id: str, directorio_datos: Optional[str] = None,
+                 intervalo_snapshot: int = 1000):
         self.usuario_id = usuario_id
+        self.logger = logging.getLogger(f"ChatCRDT-{usuario_id}")
+        # Serializa las escrituras locales (interfaz) con las que llegan por la
+        # red y las lecturas que recorren el estado; la red usa este mismo lock
+        self.lock = threading.RLock()
         self.crdt_map = CRDTMap(usuario_id)
         self.mensajes: Dict[str, Mensaje] = {}
         # CANAL ÚNICO - todos los mensajes van al canal "chat"
         self.canal_unico = "chat"
-        self.canales: Dict[str, List[str]] = {self.canal_unico: []}
+        self.canales: Dict[str, CanalMensajes] = {self.canal_unico: CanalMensajes()}
+        # Índice ordenado por timestamp de todos los mensajes del canal único
+        self.linea_temporal = LineaTemporal()
+        # Índice invertido para búsquedas
+        self.indice_busqueda = IndiceBusqueda()
+        # Resumen de Merkle del estado, para detectar divergencias sin recorrerlo
+        self.arbol_merkle = ArbolMerkle()
+        # Contadores que se actualizan al guardar cada mensaje
+        self.estadisticas = EstadisticasChat()
+        # Última actividad por usuario (mensajes y, desde la red, nodos vistos)
+        self.presencia = RegistroPresencia()
         self.usuarios_conectados: Dict[str, Dict[str, Any]] = {}
         self.callback_cambio = None
-        self.operaciones_log: List[Operacion] = []
+        # Reciben la lista de EventoCambio de cada cambio notificado
+        self.suscriptores_cambios: List[Callable[[List[EventoCambio]], None]] = []
+        self._eventos_pendientes: List[EventoCambio] = []
+        self._profundidad_lote = 0  # > 0 mientras se agrupan los eventos de una sincronización
+        self._cambio_pendiente = False
+        # Se llaman con cada operación generada localmente (p.ej. para enviarla ya a los pares)
+        self.callbacks_operacion_local: List[Callable[[Operacion], None]] = []
+        self.operaciones_log = LogPorNodo()  # Operaciones por nodo, ordenadas por counter
+        # Índice de operaciones aplicadas para detectar duplicados en O(1)
+        self.operaciones_aplicadas = RegistroOperaciones()
+        # Counter más alto por nodo cuyas operaciones ya no están en el log
+        # (cubiertas por un snapshot): quien las necesite recibe el estado
+        self.piso_log: Dict[str, int] = {}
+        # Último resumen (watermarks) recibido de cada par, para compactar el log
+        self.resumenes_pares: Dict[str, Dict[str, int]] = {}
+        self.metricas_compactacion: Dict[str, int] = {
+            'compactaciones': 0,
+            'operaciones_descartadas': 0,
+            'tamano_log_antes': 0,
+            'tamano_log_despues': 0
+        }
         
         # Para sincronización por estado
         self.vector_clock: Dict[str, int] = {usuario_id: 0}  # node_id -> counter
-        self.ultimo_estado_hash: str = ""
+        
+        # Persistencia opcional en disco
+        self.log_persistente: Optional[LogPersistente] = None
+        self.intervalo_snapshot = intervalo_snapshot
+        self._operaciones_desde_snapshot = 0
+        self._estado_sin_snapshot = False  # Hay cambios llegados por estado que solo están en memoria
+        if directorio_datos:
+            # Todavía no hay suscriptores: los eventos de la restauración se descartan
+            with self.agrupar_cambios():
+                self._restaurar_desde_disco(LogPersistente(directorio_datos))
         
     def establecer_callback_cambio(self, callback):
         """Establece callback para notificar cambios en la UI"""
         self.callback_cambio = callback
         
+    def agregar_suscriptor_cambios(self, callback: Callable[[List[EventoCambio]], None]):
+        """Agrega un suscriptor que recibe los eventos de cada cambio (en lotes)"""
+        self.suscriptores_cambios.append(callback)
+    
+    def quitar_suscriptor_cambios(self, callback: Callable[[List[EventoCambio]], None]):
+        """Quita un suscriptor agregado con agregar_suscriptor_cambios"""
+        if callback in self.suscriptores_cambios:
+            self.suscriptores_cambios.remove(callback)
+    
+    def suscribir_eventos_async(self, maximo_lotes: int = 0) -> SuscripcionAsync:
+        """Lotes de eventos para `async for`; llamar desde el event loop que los consume"""
+        return SuscripcionAsync(self, maximo_lotes)
+    
+    @contextmanager
+    def agrupar_cambios(self):
+        """
+        Agrupa las notificaciones de un bloque: al salir se notifica una sola
+        vez, con todos los eventos producidos dentro. Se puede anidar.
+        """
+        self._profundidad_lote += 1
+        try:
+            yield
+        finally:
+            self._profundidad_lote -= 1
+            if self._profundidad_lote == 0 and self._cambio_pendiente:
+                self._notificar_cambio()
+    
     def _notificar_cambio(self):
-        """Notifica cambios a la UI si hay callback configurado"""
+        """Entrega los eventos pendientes y avisa al callback de la UI (si lo hay)"""
+        if self._profundidad_lote:
+            self._cambio_pendiente = True
+            return
+        self._cambio_pendiente = False
+        
+        eventos, self._eventos_pendientes = self._eventos_pendientes, []
+        if eventos:
+            for callback in list(self.suscriptores_cambios):
+                try:
+                    callback(eventos)
+                except Exception as e:
+                    self.logger.error(f"Error en suscriptor de cambios: {e}")
+        
         if self.callback_cambio:
             self.callback_cambio()
     
+    def agregar_callback_operacion_local(self, callback: Callable[[Operacion], None]):
+        """Agrega un callback que recibe cada operación generada localmente"""
+        self.callbacks_operacion_local.append(callback)
+    
+    def _notificar_operacion_local(self, operacion: Operacion):
+        """Entrega una operación local recién registrada a los interesados"""
+        for callback in self.callbacks_operacion_local:
+            try:
+                callback(operacion)
+            except Exception as e:
+                self.logger.error(f"Error en callback de operación local: {e}")
+    
+    @_con_lock
     def enviar_mensaje(self, contenido: str, canal: str = None) -> str:
         """Envía un mensaje al chat - siempre al canal único"""
-        # Incrementar vector clock
-        self._incrementar_vector_clock()
-        
         mensaje_id = str(uuid.uuid4())
+        timestamp_operacion = self._generar_timestamp_operacion()
         
         # TODOS los mensajes van al canal único
         mensaje = Mensaje(
@@ -93,29 +241,31 @@ class ChatCRDT:
             contenido=contenido,
             autor=self.usuario_id,
             timestamp=datetime.now(),
-            canal=self.canal_unico  # Siempre usar canal único
+            canal=self.canal_unico,  # Siempre usar canal único
+            version=timestamp_operacion
         )
         
         # Aplicar localmente
-        self.mensajes[mensaje_id] = mensaje
-        self.canales[self.canal_unico].append(mensaje_id)
+        self._guardar_mensaje(mensaje)
+        self.canales[self.canal_unico].agregar(mensaje_id)
         
-        # Crear operación CRDT (para compatibilidad)
-        self.crdt_map.counter += 1
+        # Crear operación CRDT
         operacion = Operacion(
             tipo="enviar_mensaje",
             clave=mensaje_id,
             valor=mensaje.to_dict(),
-            timestamp=Timestamp(self.usuario_id, self.crdt_map.counter),
+            timestamp=timestamp_operacion,
             usuario=self.usuario_id
         )
         
         # Guardar operación para sincronización
-        self.operaciones_log.append(operacion)
+        self._registrar_operacion(operacion)
+        self._notificar_operacion_local(operacion)
         
         self._notificar_cambio()
         return mensaje_id
     
+    @_con_lock
     def editar_mensaje(self, mensaje_id: str, nuevo_contenido: str) -> bool:
         """Edita un mensaje existente"""
         if mensaje_id not in self.mensajes:
@@ -127,34 +277,37 @@ class ChatCRDT:
         if mensaje.autor != self.usuario_id:
             return False
         
-        # Crear mensaje editado
+        # Crear mensaje editado: la versión avanza, el timestamp original se mantiene
+        timestamp_operacion = self._generar_timestamp_operacion()
         mensaje_editado = Mensaje(
             mensaje_id=mensaje_id,
             contenido=f"{nuevo_contenido} (editado)",
             autor=mensaje.autor,
             timestamp=mensaje.timestamp,  # Mantener timestamp original
-            canal=mensaje.canal
+            canal=mensaje.canal,
+            version=timestamp_operacion
         )
         
         # Crear operación CRDT
-        self.crdt_map.counter += 1
         operacion = Operacion(
             tipo="editar_mensaje",
             clave=mensaje_id,
             valor=mensaje_editado.to_dict(),
-            timestamp=Timestamp(self.usuario_id, self.crdt_map.counter),
+            timestamp=timestamp_operacion,
             usuario=self.usuario_id
         )
         
         # Aplicar localmente
-        self.mensajes[mensaje_id] = mensaje_editado
+        self._guardar_mensaje(mensaje_editado)
         
         # Guardar operación
-        self.operaciones_log.append(operacion)
+        self._registrar_operacion(operacion)
+        self._notificar_operacion_local(operacion)
         
         self._notificar_cambio()
         return True
     
+    @_con_lock
     def eliminar_mensaje(self, mensaje_id: str) -> bool:
         """Elimina un mensaje (soft delete)"""
         if mensaje_id not in self.mensajes:
@@ -167,12 +320,11 @@ class ChatCRDT:
             return False
         
         # Crear operación CRDT
-        self.crdt_map.counter += 1
         operacion = Operacion(
             tipo="eliminar_mensaje",
             clave=mensaje_id,
             valor=None,
-            timestamp=Timestamp(self.usuario_id, self.crdt_map.counter),
+            timestamp=self._generar_timestamp_operacion(),
             usuario=self.usuario_id
         )
         
@@ -182,13 +334,15 @@ class ChatCRDT:
             contenido="[Mensaje eliminado]",
             autor=mensaje.autor,
             timestamp=mensaje.timestamp,
-            canal=mensaje.canal
+            canal=mensaje.canal,
+            version=operacion.timestamp
         )
         
-        self.mensajes[mensaje_id] = mensaje_eliminado
+        self._guardar_mensaje(mensaje_eliminado)
         
         # Guardar operación
-        self.operaciones_log.append(operacion)
+        self._registrar_operacion(operacion)
+        self._notificar_operacion_local(operacion)
         
         self._notificar_cambio()
         return True
@@ -198,153 +352,402 @@ class ChatCRDT:
         # En modo canal único, no se permiten canales nuevos
         return False
     
-    def obtener_mensajes_canal(self, canal: str = None) -> List[Mensaje]:
-        """Obtiene los mensajes del canal único ordenados por timestamp"""
+    @_con_lock
+    def obtener_mensajes_canal(self, canal: str = None, limite: Optional[int] = None) -> List[Mensaje]:
+        """
+        Obtiene los mensajes del canal único ordenados por timestamp.
+        Con limite, solo los más recientes (sin recorrer todo el historial).
+        """
         # Siempre usar el canal único, ignorar parámetro
-        mensajes_canal = [self.mensajes[msg_id] for msg_id in self.canales[self.canal_unico] 
-                         if msg_id in self.mensajes]
-        
-        # Ordenar por timestamp
-        mensajes_canal.sort(key=lambda m: m.timestamp)
-        return mensajes_canal
+        if limite is None:
+            ids = list(self.linea_temporal)
+        else:
+            ids = self.linea_temporal.ultimos(limite)
+        return [self.mensajes[msg_id] for msg_id in ids]
     
-    def obtener_usuarios_activos(self) -> List[str]:
-        """Obtiene la lista de usuarios que han enviado mensajes recientemente"""
-        ahora = datetime.now()
-        usuarios_activos = set()
-        
-        # Usuarios que han enviado mensajes en los últimos 10 minutos
-        for mensaje in self.mensajes.values():
-            if (ahora - mensaje.timestamp).total_seconds() < 600:  # 10 minutos
-                usuarios_activos.add(mensaje.autor)
-        
-        return list(usuarios_activos)
+    @_con_lock
+    def obtener_mensajes_entre(self, desde: Optional[datetime] = None,
+                               hasta: Optional[datetime] = None) -> List[Mensaje]:
+        """Obtiene los mensajes con timestamp en [desde, hasta], ordenados"""
+        return [self.mensajes[msg_id] for msg_id in self.linea_temporal.entre(desde, hasta)]
+    
+    @_con_lock
+    def obtener_usuarios_activos(self, ventana: Optional[timedelta] = None) -> List[str]:
+        """
+        Obtiene los usuarios activos recientemente (últimos 10 minutos por
+        defecto): con mensajes o con su nodo visto en la red
+        """
+        return self.presencia.activos(ventana)
     
+    @_con_lock
     def buscar_mensajes(self, query: str) -> List[Mensaje]:
         """Busca mensajes que contengan el texto especificado"""
-        query = query.lower()
-        resultados = []
-        
-        for mensaje in self.mensajes.values():
-            if query in mensaje.contenido.lower() or query in mensaje.autor.lower():
-                resultados.append(mensaje)
+        ocurrencias = self.indice_busqueda.buscar(query)
+        resultados = [self.mensajes[mensaje_id] for mensaje_id in ocurrencias]
         
         # Ordenar por relevancia y timestamp
         resultados.sort(key=lambda m: (
-            -m.contenido.lower().count(query),  # Más ocurrencias primero
+            -ocurrencias[m.mensaje_id],  # Más ocurrencias primero
             -m.timestamp.timestamp()  # Más recientes primero
         ))
         
         return resultados
     
+    @_con_lock
     def obtener_estadisticas(self) -> Dict[str, Any]:
-        """Obtiene estadísticas del chat"""
-        mensajes_hoy = 0
+        """Obtiene estadísticas del chat (sin recorrer los mensajes)"""
         ahora = datetime.now()
         
-        for mensaje in self.mensajes.values():
-            if (ahora - mensaje.timestamp).days == 0:
-                mensajes_hoy += 1
-        
         return {
-            'total_mensajes': len(self.mensajes),
-            'mensajes_hoy': mensajes_hoy,
+            'total_mensajes': self.estadisticas.total_mensajes,
+            # Últimas 24 horas y últimos 10 minutos: búsquedas binarias en la línea temporal
+            'mensajes_hoy': self.linea_temporal.contar_entre(ahora - timedelta(days=1), ahora),
+            'mensajes_ultimos_10_min': self.linea_temporal.contar_entre(ahora - timedelta(minutes=10), ahora),
+            'mensajes_eliminados': self.estadisticas.mensajes_eliminados,
+            # Histogramas mantenidos al guardar cada mensaje (claves de día en ISO, exportables a JSON)
+            'mensajes_por_dia': {dia.isoformat(): cantidad
+                                 for dia, cantidad in sorted(self.estadisticas.por_dia.items())},
+            'mensajes_por_autor': dict(self.estadisticas.por_autor.most_common()),
             'canales_activos': len(self.canales),
             'usuarios_activos': len(self.obtener_usuarios_activos()),
-            'usuarios_conectados': len(self.usuarios_conectados)
+            'usuarios_conectados': len(self.usuarios_conectados),
+            'operaciones_en_log': len(self.operaciones_log)
         }
     
+    @_con_lock
     def aplicar_operacion_remota(self, operacion: Operacion):
         """Aplica una operación recibida de otro nodo"""
         # Verificar si ya tenemos esta operación
-        for op_existente in self.operaciones_log:
-            if (op_existente.timestamp.node_id == operacion.timestamp.node_id and 
-                op_existente.timestamp.counter == operacion.timestamp.counter):
-                return False  # Ya aplicada
+        if self.operaciones_aplicadas.contiene(operacion.timestamp):
+            return False  # Ya aplicada
+        
+        # Una edición o eliminación que se adelanta a su envío no se registra:
+        # queda como hueco y la anti-entropía la vuelve a traer después del envío
+        if operacion.tipo in ("editar_mensaje", "eliminar_mensaje") and operacion.clave not in self.mensajes:
+            return False
         
         # Aplicar según el tipo de operación
         if operacion.tipo == "enviar_mensaje":
             mensaje_data = operacion.valor
             mensaje = Mensaje.from_dict(mensaje_data)
-            self.mensajes[operacion.clave] = mensaje
-            
-            canal = mensaje.canal
-            if canal not in self.canales:
-                self.canales[canal] = []
-            if operacion.clave not in self.canales[canal]:
-                self.canales[canal].append(operacion.clave)
+            # Si ya llegó por sincronización de estado puede tener ediciones
+            # posteriores; el envío original no debe pisarlas
+            if operacion.clave not in self.mensajes:
+                # Igual que en la sincronización por estado, todo va al canal único
+                mensaje.canal = self.canal_unico
+                mensaje.version = operacion.timestamp
+                self._guardar_mensaje(mensaje)
+                self.canales[self.canal_unico].agregar(operacion.clave)
                 
         elif operacion.tipo == "editar_mensaje":
-            if operacion.clave in self.mensajes:
+            # Una edición que llega tarde no pisa una versión posterior (p. ej. la eliminación)
+            if self._operacion_gana(operacion):
                 mensaje_data = operacion.valor
                 mensaje = Mensaje.from_dict(mensaje_data)
-                self.mensajes[operacion.clave] = mensaje
+                mensaje.canal = self.canal_unico
+                mensaje.version = operacion.timestamp
+                self._guardar_mensaje(mensaje)
                 
         elif operacion.tipo == "eliminar_mensaje":
-            if operacion.clave in self.mensajes:
+            if self._operacion_gana(operacion):
                 mensaje_original = self.mensajes[operacion.clave]
                 mensaje_eliminado = Mensaje(
                     mensaje_id=operacion.clave,
                     contenido="[Mensaje eliminado]",
                     autor=mensaje_original.autor,
                     timestamp=mensaje_original.timestamp,
-                    canal=mensaje_original.canal
+                    canal=mensaje_original.canal,
+                    version=operacion.timestamp
                 )
-                self.mensajes[operacion.clave] = mensaje_eliminado
+                self._guardar_mensaje(mensaje_eliminado)
                 
         elif operacion.tipo == "crear_canal":
             if operacion.clave not in self.canales:
-                self.canales[operacion.clave] = []
+                self.canales[operacion.clave] = CanalMensajes()
         
-        # Agregar operación al log
-        self.operaciones_log.append(operacion)
+        # Avanzar el vector clock con el contador del nodo origen
+        node_id = operacion.timestamp.node_id
+        if operacion.timestamp.counter > self.vector_clock.get(node_id, 0):
+            self.vector_clock[node_id] = operacion.timestamp.counter
+        
+        # Agregar operación al log (puede disparar un snapshot, que debe
+        # incluir ya el vector clock actualizado)
+        self._registrar_operacion(operacion)
         
         self._notificar_cambio()
         return True
     
+    def _guardar_mensaje(self, mensaje: Mensaje):
+        """Guarda (o reemplaza) un mensaje manteniendo los índices al día"""
+        anterior = self.mensajes.get(mensaje.mensaje_id)
+        self.estadisticas.registrar(mensaje, anterior)
+        if anterior is None:
+            self.presencia.registrar(mensaje.autor, mensaje.timestamp)
+            tipo = MENSAJE_AGREGADO
+        elif mensaje.contenido == "[Mensaje eliminado]":
+            tipo = MENSAJE_ELIMINADO
+        else:
+            tipo = MENSAJE_EDITADO
+        self._eventos_pendientes.append(EventoCambio(tipo, mensaje.mensaje_id, mensaje.version))
+        self.mensajes[mensaje.mensaje_id] = mensaje
+        self.linea_temporal.insertar(mensaje.mensaje_id, mensaje.timestamp)
+        self.indice_busqueda.indexar(mensaje.mensaje_id, mensaje.contenido, mensaje.autor)
+        self.arbol_merkle.actualizar(mensaje.mensaje_id, self._version_mensaje(mensaje))
+    
+    def _operacion_gana(self, operacion: Operacion) -> bool:
+        """Si una edición o eliminación remota es posterior a la versión local del mensaje"""
+        mensaje = self.mensajes.get(operacion.clave)
+        if mensaje is None:
+            return False
+        return mensaje.version is None or mensaje.version < operacion.timestamp
+    
+    @staticmethod
+    def _version_mensaje(mensaje: Mensaje) -> str:
+        """Lo que distingue dos versiones de un mismo mensaje (el canal se fuerza al recibir)"""
+        if mensaje.version is not None:
+            return f"{mensaje.version.node_id}\x00{mensaje.version.counter}"
+        return f"{mensaje.timestamp.isoformat()}\x00{mensaje.contenido}"
+    
+    @property
+    def ultimo_estado_hash(self) -> str:
+        """Hash de Merkle del estado actual de los mensajes (igual en réplicas sincronizadas)"""
+        return self.arbol_merkle.raiz()
+    
+    @_con_lock
+    def obtener_hashes_merkle(self, prefijos: Iterable[str]) -> Dict[str, str]:
+        """Hashes de los hijos de los prefijos del árbol de Merkle"""
+        return self.arbol_merkle.hashes_hijos(prefijos)
+    
+    @_con_lock
+    def obtener_mensajes_merkle(self, prefijos: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Mensajes de las hojas indicadas del árbol de Merkle, serializados"""
+        return {mensaje_id: self.mensajes[mensaje_id].to_dict()
+                for mensaje_id in self.arbol_merkle.claves(prefijos)}
+    
+    @_con_lock
+    def obtener_filtro_bloom(self, semilla: int = 0) -> FiltroBloom:
+        """Filtro de Bloom con la versión de cada mensaje que tenemos"""
+        filtro = FiltroBloom.para(len(self.mensajes), semilla=semilla)
+        for mensaje_id, mensaje in self.mensajes.items():
+            filtro.agregar(f"{mensaje_id}\x00{self._version_mensaje(mensaje)}")
+        return filtro
+    
+    @_con_lock
+    def obtener_mensajes_fuera_de(self, filtro: FiltroBloom) -> Dict[str, Dict[str, Any]]:
+        """Mensajes (serializados) cuya versión no está en el filtro de otro nodo"""
+        return {mensaje_id: mensaje.to_dict() for mensaje_id, mensaje in self.mensajes.items()
+                if f"{mensaje_id}\x00{self._version_mensaje(mensaje)}" not in filtro}
+    
+    def _registrar_operacion(self, operacion: Operacion):
+        """Agrega una operación al log y al índice de operaciones aplicadas"""
+        self.operaciones_log.agregar(operacion)
+        self.operaciones_aplicadas.registrar(operacion.timestamp)
+        
+        if self.log_persistente:
+            self.log_persistente.agregar(operacion.to_dict())
+            self._operaciones_desde_snapshot += 1
+            if self._operaciones_desde_snapshot >= self.intervalo_snapshot:
+                self.guardar_snapshot()
+    
+    @_con_lock
+    def guardar_snapshot(self):
+        """Guarda en disco un snapshot del estado y descarta los segmentos anteriores"""
+        if not self.log_persistente:
+            return
+        
+        self.log_persistente.guardar_snapshot({
+            'estado': self.obtener_estado_completo(),
+            'operaciones_aplicadas': self.operaciones_aplicadas.to_dict()
+        })
+        self._operaciones_desde_snapshot = 0
+        self._estado_sin_snapshot = False
+    
+    def _restaurar_desde_disco(self, log: LogPersistente):
+        """Restaura el estado desde el último snapshot más la cola del log"""
+        snapshot, operaciones = log.cargar()
+        
+        if snapshot:
+            self.sincronizar_por_estado(snapshot['estado'])
+            self.operaciones_aplicadas = RegistroOperaciones.from_dict(snapshot['operaciones_aplicadas'])
+            # Las operaciones del snapshot no están en el log en memoria
+            for node_id in self.operaciones_aplicadas.watermarks.keys() | self.operaciones_aplicadas.dispersos.keys():
+                self.piso_log[node_id] = self.operaciones_aplicadas.maximo(node_id)
+        
+        # Reaplicar la cola del log (sin volver a escribirla en disco)
+        for datos in operaciones:
+            self.aplicar_operacion_remota(Operacion.from_dict(datos))
+        
+        self.crdt_map.counter = self.vector_clock.get(self.usuario_id, 0)
+        self.log_persistente = log
+        self._operaciones_desde_snapshot = len(operaciones)
+    
+    @_con_lock
+    def cerrar(self):
+        """Cierra la persistencia en disco, sincronizando lo pendiente"""
+        if self.log_persistente:
+            if self._estado_sin_snapshot:
+                self.guardar_snapshot()
+            self.log_persistente.cerrar()
+    
+    @_con_lock
+    def obtener_resumen_operaciones(self) -> Dict[str, int]:
+        """Obtiene el watermark de operaciones aplicadas por nodo, usado como resumen de sincronización"""
+        return self.operaciones_aplicadas.resumen()
+    
+    @_con_lock
     def obtener_operaciones(self) -> List[Operacion]:
         """Obtiene todas las operaciones para sincronización"""
-        return self.operaciones_log.copy()
+        return list(self.operaciones_log)
+    
+    @_con_lock
+    def obtener_operaciones_desde(self, vector_clock_remoto: Dict[str, int]) -> Optional[List[Operacion]]:
+        """
+        Obtiene las operaciones que un nodo con el vector clock dado no conoce.
+        Devuelve None si el log local no alcanza para cubrir la diferencia
+        (p.ej. mensajes recibidos por sincronización de estado), en cuyo caso
+        hay que recurrir al estado completo.
+        """
+        # Las operaciones cubiertas por un snapshot ya no están en el log
+        for node_id, piso in self.piso_log.items():
+            if vector_clock_remoto.get(node_id, 0) < piso:
+                return None
+        
+        # Verificar que tenemos en el log todas las operaciones que conocemos:
+        # si el watermark contiguo no llega al vector clock faltan operaciones
+        for node_id, counter in self.vector_clock.items():
+            if (counter > vector_clock_remoto.get(node_id, 0) and
+                    self.operaciones_aplicadas.watermark(node_id) < counter):
+                return None
+        
+        # Ordenadas por nodo y counter: las ediciones llegan después del envío
+        return self.operaciones_log.desde(vector_clock_remoto)
+    
+    @_con_lock
+    def registrar_resumen_par(self, par_id: str, resumen: Dict[str, int]):
+        """Guarda el resumen de operaciones aplicadas que informó un par"""
+        if par_id != self.usuario_id:
+            self.resumenes_pares[par_id] = dict(resumen)
+    
+    @_con_lock
+    def olvidar_par(self, par_id: str):
+        """Deja de tener en cuenta a un par para la estabilidad causal"""
+        self.resumenes_pares.pop(par_id, None)
     
-    def sincronizar_con(self, otras_operaciones: List[Operacion]):
-        """Sincroniza con operaciones de otro nodo"""
+    @_con_lock
+    def obtener_operaciones_estables(self, pares: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Calcula, por nodo, el counter hasta el que todas las réplicas aplicaron
+        las operaciones (mínimo de los watermarks propio y de los pares).
+        Si algún par de la lista no informó su resumen no hay nada estable.
+        """
+        if pares is None:
+            pares = self.resumenes_pares.keys()
+        pares = [par_id for par_id in pares if par_id != self.usuario_id]
+        if not pares or any(par_id not in self.resumenes_pares for par_id in pares):
+            return {}
+        
+        estables = self.operaciones_aplicadas.resumen()
+        for par_id in pares:
+            resumen = self.resumenes_pares[par_id]
+            for node_id in list(estables):
+                estables[node_id] = min(estables[node_id], resumen.get(node_id, 0))
+        return {node_id: counter for node_id, counter in estables.items() if counter > 0}
+    
+    @_con_lock
+    def compactar_log(self, pares: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Descarta del log las operaciones que todas las réplicas ya aplicaron.
+        Su efecto ya está en el estado (mensajes); un nodo que quede por
+        debajo de lo descartado recibe el estado completo (ver piso_log).
+        """
+        estables = self.obtener_operaciones_estables(pares)
+        antes = len(self.operaciones_log)
+        
+        if estables:
+            # El piso se sube antes de quitar las operaciones del log
+            for node_id, counter in estables.items():
+                descartado = self.operaciones_log.maximo_hasta(node_id, counter)
+                if descartado > self.piso_log.get(node_id, 0):
+                    self.piso_log[node_id] = descartado
+            self.operaciones_log.compactar(estables)
+            self.crdt_map.compactar(estables)
+        
+        despues = len(self.operaciones_log)
+        if despues < antes:
+            self.metricas_compactacion['compactaciones'] += 1
+            self.metricas_compactacion['operaciones_descartadas'] += antes - despues
+        self.metricas_compactacion['tamano_log_antes'] = antes
+        self.metricas_compactacion['tamano_log_despues'] = despues
+        
+        return {'antes': antes, 'despues': despues, 'descartadas': antes - despues}
+    
+    @_con_lock
+    def sincronizar_con(self, otras_operaciones: List[Operacion]) -> bool:
+        """Sincroniza con operaciones de otro nodo (una sola notificación para todas)"""
         cambios = False
-        for operacion in otras_operaciones:
-            if self.aplicar_operacion_remota(operacion):
-                cambios = True
+        with self.agrupar_cambios():
+            for operacion in otras_operaciones:
+                if self.aplicar_operacion_remota(operacion):
+                    cambios = True
         
-        if cambios:
-            self._notificar_cambio()
+        return cambios
+    
+    @_con_lock
+    def sincronizar_en_orden(self, otras_operaciones: List[Operacion]) -> List[Operacion]:
+        """
+        Aplica solo las operaciones que siguen al watermark de su nodo, en
+        orden de counter; las que llegan con un hueco delante se descartan
+        (las trae la anti-entropía). Devuelve las aplicadas, en orden.
+        """
+        aplicadas = []
+        with self.agrupar_cambios():
+            for operacion in sorted(otras_operaciones,
+                                    key=lambda op: (op.timestamp.node_id, op.timestamp.counter)):
+                siguiente = self.operaciones_aplicadas.watermark(operacion.timestamp.node_id) + 1
+                if operacion.timestamp.counter == siguiente and self.aplicar_operacion_remota(operacion):
+                    aplicadas.append(operacion)
+        
+        return aplicadas
     
+    @_con_lock
     def obtener_mensajes_ordenados(self, limite: int = 100) -> List[Mensaje]:
         """Obtiene los mensajes más recientes ordenados por timestamp"""
-        mensajes = list(self.mensajes.values())
-        mensajes.sort(key=lambda m: m.timestamp, reverse=True)
-        return mensajes[:limite]
+        ids = self.linea_temporal.ultimos(limite)
+        return [self.mensajes[msg_id] for msg_id in reversed(ids)]
     
+    @_con_lock
     def exportar_chat(self) -> Dict[str, Any]:
         """Exporta todo el chat a un diccionario"""
         return {
             'usuario_id': self.usuario_id,
             'mensajes': {mid: msg.to_dict() for mid, msg in self.mensajes.items()},
-            'canales': self.canales,
+            'canales': self._canales_serializables(),
             'timestamp_exportacion': datetime.now().isoformat(),
             'estadisticas': self.obtener_estadisticas()
         }
     
+    @_con_lock
     def obtener_estado_completo(self) -> Dict[str, Any]:
         """Obtiene el estado completo del chat para sincronización"""
         return {
             'usuario_id': self.usuario_id,
             'vector_clock': self.vector_clock.copy(),
+            'resumen_operaciones': self.operaciones_aplicadas.resumen(),
             'mensajes': {mid: msg.to_dict() for mid, msg in self.mensajes.items()},
-            'canales': self.canales.copy(),
+            'canales': self._canales_serializables(),
+            'hash_estado': self.ultimo_estado_hash,
             'timestamp': datetime.now().timestamp()
         }
     
+    def _canales_serializables(self) -> Dict[str, List[str]]:
+        """Convierte los canales a listas de ids para serializar"""
+        return {nombre: canal.a_lista() for nombre, canal in self.canales.items()}
+    
+    @_con_lock
     def sincronizar_por_estado(self, estado_remoto: Dict[str, Any]) -> bool:
         """Sincroniza usando el estado completo de otro nodo"""
         cambios_realizados = False
+        mensajes_cambiados = 0
         usuario_remoto = estado_remoto.get('usuario_id')
         vector_clock_remoto = estado_remoto.get('vector_clock', {})
         mensajes_remotos = estado_remoto.get('mensajes', {})
@@ -359,43 +762,81 @@ class ChatCRDT:
                 self.vector_clock[node_id] = counter
                 cambios_realizados = True
         
-        # Sincronizar mensajes usando Last Writer Wins
+        # Con el mismo hash de Merkle los mensajes ya coinciden: no hay nada que decodificar
+        if mensajes_remotos and estado_remoto.get('hash_estado') == self.ultimo_estado_hash:
+            mensajes_remotos = {}
+        
+        # Sincronizar mensajes usando Last Writer Wins. Se compara sobre los
+        # datos crudos y solo se construye el Mensaje de los nuevos o más recientes
         for mensaje_id, mensaje_data in mensajes_remotos.items():
-            mensaje_remoto = Mensaje.from_dict(mensaje_data)
+            mensaje_local = self.mensajes.get(mensaje_id)
             
-            if mensaje_id not in self.mensajes:
+            if mensaje_local is None:
                 # Mensaje nuevo - SIEMPRE va al canal único
+                mensaje_remoto = Mensaje.from_dict(mensaje_data)
                 mensaje_remoto.canal = self.canal_unico  # Forzar canal único
-                self.mensajes[mensaje_id] = mensaje_remoto
+                self._guardar_mensaje(mensaje_remoto)
                 
-                # Agregar al canal único
-                if mensaje_id not in self.canales[self.canal_unico]:
-                    self.canales[self.canal_unico].append(mensaje_id)
+                # Agregar al canal único (solo se tocan los ids nuevos)
+                self.canales[self.canal_unico].agregar(mensaje_id)
                 
                 cambios_realizados = True
+                mensajes_cambiados += 1
                 
-            else:
-                # Mensaje existente - comparar timestamps
-                mensaje_local = self.mensajes[mensaje_id]
-                
-                if mensaje_remoto.timestamp > mensaje_local.timestamp:
-                    # El mensaje remoto es más reciente
-                    mensaje_remoto.canal = self.canal_unico  # Forzar canal único
-                    self.mensajes[mensaje_id] = mensaje_remoto
-                    cambios_realizados = True
-        
-        # Sincronizar canales - Solo el canal único
-        # Agregar todos los mensajes remotos al canal único
-        for mensaje_id in self.mensajes.keys():
-            if mensaje_id not in self.canales[self.canal_unico]:
-                self.canales[self.canal_unico].append(mensaje_id)
+            elif self._remoto_es_posterior(mensaje_data, mensaje_local):
+                # El mensaje remoto es más reciente
+                mensaje_remoto = Mensaje.from_dict(mensaje_data)
+                mensaje_remoto.canal = self.canal_unico  # Forzar canal único
+                self._guardar_mensaje(mensaje_remoto)
                 cambios_realizados = True
+                mensajes_cambiados += 1
+        
+        # El estado incluye el efecto de las operaciones que el remoto aplicó
+        # de forma contigua: cuentan como aplicadas, pero no están en el log
+        operaciones_avanzadas = 0
+        for node_id, counter in estado_remoto.get('resumen_operaciones', {}).items():
+            anterior = self.operaciones_aplicadas.watermarks.get(node_id, 0)
+            if self.operaciones_aplicadas.avanzar(node_id, counter):
+                self.piso_log[node_id] = max(self.piso_log.get(node_id, 0), counter)
+                operaciones_avanzadas += counter - anterior
+        
+        # Lo aprendido por estado no pasa por el log de operaciones: cuenta
+        # para el mismo umbral de snapshot que las operaciones, y cerrar()
+        # guarda lo que quede para que un reinicio no pida el estado otra vez
+        if self.log_persistente and (mensajes_cambiados or operaciones_avanzadas):
+            self._estado_sin_snapshot = True
+            self._operaciones_desde_snapshot += max(mensajes_cambiados, operaciones_avanzadas)
+            if self._operaciones_desde_snapshot >= self.intervalo_snapshot:
+                self.guardar_snapshot()
         
         if cambios_realizados:
             self._notificar_cambio()
             
         return cambios_realizados
     
+    @staticmethod
+    def _remoto_es_posterior(mensaje_data: Dict[str, Any], mensaje_local: Mensaje) -> bool:
+        """
+        Last Writer Wins por versión lógica, sobre los datos crudos del remoto.
+        Una versión gana siempre a los datos antiguos sin ella; entre dos
+        mensajes sin versión se compara el timestamp como antes.
+        """
+        version = mensaje_data.get('version')
+        local = mensaje_local.version
+        if version is None or local is None:
+            if version is not None or local is not None:
+                return version is not None
+            return datetime.fromisoformat(mensaje_data['timestamp']) > mensaje_local.timestamp
+        if version['counter'] != local.counter:
+            return version['counter'] > local.counter
+        return version['node_id'] > local.node_id
+    
     def _incrementar_vector_clock(self):
         """Incrementa el vector clock local"""
-        self.vector_clock[self.usuario_id] = self.vector_clock.get(self.usuario_id, 0) + 1
\ No newline at end of file
+        self.vector_clock[self.usuario_id] = self.vector_clock.get(self.usuario_id, 0) + 1
+    
+    def _generar_timestamp_operacion(self) -> Timestamp:
+        """Genera el timestamp de una operación local, alineado con el vector clock"""
+        self._incrementar_vector_clock()
+        self.crdt_map.counter = self.vector_clock[self.usuario_id]
+        return Timestamp(self.usuario_id, self.crdt_map.counter)
\ No newline at end of file
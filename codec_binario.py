@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Codificación binaria compacta de los mensajes de sincronización
+
+Las listas de operaciones (con el mensaje que llevan dentro) viajan como
+registros binarios en lugar de JSON: ids UUID en 16 bytes, timestamps en
+microsegundos desde la época (entero de 8 bytes), counters y longitudes
+como varint, y node_id/usuario/autor/canal como índices a una tabla de
+cadenas que se envía una sola vez. La versión de cada mensaje casi
+siempre es el timestamp de su operación, y entonces no se repite. El
+resto del mensaje (tipo, vector clocks, estado completo...) va en un
+sobre JSON, así que cualquier mensaje se puede codificar. Los mapas de
+mensajes del estado completo se quedan en JSON: convertirlos a dicts en
+Python puro es más lento que json.loads, y su tamaño ya lo reduce la
+compresión.
+
+Formato del payload:
+    [MAGIA: 2 bytes][VERSION: 1 byte][varint + sobre JSON][tabla de cadenas][secciones]
+El sobre lleva en '$binario' las rutas cuyos valores están en las secciones.
+"""
+
+import sys
+import json
+import struct
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+from chat_crdt import Mensaje, Operacion
+from crdt_base import Timestamp
+
+
+MAGIA = b'CB'
+VERSION = 1
+
+# Rutas de las listas de operaciones (sync_push, sync_delta y sync_data)
+RUTAS_OPERACIONES = (('operaciones',), ('datos', 'operaciones'))
+
+# Tipos de operación frecuentes en un byte; el resto viaja como cadena
+TIPOS_OPERACION = ('enviar_mensaje', 'editar_mensaje', 'eliminar_mensaje', 'crear_canal')
+CODIGO_TIPO = {tipo: codigo for codigo, tipo in enumerate(TIPOS_OPERACION)}
+TIPO_OTRO = 0xFF
+
+# Flags de un registro
+ID_UUID = 0x01  # El id viaja en 16 bytes
+TIMESTAMP_TEXTO = 0x02  # Timestamp con zona horaria: viaja en ISO 8601
+VALOR_NULO = 0x04  # Operación sin valor
+VALOR_MENSAJE = 0x08  # El valor es un mensaje serializado (Mensaje.to_dict)
+VALOR_JSON = 0x10  # Cualquier otro valor, en JSON
+ID_IGUAL_CLAVE = 0x20  # El mensaje del valor tiene como id la clave de la operación
+VERSION_OPERACION = 0x40  # La versión del mensaje es el timestamp de la operación
+VERSION_PROPIA = 0x80  # La versión del mensaje viaja aparte (nodo y counter)
+
+CAMPOS_MENSAJE = frozenset(('mensaje_id', 'contenido', 'autor', 'timestamp', 'canal'))
+CAMPOS_MENSAJE_VERSION = CAMPOS_MENSAJE | {'version'}
+
+EPOCA = datetime(1970, 1, 1)
+UN_MICROSEGUNDO = timedelta(microseconds=1)
+ENTERO_64 = struct.Struct('!q')
+VARINTS_CORTOS = tuple(bytes((n,)) for n in range(0x80))
+
+
+class ErrorCodec(ValueError):
+    """Payload binario mal formado"""
+    pass
+
+
+def _varint(valor: int) -> bytes:
+    if valor < 0x80:
+        return VARINTS_CORTOS[valor]
+    partes = bytearray()
+    while valor >= 0x80:
+        partes.append((valor & 0x7F) | 0x80)
+        valor >>= 7
+    partes.append(valor)
+    return bytes(partes)
+
+
+def _leer_varint(datos: bytes, posicion: int) -> Tuple[int, int]:
+    valor = 0
+    desplazamiento = 0
+    while True:
+        byte = datos[posicion]
+        posicion += 1
+        valor |= (byte & 0x7F) << desplazamiento
+        if byte < 0x80:
+            return valor, posicion
+        desplazamiento += 7
+
+
+def _uuid_compacto(valor: str):
+    """Los 16 bytes de un UUID en forma canónica, o None si no lo es"""
+    if len(valor) == 36 and valor[8] == valor[13] == valor[18] == valor[23] == '-' and valor.islower():
+        try:
+            crudo = bytes.fromhex(valor.replace('-', ''))
+        except ValueError:
+            return None
+        if len(crudo) == 16:
+            return crudo
+    return None
+
+
+def _uuid_texto(crudo: bytes) -> str:
+    h = crudo.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+class _Codificador:
+    """Escribe los registros en un bytearray y lleva la tabla de cadenas"""
+
+    def __init__(self):
+        self.salida = bytearray()
+        self.cadenas: Dict[str, int] = {}
+
+    def _indice(self, cadena: str) -> bytes:
+        indice = self.cadenas.get(cadena)
+        if indice is None:
+            indice = self.cadenas[cadena] = len(self.cadenas)
+        return _varint(indice)
+
+    def mensaje(self, datos: Dict[str, Any], flags: int = 0, clave: str = None,
+                timestamp_operacion: Timestamp = None):
+        """
+        Escribe un mensaje serializado; si su id es la clave dada o su versión
+        el timestamp de la operación, no se repiten
+        """
+        salida = self.salida
+        mensaje_id = datos['mensaje_id']
+        version = datos.get('version')
+        if version is not None:
+            if (timestamp_operacion is not None and version['counter'] == timestamp_operacion.counter
+                    and version['node_id'] == timestamp_operacion.node_id):
+                flags |= VERSION_OPERACION
+            else:
+                flags |= VERSION_PROPIA
+        timestamp = datetime.fromisoformat(datos['timestamp'])
+        if timestamp.tzinfo is not None:
+            flags |= TIMESTAMP_TEXTO
+        
+        crudo = None
+        if mensaje_id == clave:
+            flags |= ID_IGUAL_CLAVE
+        else:
+            crudo = _uuid_compacto(mensaje_id)
+            if crudo is not None:
+                flags |= ID_UUID
+        salida.append(flags)
+        if not flags & ID_IGUAL_CLAVE:
+            if crudo is not None:
+                salida += crudo
+            else:
+                texto = mensaje_id.encode('utf-8')
+                salida += _varint(len(texto))
+                salida += texto
+        
+        contenido = datos['contenido'].encode('utf-8')
+        salida += _varint(len(contenido))
+        salida += contenido
+        salida += self._indice(datos['autor'])
+        salida += self._indice(datos['canal'])
+        if flags & TIMESTAMP_TEXTO:
+            texto = datos['timestamp'].encode('utf-8')
+            salida += _varint(len(texto))
+            salida += texto
+        else:
+            salida += ENTERO_64.pack((timestamp - EPOCA) // UN_MICROSEGUNDO)
+        if flags & VERSION_PROPIA:
+            salida += self._indice(version['node_id'])
+            salida += _varint(version['counter'])
+
+    def operacion(self, operacion: Operacion):
+        salida = self.salida
+        codigo = CODIGO_TIPO.get(operacion.tipo, TIPO_OTRO)
+        valor = operacion.valor
+        if valor is None:
+            flags = VALOR_NULO
+        elif isinstance(valor, dict) and (valor.keys() == CAMPOS_MENSAJE or (
+                valor.keys() == CAMPOS_MENSAJE_VERSION and isinstance(valor['version'], dict))):
+            flags = VALOR_MENSAJE
+        else:
+            flags = VALOR_JSON
+        
+        clave = operacion.clave
+        crudo = _uuid_compacto(clave)
+        if crudo is not None:
+            flags |= ID_UUID
+        salida.append(codigo)
+        salida.append(flags)
+        if crudo is not None:
+            salida += crudo
+        else:
+            texto = clave.encode('utf-8')
+            salida += _varint(len(texto))
+            salida += texto
+        
+        if codigo == TIPO_OTRO:
+            salida += self._indice(operacion.tipo)
+        salida += self._indice(operacion.timestamp.node_id)
+        salida += _varint(operacion.timestamp.counter)
+        salida += self._indice(operacion.usuario)
+        
+        if flags & VALOR_MENSAJE:
+            self.mensaje(valor, clave=clave, timestamp_operacion=operacion.timestamp)
+        elif flags & VALOR_JSON:
+            texto = json.dumps(valor, separators=(',', ':')).encode('utf-8')
+            salida += _varint(len(texto))
+            salida += texto
+
+    def tabla(self) -> bytes:
+        partes = [_varint(len(self.cadenas))]
+        for cadena in self.cadenas:
+            texto = cadena.encode('utf-8')
+            partes.append(_varint(len(texto)))
+            partes.append(texto)
+        return b''.join(partes)
+
+
+class _Decodificador:
+    """Lee registros de un payload binario"""
+
+    def __init__(self, datos: bytes, posicion: int):
+        self.datos = datos
+        self.posicion = posicion
+        self.cadenas: List[str] = []
+
+    def varint(self) -> int:
+        byte = self.datos[self.posicion]
+        if byte < 0x80:
+            self.posicion += 1
+            return byte
+        valor, self.posicion = _leer_varint(self.datos, self.posicion)
+        return valor
+
+    def texto(self) -> str:
+        longitud = self.varint()
+        inicio = self.posicion
+        self.posicion = fin = inicio + longitud
+        if fin > len(self.datos):
+            raise IndexError
+        return self.datos[inicio:fin].decode('utf-8')
+
+    def mensaje(self, clave: str = None, timestamp_operacion: Timestamp = None) -> Dict[str, Any]:
+        datos = self.datos
+        cadenas = self.cadenas
+        posicion = self.posicion
+        flags = datos[posicion]
+        posicion += 1
+        
+        if flags & ID_IGUAL_CLAVE:
+            mensaje_id = clave
+        elif flags & ID_UUID:
+            mensaje_id = _uuid_texto(datos[posicion:posicion + 16])
+            posicion += 16
+        else:
+            self.posicion = posicion
+            mensaje_id = self.texto()
+            posicion = self.posicion
+        
+        longitud = datos[posicion]
+        if longitud < 0x80:
+            posicion += 1
+        else:
+            longitud, posicion = _leer_varint(datos, posicion)
+        contenido = datos[posicion:posicion + longitud].decode('utf-8')
+        posicion += longitud
+        
+        self.posicion = posicion
+        autor = cadenas[self.varint()]
+        canal = cadenas[self.varint()]
+        if flags & TIMESTAMP_TEXTO:
+            timestamp = self.texto()
+        else:
+            posicion = self.posicion
+            micros = ENTERO_64.unpack_from(datos, posicion)[0]
+            self.posicion = posicion + 8
+            timestamp = (EPOCA + micros * UN_MICROSEGUNDO).isoformat()
+        
+        mensaje = {
+            'mensaje_id': mensaje_id,
+            'contenido': contenido,
+            'autor': autor,
+            'timestamp': timestamp,
+            'canal': canal
+        }
+        if flags & VERSION_OPERACION:
+            mensaje['version'] = {'node_id': timestamp_operacion.node_id,
+                                  'counter': timestamp_operacion.counter}
+        elif flags & VERSION_PROPIA:
+            node_id = cadenas[self.varint()]
+            mensaje['version'] = {'node_id': node_id, 'counter': self.varint()}
+        return mensaje
+
+    def operacion(self) -> Operacion:
+        datos = self.datos
+        cadenas = self.cadenas
+        posicion = self.posicion
+        codigo = datos[posicion]
+        flags = datos[posicion + 1]
+        posicion += 2
+        
+        if flags & ID_UUID:
+            clave = _uuid_texto(datos[posicion:posicion + 16])
+            self.posicion = posicion + 16
+        else:
+            self.posicion = posicion
+            clave = self.texto()
+        
+        if codigo == TIPO_OTRO:
+            tipo = cadenas[self.varint()]
+        else:
+            tipo = TIPOS_OPERACION[codigo]
+        node_id = cadenas[self.varint()]
+        counter = self.varint()
+        usuario = cadenas[self.varint()]
+        
+        timestamp = Timestamp(node_id, counter)
+        if flags & VALOR_MENSAJE:
+            valor = self.mensaje(clave, timestamp)
+        elif flags & VALOR_JSON:
+            valor = json.loads(self.texto())
+        else:
+            valor = None
+        return Operacion(tipo, clave, valor, timestamp, usuario)
+
+
+def _serializar_objeto(objeto):
+    """default de json.dumps para los objetos que quedan en el sobre"""
+    if isinstance(objeto, (Operacion, Mensaje)):
+        return objeto.to_dict()
+    raise TypeError(f"No serializable: {type(objeto).__name__}")
+
+
+def _obtener(mensaje: Dict, ruta: Tuple[str, ...]):
+    valor = mensaje
+    for clave in ruta:
+        if not isinstance(valor, dict) or clave not in valor:
+            return None
+        valor = valor[clave]
+    return valor
+
+
+def _reemplazar(mensaje: Dict, ruta: Tuple[str, ...], valor) -> Dict:
+    """Copia superficial de los dicts de la ruta con el valor reemplazado"""
+    copia = dict(mensaje)
+    if len(ruta) == 1:
+        copia[ruta[0]] = valor
+    else:
+        copia[ruta[0]] = _reemplazar(mensaje[ruta[0]], ruta[1:], valor)
+    return copia
+
+
+def codificar_mensaje(mensaje: Dict[str, Any]) -> bytes:
+    """Codifica un mensaje de red; las operaciones pueden ser objetos Operacion o dicts"""
+    codificador = _Codificador()
+    secciones = []
+    sobre = mensaje
+    
+    for ruta in RUTAS_OPERACIONES:
+        operaciones = _obtener(mensaje, ruta)
+        if isinstance(operaciones, list):
+            codificador.salida += _varint(len(operaciones))
+            for operacion in operaciones:
+                if not isinstance(operacion, Operacion):
+                    operacion = Operacion.from_dict(operacion)
+                codificador.operacion(operacion)
+            sobre = _reemplazar(sobre, ruta, None)
+            secciones.append(list(ruta))
+    
+    if secciones:
+        sobre = dict(sobre, **{'$binario': secciones})
+    cabecera = json.dumps(sobre, separators=(',', ':'), default=_serializar_objeto).encode('utf-8')
+    
+    return b''.join([MAGIA, bytes((VERSION,)), _varint(len(cabecera)), cabecera,
+                     codificador.tabla(), codificador.salida])
+
+
+def decodificar_mensaje(payload) -> Dict[str, Any]:
+    """Decodifica un payload binario; las operaciones quedan como objetos Operacion"""
+    datos = bytes(payload)
+    if datos[:2] != MAGIA:
+        raise ErrorCodec("Payload binario sin la marca esperada")
+    if len(datos) < 3 or datos[2] != VERSION:
+        raise ErrorCodec(f"Versión de codificación no soportada: {datos[2:3]!r}")
+    
+    decodificador = _Decodificador(datos, 3)
+    try:
+        mensaje = json.loads(decodificador.texto())
+        decodificador.cadenas = [sys.intern(decodificador.texto()) for _ in range(decodificador.varint())]
+        
+        for ruta in mensaje.pop('$binario', ()):
+            valor = [decodificador.operacion() for _ in range(decodificador.varint())]
+            destino = mensaje
+            for clave in ruta[:-1]:
+                destino = destino[clave]
+            destino[ruta[-1]] = valor
+    except (IndexError, KeyError, TypeError, ValueError, struct.error) as e:
+        raise ErrorCodec(f"Payload binario mal formado: {e}")
+    
+    if decodificador.posicion != len(datos):
+        raise ErrorCodec("Bytes sobrantes al final del payload binario")
+    return mensaje
\ No newline at end of file
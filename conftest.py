@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Utilidades compartidas por los tests
+
+pytest carga este módulo antes de los tests; los ficheros de test lo
+importan también con `from conftest import ...`, así siguen funcionando
+al ejecutarlos directamente con python.
+"""
+
+import time
+from sincronizacion_chat import ClienteP2PChat
+from protocolo_red import preparar_payload, interpretar_payload
+
+
+def conectar_en_memoria(cliente: ClienteP2PChat, remoto: ClienteP2PChat, nodo_id: str) -> list:
+    """Hace que las peticiones de cliente las atienda remoto directamente; devuelve el tráfico"""
+    trafico = []
+    
+    def solicitar(_nodo_id, mensaje, limite=None):
+        # Mismo camino que por la red: binario para las operaciones, JSON para lo demás
+        peticion, flags = preparar_payload(mensaje, binario=True)
+        respuesta, flags_respuesta = preparar_payload(
+            remoto._procesar_mensaje(interpretar_payload(peticion, flags)), binario=True)
+        trafico.append((mensaje['tipo'], len(peticion) + len(respuesta)))
+        return interpretar_payload(respuesta, flags_respuesta)
+    
+    cliente._solicitar = solicitar
+    cliente.conexiones_activas[nodo_id] = None
+    return trafico
+
+
+def esperar(condicion, timeout: float = 10.0) -> bool:
+    """Espera a que la condición se cumpla, consultándola cada 50 ms hasta el timeout"""
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if condicion():
+            return True
+        time.sleep(0.05)
+    return condicion()
\ No newline at end of file
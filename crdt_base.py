@@ -4,13 +4,14 @@ Implementación base de CRDTs (Conflict-free Replicated Data Types)
 
 import time
 import uuid
-from typing import Dict, Any, Tuple, Optional
+from bisect import bisect_right
+from typing import Dict, Any, Tuple, Optional, Set, List, Union, Iterator
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Timestamp:
-    """Timestamp vectorial para ordenamiento de operaciones"""
+    """Timestamp vectorial para ordenamiento de operaciones (inmutable, sin __dict__)"""
     node_id: str
     counter: int
     
@@ -23,9 +24,9 @@ class Timestamp:
         return self.counter == other.counter and self.node_id == other.node_id
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Operation:
-    """Operación en el CRDT"""
+    """Operación en el CRDT (inmutable, sin __dict__)"""
     timestamp: Timestamp
     operation_type: str
     key: Tuple[int, int]  # Posición (fila, columna)
@@ -33,6 +34,173 @@ class Operation:
     author: str
 
 
+class RegistroOperaciones:
+    """
+    Registro de operaciones ya aplicadas, indexado por nodo.
+    Por cada nodo guarda un watermark contiguo (todas las operaciones con
+    counter <= watermark fueron aplicadas) y un conjunto disperso con las
+    que llegaron fuera de orden. Las consultas son O(1).
+    """
+    
+    def __init__(self):
+        self.watermarks: Dict[str, int] = {}
+        self.dispersos: Dict[str, Set[int]] = {}
+    
+    def contiene(self, timestamp: Timestamp) -> bool:
+        """Indica si la operación con este timestamp ya fue aplicada"""
+        if timestamp.counter <= self.watermarks.get(timestamp.node_id, 0):
+            return True
+        return timestamp.counter in self.dispersos.get(timestamp.node_id, ())
+    
+    def registrar(self, timestamp: Timestamp) -> bool:
+        """Registra una operación como aplicada. Devuelve False si ya lo estaba"""
+        node_id = timestamp.node_id
+        counter = timestamp.counter
+        watermark = self.watermarks.get(node_id, 0)
+        
+        if counter <= watermark:
+            return False
+        
+        huecos = self.dispersos.get(node_id)
+        if counter != watermark + 1:
+            # Llegó fuera de orden: queda en el conjunto disperso
+            if huecos is None:
+                huecos = self.dispersos[node_id] = set()
+            elif counter in huecos:
+                return False
+            huecos.add(counter)
+            return True
+        
+        # Avanzar el watermark absorbiendo los huecos que se completan
+        watermark = counter
+        if huecos:
+            while watermark + 1 in huecos:
+                watermark += 1
+                huecos.remove(watermark)
+            if not huecos:
+                del self.dispersos[node_id]
+        
+        self.watermarks[node_id] = watermark
+        return True
+    
+    def avanzar(self, node_id: str, counter: int) -> bool:
+        """
+        Marca como aplicadas todas las operaciones de un nodo hasta counter
+        (p.ej. cuyo efecto llegó en un estado completo). Devuelve False si
+        el watermark ya lo cubría.
+        """
+        if counter <= self.watermarks.get(node_id, 0):
+            return False
+        
+        watermark = counter
+        huecos = {c for c in self.dispersos.pop(node_id, ()) if c > counter}
+        while watermark + 1 in huecos:
+            watermark += 1
+            huecos.remove(watermark)
+        if huecos:
+            self.dispersos[node_id] = huecos
+        
+        self.watermarks[node_id] = watermark
+        return True
+    
+    def watermark(self, node_id: str) -> int:
+        """Obtiene el mayor counter contiguo aplicado de un nodo"""
+        return self.watermarks.get(node_id, 0)
+    
+    def resumen(self) -> Dict[str, int]:
+        """Obtiene los watermarks de todos los nodos (útil como resumen de sincronización)"""
+        return self.watermarks.copy()
+    
+    def maximo(self, node_id: str) -> int:
+        """Obtiene el mayor counter aplicado de un nodo, contando los dispersos"""
+        return max(self.dispersos.get(node_id, ()), default=self.watermark(node_id))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'watermarks': self.watermarks.copy(),
+            'dispersos': {node_id: sorted(counters) for node_id, counters in self.dispersos.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RegistroOperaciones':
+        registro = cls()
+        registro.watermarks = dict(data.get('watermarks', {}))
+        registro.dispersos = {node_id: set(counters) for node_id, counters in data.get('dispersos', {}).items()}
+        return registro
+
+
+class LogPorNodo:
+    """
+    Log de operaciones particionado por nodo y ordenado por counter.
+    Lo que le falta a un vector clock se obtiene con una búsqueda binaria
+    por nodo: O(nodos * log n + faltantes) en lugar de recorrer todo el log.
+    Sirve para cualquier operación con atributo timestamp (Operation, Operacion).
+    """
+    
+    def __init__(self):
+        self._operaciones: Dict[str, List[Any]] = {}
+        self._counters: Dict[str, List[int]] = {}
+        self._total = 0
+    
+    def agregar(self, operacion: Any):
+        """Agrega una operación manteniendo el orden por counter de su nodo"""
+        node_id = operacion.timestamp.node_id
+        counter = operacion.timestamp.counter
+        counters = self._counters.get(node_id)
+        if counters is None:
+            counters = self._counters[node_id] = []
+            self._operaciones[node_id] = []
+        
+        if not counters or counter >= counters[-1]:
+            # Caso habitual: las operaciones de un nodo llegan en orden
+            counters.append(counter)
+            self._operaciones[node_id].append(operacion)
+        else:
+            posicion = bisect_right(counters, counter)
+            counters.insert(posicion, counter)
+            self._operaciones[node_id].insert(posicion, operacion)
+        self._total += 1
+    
+    def desde(self, vector_clock: Dict[str, int]) -> List[Any]:
+        """Obtiene las operaciones con counter mayor al del vector clock, por nodo"""
+        faltantes = []
+        for node_id, counters in self._counters.items():
+            inicio = bisect_right(counters, vector_clock.get(node_id, 0))
+            faltantes.extend(self._operaciones[node_id][inicio:])
+        return faltantes
+    
+    def maximo_hasta(self, node_id: str, counter: int) -> int:
+        """Obtiene el mayor counter de un nodo en el log que no supera counter (0 si no hay)"""
+        counters = self._counters.get(node_id, ())
+        posicion = bisect_right(counters, counter)
+        return counters[posicion - 1] if posicion else 0
+    
+    def compactar(self, estables: Dict[str, int]) -> int:
+        """Descarta las operaciones con counter <= estables[node_id]. Devuelve cuántas"""
+        descartadas = 0
+        for node_id, counter in estables.items():
+            counters = self._counters.get(node_id)
+            if not counters:
+                continue
+            fin = bisect_right(counters, counter)
+            if fin:
+                del counters[:fin]
+                del self._operaciones[node_id][:fin]
+                descartadas += fin
+            if not counters:
+                del self._counters[node_id]
+                del self._operaciones[node_id]
+        self._total -= descartadas
+        return descartadas
+    
+    def __iter__(self) -> Iterator[Any]:
+        for operaciones in list(self._operaciones.values()):
+            yield from operaciones
+    
+    def __len__(self) -> int:
+        return self._total
+
+
 class CRDTMap:
     """
     CRDT tipo mapa para manejar el estado distribuido del crucigrama
@@ -44,7 +212,7 @@ class CRDTMap:
         self.counter = 0
         self.data: Dict[Tuple[int, int], Any] = {}
         self.timestamps: Dict[Tuple[int, int], Timestamp] = {}
-        self.operation_log = []
+        self.operation_log = LogPorNodo()
     
     def _generate_timestamp(self) -> Timestamp:
         """Genera un nuevo timestamp"""
@@ -74,7 +242,7 @@ class CRDTMap:
                 self.timestamps[key] = operation.timestamp
         
         # Agregar al log de operaciones
-        self.operation_log.append(operation)
+        self.operation_log.agregar(operation)
     
     def merge(self, operations: list):
         """Merge operaciones desde otros nodos"""
@@ -82,9 +250,24 @@ class CRDTMap:
             if operation.timestamp.node_id != self.node_id:
                 self._apply_operation(operation)
     
-    def get_operations_since(self, timestamp: Optional[Timestamp] = None) -> list:
-        """Obtiene operaciones desde un timestamp dado"""
-        if timestamp is None:
-            return self.operation_log.copy()
+    def compactar(self, estables: Dict[str, int]) -> int:
+        """
+        Descarta del log las operaciones que todas las réplicas ya vieron
+        (counter <= estables[node_id]); el estado queda en data/timestamps.
+        Devuelve cuántas operaciones se descartaron.
+        """
+        return self.operation_log.compactar(estables)
+    
+    def get_operations_since(self, desde: Optional[Union[Timestamp, Dict[str, int]]] = None) -> list:
+        """
+        Obtiene operaciones posteriores a un vector clock (node_id -> counter),
+        es decir, las que le faltan a quien tiene ese vector clock.
+        También acepta un Timestamp (orden total, recorre todo el log).
+        """
+        if desde is None:
+            return list(self.operation_log)
+        
+        if isinstance(desde, dict):
+            return self.operation_log.desde(desde)
         
-        return [op for op in self.operation_log if op.timestamp > timestamp]
\ No newline at end of file
+        return [op for op in self.operation_log if op.timestamp > desde]
\ No newline at end of file
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Estadísticas del chat mantenidas de forma incremental
+
+EstadisticasChat se actualiza cada vez que se guarda un mensaje (local o
+remoto), así que leer los contadores no recorre el historial: total de
+mensajes y de eliminados, y mensajes por día y por autor, que
+ChatCRDT.obtener_estadisticas expone (la actividad reciente de cada
+usuario la lleva RegistroPresencia).
+El id y el timestamp de un mensaje no cambian al editarlo o eliminarlo,
+de modo que solo el primer guardado de cada id suma a los histogramas.
+"""
+
+from collections import Counter
+
+
+TEXTO_ELIMINADO = "[Mensaje eliminado]"
+
+
+class EstadisticasChat:
+    """Contadores e histogramas de los mensajes, actualizados al escribir"""
+
+    def __init__(self):
+        self.total_mensajes = 0
+        self.mensajes_eliminados = 0
+        self.por_dia: Counter = Counter()  # date -> mensajes
+        self.por_autor: Counter = Counter()  # autor -> mensajes
+
+    def registrar(self, mensaje, anterior=None):
+        """Cuenta un mensaje guardado; anterior es la versión a la que reemplaza"""
+        if anterior is None:
+            self.total_mensajes += 1
+            self.por_dia[mensaje.timestamp.date()] += 1
+            self.por_autor[mensaje.autor] += 1
+
+        eliminado = mensaje.contenido == TEXTO_ELIMINADO
+        if eliminado != (anterior is not None and anterior.contenido == TEXTO_ELIMINADO):
+            self.mensajes_eliminados += 1 if eliminado else -1
\ No newline at end of file
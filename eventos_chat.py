@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Eventos de cambio del chat
+
+ChatCRDT describe cada cambio de un mensaje con un EventoCambio (agregado,
+editado o eliminado, con su id y versión) y entrega a sus suscriptores
+listas de eventos: uno por operación local y uno solo por sincronización,
+con todo lo que cambió en ella. SuscripcionAsync permite recorrer esos
+lotes con `async for` desde un event loop, aunque los cambios se
+produzcan en otros hilos.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import List, Optional
+from crdt_base import Timestamp
+
+
+# Tipos de evento
+MENSAJE_AGREGADO = "mensaje_agregado"
+MENSAJE_EDITADO = "mensaje_editado"
+MENSAJE_ELIMINADO = "mensaje_eliminado"
+
+
+@dataclass(frozen=True, slots=True)
+class EventoCambio:
+    """Cambio de un mensaje (inmutable, sin __dict__)"""
+    tipo: str
+    mensaje_id: str
+    version: Optional[Timestamp]
+
+
+class SuscripcionAsync:
+    """
+    Iterador asíncrono de lotes de eventos de un chat.
+    Se crea desde un event loop en marcha (chat.suscribir_eventos_async())
+    y deja de recibir al cerrarse.
+    """
+
+    def __init__(self, chat, maximo_lotes: int = 0):
+        self.chat = chat
+        self._loop = asyncio.get_running_loop()
+        self._cola: asyncio.Queue = asyncio.Queue(maximo_lotes)
+        self._cerrada = False
+        chat.agregar_suscriptor_cambios(self._recibir)
+
+    def _recibir(self, eventos: List[EventoCambio]):
+        # Puede llamarse desde cualquier hilo: la cola solo se toca en el loop
+        self._loop.call_soon_threadsafe(self._encolar, eventos)
+
+    def _encolar(self, eventos: List[EventoCambio]):
+        if self._cerrada:
+            return
+        if self._cola.full():
+            # Un consumidor lento pierde el lote más antiguo, no bloquea al chat
+            self._cola.get_nowait()
+        self._cola.put_nowait(eventos)
+
+    def cerrar(self):
+        """Deja de recibir eventos y termina la iteración"""
+        if self._cerrada:
+            return
+        self._cerrada = True
+        self.chat.quitar_suscriptor_cambios(self._recibir)
+        if self._cola.full():
+            self._cola.get_nowait()
+        self._cola.put_nowait(None)
+
+    def __aiter__(self) -> 'SuscripcionAsync':
+        return self
+
+    async def __anext__(self) -> List[EventoCambio]:
+        if self._cerrada and self._cola.empty():
+            raise StopAsyncIteration
+        eventos = await self._cola.get()
+        if eventos is None:
+            raise StopAsyncIteration
+        return eventos
+
+    async def __aenter__(self) -> 'SuscripcionAsync':
+        return self
+
+    async def __aexit__(self, *_):
+        self.cerrar()
\ No newline at end of file
@@ -9,14 +9,17 @@ import threading
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from chat_crdt import ChatCRDT, Mensaje
-from sincronizacion_chat import ClienteP2PChat
+from eventos_chat import EventoCambio
+from sincronizacion_chat import crear_cliente_p2p
 from descubrimiento_nodos import InfoNodo
+from vista_mensajes import VistaMensajes, QUITAR, REEMPLAZAR, INSERTAR
+from planificador_refresco import PlanificadorRefresco
 
 
 class ChatGUI:
     """Interfaz gráfica principal del chat cooperativo"""
     
-    def __init__(self):
+    def __init__(self, modo_red: str = "hilos"):
         self.root = tk.Tk()
         self.root.title("💬 Chat Cooperativo - CRDT")
         self.root.geometry("1000x700")
@@ -29,17 +32,20 @@ class ChatGUI:
             
         self.usuario_id = nombre_usuario
         self.chat = ChatCRDT(self.usuario_id)
-        self.chat.establecer_callback_cambio(self._actualizar_interfaz)
+        self.chat.agregar_suscriptor_cambios(self._actualizar_interfaz)
         
         # Estado de la interfaz - usando canal único
         self.canal_actual = "chat"
         self.mensaje_seleccionado = None
+        # Mensajes dibujados: solo se tocan los que cambian
+        self.vista_mensajes = VistaMensajes()
         
         # Cliente P2P
-        self.cliente_p2p = ClienteP2PChat(
+        self.cliente_p2p = crear_cliente_p2p(
             self.chat,
             nombre_usuario=nombre_usuario,
-            habilitar_autodescubrimiento=True
+            habilitar_autodescubrimiento=True,
+            modo=modo_red
         )
         
         # Configurar callbacks para nodos
@@ -50,6 +56,14 @@ class ChatGUI:
         
         self._crear_interfaz()
         
+        # Un refresco por frame como mucho, solo de los paneles que cambiaron
+        self.planificador = PlanificadorRefresco(self.root.after)
+        self.planificador.registrar("mensajes", self._actualizar_mensajes)
+        self.planificador.registrar("info", self._actualizar_chat_info)
+        self.planificador.registrar("nodos", self._actualizar_lista_nodos)
+        self.planificador.registrar("usuarios", self._actualizar_usuarios_activos)
+        self.planificador.registrar("estadisticas", self._actualizar_estadisticas)
+        
         # Iniciar cliente P2P
         self.cliente_p2p.iniciar()
         
@@ -383,6 +397,10 @@ class ChatGUI:
             self.text_mensajes.config(state=tk.NORMAL)
             self.text_mensajes.delete("1.0", tk.END)
             self.text_mensajes.config(state=tk.DISABLED)
+            for tag in self.text_mensajes.tag_names():
+                if tag.startswith("msg_"):
+                    self.text_mensajes.tag_delete(tag)
+            self.vista_mensajes.reiniciar()
             
     def _exportar_chat(self):
         """Exporta el chat actual"""
@@ -448,35 +466,66 @@ class ChatGUI:
         self._actualizar_chat_info()
                 
     def _actualizar_mensajes(self):
-        """Actualiza la visualización de mensajes"""
-        mensajes = self.chat.obtener_mensajes_canal(self.canal_actual)
+        """Actualiza la visualización de mensajes (solo los que cambiaron)"""
+        ventana = self.chat.obtener_mensajes_canal(self.canal_actual, limite=self.vista_mensajes.limite)
+        cambios = self.vista_mensajes.diferencias(ventana)
+        if not cambios:
+            return
         
         self.text_mensajes.config(state=tk.NORMAL)
-        self.text_mensajes.delete("1.0", tk.END)
-        
-        for mensaje in mensajes:
-            # Timestamp
-            fecha_str = mensaje.timestamp.strftime("%H:%M")
-            self.text_mensajes.insert(tk.END, f"[{fecha_str}] ", "timestamp")
-            
-            # Autor
-            if mensaje.autor == self.usuario_id:
-                tag = "usuario_local"
-            else:
-                tag = "usuario_remoto"
-            
-            self.text_mensajes.insert(tk.END, f"{mensaje.autor}: ", tag)
-            
-            # Contenido
-            if "[Mensaje eliminado]" in mensaje.contenido:
-                self.text_mensajes.insert(tk.END, mensaje.contenido + "\n", "eliminado")
-            elif mensaje.contenido.startswith("🎉"):
-                self.text_mensajes.insert(tk.END, mensaje.contenido + "\n", "sistema")
-            else:
-                self.text_mensajes.insert(tk.END, mensaje.contenido + "\n")
+        insertados_al_final = False
+        
+        for tipo, mensaje_id, mensaje in cambios:
+            if tipo == QUITAR:
+                self._quitar_mensaje(mensaje_id)
+            elif tipo == REEMPLAZAR:
+                # Se quita el viejo y se dibuja el nuevo en la posición que ocupaba
+                inicio = self.text_mensajes.index(f"msg_{mensaje_id}.first")
+                self._quitar_mensaje(mensaje_id)
+                self._insertar_mensaje(inicio, mensaje)
+            elif tipo == INSERTAR:
+                if mensaje_id is None:
+                    self._insertar_mensaje(tk.END, mensaje)
+                    insertados_al_final = True
+                else:
+                    self._insertar_mensaje(self.text_mensajes.index(f"msg_{mensaje_id}.first"), mensaje)
         
         self.text_mensajes.config(state=tk.DISABLED)
-        self.text_mensajes.see(tk.END)
+        if insertados_al_final:
+            self.text_mensajes.see(tk.END)
+    
+    def _insertar_mensaje(self, indice, mensaje: Mensaje):
+        """Dibuja un mensaje en el índice dado, marcado con un tag por su id"""
+        tag_mensaje = f"msg_{mensaje.mensaje_id}"
+        
+        # Autor
+        if mensaje.autor == self.usuario_id:
+            tag = "usuario_local"
+        else:
+            tag = "usuario_remoto"
+        
+        # Contenido
+        if "[Mensaje eliminado]" in mensaje.contenido:
+            tag_contenido = ("eliminado", tag_mensaje)
+        elif mensaje.contenido.startswith("🎉"):
+            tag_contenido = ("sistema", tag_mensaje)
+        else:
+            tag_contenido = (tag_mensaje,)
+        
+        # Un solo insert con pares texto/tags: el índice no se desplaza entre partes
+        fecha_str = mensaje.timestamp.strftime("%H:%M")
+        self.text_mensajes.insert(indice,
+                                  f"[{fecha_str}] ", ("timestamp", tag_mensaje),
+                                  f"{mensaje.autor}: ", (tag, tag_mensaje),
+                                  mensaje.contenido + "\n", tag_contenido)
+    
+    def _quitar_mensaje(self, mensaje_id: str):
+        """Borra el texto de un mensaje dibujado"""
+        tag_mensaje = f"msg_{mensaje_id}"
+        rango = self.text_mensajes.tag_ranges(tag_mensaje)
+        if rango:
+            self.text_mensajes.delete(rango[0], rango[-1])
+        self.text_mensajes.tag_delete(tag_mensaje)
         
     def _actualizar_estadisticas(self):
         """Actualiza las estadísticas"""
@@ -486,8 +535,13 @@ class ChatGUI:
         texto = f"📊 ESTADÍSTICAS DEL CHAT\n\n"
         texto += f"Mensajes totales: {stats['total_mensajes']}\n"
         texto += f"Mensajes hoy: {stats['mensajes_hoy']}\n"
+        texto += f"Últimos 10 minutos: {stats['mensajes_ultimos_10_min']}\n"
+        texto += f"Eliminados: {stats['mensajes_eliminados']}\n"
         texto += f"Canales activos: {stats['canales_activos']}\n"
-        texto += f"Usuarios activos: {stats['usuarios_activos']}\n\n"
+        texto += f"Usuarios activos: {stats['usuarios_activos']}\n"
+        for autor, cantidad in list(stats['mensajes_por_autor'].items())[:5]:
+            texto += f"  {autor}: {cantidad}\n"
+        texto += "\n"
         
         texto += f"🌐 CONEXIÓN P2P\n\n"
         texto += f"Puerto local: {stats_conexion['puerto_local']}\n"
@@ -512,7 +566,7 @@ class ChatGUI:
         self.listbox_usuarios.delete(0, tk.END)
         
         for usuario in usuarios:
-            estado = "🟢" if usuario in [n.nombre_usuario for n in self.cliente_p2p.obtener_nodos_descubiertos()] else "⚪"
+            estado = "🟢" if self.chat.presencia.esta_conectado(usuario) else "⚪"
             if usuario == self.usuario_id:
                 estado = "👤"  # Usuario actual
             
@@ -541,26 +595,17 @@ class ChatGUI:
             
     def _nodo_conectado(self, nodo: InfoNodo):
         """Callback cuando se conecta un nodo"""
-        self.root.after(0, lambda: [
-            self._actualizar_lista_nodos(),
-            self.barra_estado.config(text=f"Nodo conectado: {nodo.nombre_usuario}")
-        ])
+        self.root.after(0, lambda: self.barra_estado.config(text=f"Nodo conectado: {nodo.nombre_usuario}"))
+        self.planificador.marcar("nodos", "usuarios", "estadisticas")
         
     def _nodo_desconectado(self, nodo: InfoNodo):
         """Callback cuando se desconecta un nodo"""
-        self.root.after(0, lambda: [
-            self._actualizar_lista_nodos(),
-            self.barra_estado.config(text=f"Nodo desconectado: {nodo.nombre_usuario}")
-        ])
-        
-    def _actualizar_interfaz(self):
-        """Callback para actualizar la interfaz cuando cambia el CRDT"""
-        self.root.after(0, lambda: [
-            self._actualizar_mensajes(),
-            self._actualizar_chat_info(),
-            self._actualizar_usuarios_activos(),
-            self._actualizar_estadisticas()
-        ])
+        self.root.after(0, lambda: self.barra_estado.config(text=f"Nodo desconectado: {nodo.nombre_usuario}"))
+        self.planificador.marcar("nodos", "usuarios", "estadisticas")
+        
+    def _actualizar_interfaz(self, eventos: List[EventoCambio]):
+        """Suscriptor de los cambios de mensajes del CRDT: se agrupan en el próximo frame"""
+        self.planificador.marcar("mensajes", "info", "usuarios", "estadisticas")
         
     def ejecutar(self):
         """Ejecuta la aplicación"""
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Índices auxiliares del chat, mantenidos incrementalmente por ChatCRDT
+"""
+
+import re
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, List, Set, Tuple, Iterable, Iterator, Optional
+
+
+PATRON_TOKEN = re.compile(r'\w+')
+
+
+class CanalMensajes:
+    """
+    Ids de los mensajes de un canal: conserva el orden de inserción
+    y permite comprobar pertenencia en O(1)
+    """
+
+    def __init__(self, ids: Optional[Iterable[str]] = None):
+        self._ids: Dict[str, None] = dict.fromkeys(ids or ())
+
+    def agregar(self, mensaje_id: str) -> bool:
+        """Agrega un id al canal. Devuelve False si ya estaba"""
+        if mensaje_id in self._ids:
+            return False
+        self._ids[mensaje_id] = None
+        return True
+
+    def a_lista(self) -> List[str]:
+        """Obtiene los ids como lista (p.ej. para serializar)"""
+        return list(self._ids)
+
+    def __contains__(self, mensaje_id: str) -> bool:
+        return mensaje_id in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class LineaTemporal:
+    """
+    Índice de mensajes ordenado por timestamp.
+    Las claves (timestamp, secuencia, mensaje_id) se mantienen ordenadas: la
+    búsqueda de la posición es O(log n) y el caso habitual (mensaje más
+    reciente) es un append. Las lecturas de rango son O(log n + k).
+    La secuencia de inserción desempata timestamps iguales.
+    """
+
+    def __init__(self):
+        self._claves: List[Tuple[datetime, int, str]] = []
+        self._por_id: Dict[str, Tuple[datetime, int, str]] = {}
+        self._secuencia = 0
+
+    def insertar(self, mensaje_id: str, timestamp: datetime):
+        """Inserta un mensaje, o lo reubica si cambió su timestamp"""
+        anterior = self._por_id.get(mensaje_id)
+        if anterior is not None:
+            if anterior[0] == timestamp:
+                return
+            self._quitar(anterior)
+
+        self._secuencia += 1
+        clave = (timestamp, self._secuencia, mensaje_id)
+        if not self._claves or clave > self._claves[-1]:
+            self._claves.append(clave)
+        else:
+            insort(self._claves, clave)
+        self._por_id[mensaje_id] = clave
+
+    def eliminar(self, mensaje_id: str):
+        """Quita un mensaje del índice"""
+        clave = self._por_id.pop(mensaje_id, None)
+        if clave is not None:
+            self._quitar(clave)
+
+    def _quitar(self, clave: Tuple[datetime, int, str]):
+        posicion = bisect_left(self._claves, clave)
+        if posicion < len(self._claves) and self._claves[posicion] == clave:
+            del self._claves[posicion]
+
+    def ultimos(self, k: int) -> List[str]:
+        """Obtiene los ids de los k mensajes más recientes, en orden cronológico"""
+        if k <= 0:
+            return []
+        return [clave[2] for clave in self._claves[-k:]]
+
+    def entre(self, desde: Optional[datetime] = None, hasta: Optional[datetime] = None) -> List[str]:
+        """Obtiene los ids de los mensajes con desde <= timestamp <= hasta"""
+        inicio, fin = self._rango(desde, hasta)
+        return [clave[2] for clave in self._claves[inicio:fin]]
+
+    def contar_entre(self, desde: Optional[datetime] = None, hasta: Optional[datetime] = None) -> int:
+        """Cuenta los mensajes con desde <= timestamp <= hasta sin materializarlos"""
+        inicio, fin = self._rango(desde, hasta)
+        return max(0, fin - inicio)
+
+    def _rango(self, desde: Optional[datetime], hasta: Optional[datetime]) -> Tuple[int, int]:
+        inicio = 0 if desde is None else bisect_left(self._claves, desde, key=lambda c: c[0])
+        fin = len(self._claves) if hasta is None else bisect_right(self._claves, hasta, key=lambda c: c[0])
+        return inicio, fin
+
+    def __contains__(self, mensaje_id: str) -> bool:
+        return mensaje_id in self._por_id
+
+    def __iter__(self) -> Iterator[str]:
+        return (clave[2] for clave in self._claves)
+
+    def __len__(self) -> int:
+        return len(self._claves)
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido para búsqueda de texto en mensajes.
+    Se indexan las palabras completas (contenido y autor) y se mantiene el
+    vocabulario ordenado. Cada palabra de la query es subcadena de alguna
+    palabra del mensaje, y según dónde esté en la query basta con menos:
+    las de en medio son palabras completas (búsqueda exacta) y la última,
+    si va detrás de un separador, un prefijo (búsqueda binaria). Para una
+    palabra que puede empezar en medio de otra, a las que empiezan por
+    ella se suman las que la contienen más adelante, que se encuentran
+    con un índice de trigramas del vocabulario. Los candidatos se
+    verifican contra el texto, por lo que los resultados coinciden con
+    una búsqueda lineal "query in texto".
+    """
+
+    def __init__(self):
+        self._textos: Dict[str, Tuple[str, str]] = {}  # id -> (contenido, autor) del mensaje, sin copiar
+        self._palabras_mensaje: Dict[str, Tuple[str, ...]] = {}  # id -> palabras distintas
+        self._postings: Dict[str, Set[str]] = {}  # palabra -> ids
+        self._claves: List[str] = []  # vocabulario ordenado para búsqueda por prefijo
+        self._trigramas: Dict[str, Set[str]] = {}  # trigrama interior -> palabras
+        self._claves_trigramas: List[str] = []  # trigramas ordenados para fragmentos cortos
+
+    @staticmethod
+    def _trigramas_interiores(palabra: str) -> Set[str]:
+        """
+        Trigramas que empiezan después de la primera letra (las apariciones
+        al inicio ya las da el vocabulario ordenado). Con el relleno final,
+        un fragmento de una o dos letras es prefijo de alguno de ellos.
+        """
+        resto = palabra[1:] + "\0\0"
+        return {resto[i:i + 3] for i in range(len(palabra) - 1)}
+
+    def _palabra_compartida(self, palabra: str) -> str:
+        """La instancia del vocabulario si ya existe, para no guardar copias por mensaje"""
+        if palabra in self._postings:
+            return self._claves[bisect_left(self._claves, palabra)]
+        return palabra
+
+    def _agregar_palabra(self, palabra: str):
+        insort(self._claves, palabra)
+        for trigrama in self._trigramas_interiores(palabra):
+            palabras = self._trigramas.get(trigrama)
+            if palabras is None:
+                self._trigramas[trigrama] = {palabra}
+                insort(self._claves_trigramas, trigrama)
+            else:
+                palabras.add(palabra)
+
+    def _quitar_palabra(self, palabra: str):
+        del self._claves[bisect_left(self._claves, palabra)]
+        for trigrama in self._trigramas_interiores(palabra):
+            palabras = self._trigramas[trigrama]
+            palabras.discard(palabra)
+            if not palabras:
+                del self._trigramas[trigrama]
+                del self._claves_trigramas[bisect_left(self._claves_trigramas, trigrama)]
+
+    def indexar(self, mensaje_id: str, contenido: str, autor: str):
+        """Indexa un mensaje, o lo reindexa si cambió su texto"""
+        textos = (contenido, autor)
+        if self._textos.get(mensaje_id) == textos:
+            return
+
+        self.eliminar(mensaje_id)
+        self._textos[mensaje_id] = textos
+
+        palabras = set(PATRON_TOKEN.findall(contenido.lower()))
+        palabras.update(PATRON_TOKEN.findall(autor.lower()))
+        palabras = tuple(self._palabra_compartida(palabra) for palabra in palabras)
+        self._palabras_mensaje[mensaje_id] = palabras
+        for palabra in palabras:
+            ids = self._postings.get(palabra)
+            if ids is None:
+                self._postings[palabra] = {mensaje_id}
+                self._agregar_palabra(palabra)
+            else:
+                ids.add(mensaje_id)
+
+    def eliminar(self, mensaje_id: str):
+        """Quita un mensaje del índice"""
+        self._textos.pop(mensaje_id, None)
+        for palabra in self._palabras_mensaje.pop(mensaje_id, ()):
+            ids = self._postings[palabra]
+            ids.discard(mensaje_id)
+            if not ids:
+                del self._postings[palabra]
+                self._quitar_palabra(palabra)
+
+    @staticmethod
+    def _rango_prefijo(claves: List[str], prefijo: str) -> List[str]:
+        """Claves ordenadas que empiezan por el prefijo (búsqueda binaria)"""
+        inicio = bisect_left(claves, prefijo)
+        fin = inicio
+        while fin < len(claves) and claves[fin].startswith(prefijo):
+            fin += 1
+        return claves[inicio:fin]
+
+    def _palabras_con(self, fragmento: str) -> Set[str]:
+        """Palabras del vocabulario que contienen el fragmento"""
+        # Las que empiezan por él (incluida la palabra exacta)
+        palabras = set(self._rango_prefijo(self._claves, fragmento))
+
+        # Las que lo contienen más adelante
+        if len(fragmento) < 3:
+            for trigrama in self._rango_prefijo(self._claves_trigramas, fragmento):
+                palabras |= self._trigramas[trigrama]
+            return palabras
+
+        conjuntos = []
+        for i in range(len(fragmento) - 2):
+            conjunto = self._trigramas.get(fragmento[i:i + 3])
+            if conjunto is None:
+                return palabras
+            conjuntos.append(conjunto)
+        conjuntos.sort(key=len)
+        interiores = set(conjuntos[0]).intersection(*conjuntos[1:])
+        palabras.update(palabra for palabra in interiores if fragmento in palabra[1:])
+        return palabras
+
+    def _ids_de(self, palabras: Iterable[str]) -> Set[str]:
+        resultado: Set[str] = set()
+        for palabra in palabras:
+            resultado |= self._postings[palabra]
+        return resultado
+
+    def _candidatos(self, query: str) -> Optional[Set[str]]:
+        """Ids que pueden contener la query, o None si el índice no ayuda"""
+        conjuntos = []
+        for coincidencia in PATRON_TOKEN.finditer(query):
+            palabra = coincidencia.group()
+            empieza = coincidencia.start() > 0  # Hay un separador antes
+            termina = coincidencia.end() < len(query)  # Hay un separador después
+            if empieza and termina:
+                conjuntos.append(self._postings.get(palabra, set()))
+            elif empieza:
+                conjuntos.append(self._ids_de(self._rango_prefijo(self._claves, palabra)))
+            else:
+                # Solo la primera palabra de la query puede empezar en medio de otra
+                palabras = self._palabras_con(palabra)
+                if termina:
+                    palabras = [p for p in palabras if p.endswith(palabra)]
+                conjuntos.append(self._ids_de(palabras))
+
+        if not conjuntos:
+            # Query sin letras ni dígitos (p.ej. signos o emojis): sin índice
+            return None
+
+        # Lo que no se intersecta aquí lo descarta la verificación
+        conjuntos.sort(key=len)
+        candidatos = set(conjuntos[0])
+        for ids in conjuntos[1:]:
+            if not candidatos:
+                break
+            candidatos &= ids
+        return candidatos
+
+    def buscar(self, query: str) -> Dict[str, int]:
+        """
+        Busca mensajes cuyo contenido o autor contenga la query.
+        Devuelve id -> número de ocurrencias en el contenido.
+        """
+        query = query.lower()
+        candidatos = self._candidatos(query)
+        if candidatos is None:
+            candidatos = self._textos.keys()
+
+        resultados = {}
+        for mensaje_id in candidatos:
+            contenido, autor = self._textos[mensaje_id]
+            contenido = contenido.lower()
+            if query in contenido or query in autor.lower():
+                resultados[mensaje_id] = contenido.count(query)
+        return resultados
+
+    def __len__(self) -> int:
+        return len(self._textos)
\ No newline at end of file
@@ -3,14 +3,21 @@
 Punto de entrada para el chat cooperativo con CRDTs
 """
 
+import argparse
 from gui_chat import ChatGUI
+from sincronizacion_chat import MODOS_RED
 
 
 def main():
     """Función principal para ejecutar el chat"""
+    parser = argparse.ArgumentParser(description="Chat cooperativo con CRDTs")
+    parser.add_argument("--red", choices=list(MODOS_RED), default="hilos",
+                        help="Implementación de red: un hilo por conexión o un event loop de asyncio")
+    args = parser.parse_args()
+    
     try:
         print("Iniciando Chat Cooperativo - CRDT...")
-        app = ChatGUI()
+        app = ChatGUI(modo_red=args.red)
         app.ejecutar()
     except Exception as e:
         print(f"Error al iniciar la aplicación: {e}")
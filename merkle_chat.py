@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Árbol de Merkle sobre el estado de los mensajes, mantenido incrementalmente
+
+Cada mensaje se ubica en una hoja según el prefijo hexadecimal del hash de
+su id. El hash de un nodo es el XOR de los hashes (id, versión) de todos los
+mensajes de su subárbol, así que actualizar un mensaje solo toca los
+nodos de su camino: O(profundidad). Dos réplicas comparan la raíz (O(1)
+bytes) y, si difiere, bajan nivel a nivel solo por los prefijos distintos.
+"""
+
+from hashlib import blake2b
+from typing import Dict, List, Set, Tuple, Iterable
+
+
+DIGITOS_HEX = '0123456789abcdef'
+BYTES_HASH = 16
+HASH_CERO = '0' * (BYTES_HASH * 2)
+
+
+def _hash_entero(datos: str) -> int:
+    return int.from_bytes(blake2b(datos.encode('utf-8'), digest_size=BYTES_HASH).digest(), 'big')
+
+
+class ArbolMerkle:
+    """
+    Árbol de aridad 16 y profundidad fija. Los prefijos son cadenas
+    hexadecimales: '' es la raíz y las hojas tienen `profundidad` dígitos.
+    Solo se guardan los nodos con hash distinto de cero.
+    """
+
+    def __init__(self, profundidad: int = 3):
+        self.profundidad = profundidad
+        self._hashes: Dict[str, int] = {}
+        self._entradas: Dict[str, Tuple[str, int]] = {}  # clave -> (hoja, hash)
+        self._hojas: Dict[str, Set[str]] = {}
+
+    def _ruta(self, clave: str) -> str:
+        return blake2b(clave.encode('utf-8'), digest_size=8).hexdigest()[:self.profundidad]
+
+    def _propagar(self, hoja: str, valor: int):
+        """Aplica un XOR en todos los nodos del camino de la hoja a la raíz"""
+        for longitud in range(self.profundidad + 1):
+            prefijo = hoja[:longitud]
+            nuevo = self._hashes.get(prefijo, 0) ^ valor
+            if nuevo:
+                self._hashes[prefijo] = nuevo
+            else:
+                self._hashes.pop(prefijo, None)
+
+    def actualizar(self, clave: str, version: str):
+        """Registra la versión actual de una clave (reemplaza la anterior)"""
+        nuevo = _hash_entero(f"{clave}\x00{version}")
+        anterior = self._entradas.get(clave)
+        if anterior is None:
+            hoja = self._ruta(clave)
+            self._hojas.setdefault(hoja, set()).add(clave)
+            self._propagar(hoja, nuevo)
+        else:
+            hoja, hash_anterior = anterior
+            if hash_anterior == nuevo:
+                return
+            self._propagar(hoja, hash_anterior ^ nuevo)
+        self._entradas[clave] = (hoja, nuevo)
+
+    def eliminar(self, clave: str):
+        """Quita una clave del árbol"""
+        anterior = self._entradas.pop(clave, None)
+        if anterior is None:
+            return
+        hoja, hash_anterior = anterior
+        self._propagar(hoja, hash_anterior)
+        claves = self._hojas[hoja]
+        claves.discard(clave)
+        if not claves:
+            del self._hojas[hoja]
+
+    def raiz(self) -> str:
+        """Hash de la raíz en hexadecimal (todo ceros si el árbol está vacío)"""
+        return self.hash_prefijo('')
+
+    def hash_prefijo(self, prefijo: str) -> str:
+        return format(self._hashes.get(prefijo, 0), f'0{BYTES_HASH * 2}x')
+
+    def es_hoja(self, prefijo: str) -> bool:
+        return len(prefijo) >= self.profundidad
+
+    def hashes_hijos(self, prefijos: Iterable[str]) -> Dict[str, str]:
+        """Hashes de los hijos no vacíos de cada prefijo (los ausentes valen cero)"""
+        hashes = {}
+        for prefijo in prefijos:
+            if self.es_hoja(prefijo):
+                continue
+            for digito in DIGITOS_HEX:
+                hijo = prefijo + digito
+                if hijo in self._hashes:
+                    hashes[hijo] = self.hash_prefijo(hijo)
+        return hashes
+
+    def hijos_distintos(self, prefijos: Iterable[str], hashes_remotos: Dict[str, str]) -> List[str]:
+        """Hijos de los prefijos cuyo hash local difiere del remoto"""
+        distintos = []
+        for prefijo in prefijos:
+            if self.es_hoja(prefijo):
+                continue
+            for digito in DIGITOS_HEX:
+                hijo = prefijo + digito
+                if self.hash_prefijo(hijo) != hashes_remotos.get(hijo, HASH_CERO):
+                    distintos.append(hijo)
+        return distintos
+
+    def claves(self, prefijos: Iterable[str]) -> List[str]:
+        """Claves guardadas en las hojas indicadas"""
+        claves = []
+        for prefijo in prefijos:
+            claves.extend(self._hojas.get(prefijo, ()))
+        return claves
+
+    def __len__(self) -> int:
+        return len(self._entradas)
\ No newline at end of file
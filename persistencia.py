@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Persistencia en disco del chat: log de operaciones solo-append con snapshots
+
+Estructura del directorio:
+    segmento_00000001.log   Operaciones, una por línea (JSON)
+    snapshot_00000003.json  Estado que cubre todos los segmentos < 3
+
+Al restaurar se carga el snapshot más reciente y se reaplican solo los
+segmentos posteriores (la "cola" del log).
+"""
+
+import json
+import os
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+
+PREFIJO_SEGMENTO = "segmento_"
+PREFIJO_SNAPSHOT = "snapshot_"
+
+
+class LogPersistente:
+    """
+    Log de operaciones en disco dividido en segmentos.
+    Cada escritura se vuelca al sistema operativo (sobrevive a la caída del
+    proceso); el fsync se hace por lotes para no pagarlo en cada operación.
+    """
+
+    def __init__(self, directorio: str, tamano_segmento: int = 4 * 1024 * 1024,
+                 lote_fsync: int = 64, intervalo_fsync: float = 0.05):
+        self.directorio = directorio
+        self.tamano_segmento = tamano_segmento
+        self.lote_fsync = lote_fsync
+        self.intervalo_fsync = intervalo_fsync
+
+        self.logger = logging.getLogger(f"LogPersistente-{os.path.basename(directorio)}")
+
+        self._archivo = None
+        self._numero_segmento = 0
+        self._pendientes_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, prefijo: str, numero: int, extension: str) -> str:
+        return os.path.join(self.directorio, f"{prefijo}{numero:08d}.{extension}")
+
+    def _listar(self, prefijo: str) -> List[int]:
+        """Obtiene los números de los archivos con el prefijo dado, ordenados"""
+        numeros = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith(prefijo) and not nombre.endswith(".tmp"):
+                try:
+                    numeros.append(int(nombre[len(prefijo):].split(".")[0]))
+                except ValueError:
+                    continue
+        return sorted(numeros)
+
+    def cargar(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Carga el snapshot más reciente y las operaciones posteriores.
+        Si la última línea quedó a medio escribir se descarta y se trunca.
+        """
+        snapshot = None
+        inicio = 0
+
+        snapshots = self._listar(PREFIJO_SNAPSHOT)
+        if snapshots:
+            inicio = snapshots[-1]
+            with open(self._ruta(PREFIJO_SNAPSHOT, inicio, "json"), encoding="utf-8") as f:
+                snapshot = json.load(f)
+
+        operaciones = []
+        segmentos = [n for n in self._listar(PREFIJO_SEGMENTO) if n >= inicio]
+        for numero in segmentos:
+            operaciones.extend(self._leer_segmento(numero))
+
+        # Continuar escribiendo en el último segmento (o en uno nuevo)
+        self._abrir_segmento(segmentos[-1] if segmentos else max(inicio, 1))
+        return snapshot, operaciones
+
+    def _leer_segmento(self, numero: int) -> List[Dict[str, Any]]:
+        ruta = self._ruta(PREFIJO_SEGMENTO, numero, "log")
+        operaciones = []
+        bytes_validos = 0
+
+        with open(ruta, "rb") as f:
+            for linea in f:
+                try:
+                    operaciones.append(json.loads(linea))
+                except ValueError:
+                    # Escritura interrumpida: el resto del segmento no es fiable
+                    self.logger.warning(f"Segmento {numero} truncado en el byte {bytes_validos}")
+                    break
+                bytes_validos += len(linea)
+
+        if bytes_validos < os.path.getsize(ruta):
+            with open(ruta, "r+b") as f:
+                f.truncate(bytes_validos)
+
+        return operaciones
+
+    def _abrir_segmento(self, numero: int):
+        if self._archivo:
+            self.sincronizar_disco()
+            self._archivo.close()
+        self._numero_segmento = numero
+        self._archivo = open(self._ruta(PREFIJO_SEGMENTO, numero, "log"), "ab")
+
+    def agregar(self, datos_operacion: Dict[str, Any]):
+        """Agrega una operación serializada al final del log"""
+        if self._archivo is None:
+            self._abrir_segmento(max(self._listar(PREFIJO_SEGMENTO) or [1]))
+
+        linea = json.dumps(datos_operacion, separators=(',', ':'), ensure_ascii=False)
+        self._archivo.write(linea.encode("utf-8") + b"\n")
+        self._archivo.flush()
+
+        self._pendientes_fsync += 1
+        if (self._pendientes_fsync >= self.lote_fsync or
+                time.monotonic() - self._ultimo_fsync >= self.intervalo_fsync):
+            self.sincronizar_disco()
+
+        if self._archivo.tell() >= self.tamano_segmento:
+            self._abrir_segmento(self._numero_segmento + 1)
+
+    def sincronizar_disco(self):
+        """Fuerza el fsync de las operaciones pendientes"""
+        if self._archivo and self._pendientes_fsync:
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+        self._pendientes_fsync = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def guardar_snapshot(self, estado: Dict[str, Any]):
+        """
+        Guarda un snapshot que reemplaza a todos los segmentos anteriores.
+        Se rota primero el segmento, así el snapshot cubre exactamente los
+        segmentos cerrados; después se borran los archivos obsoletos.
+        """
+        self._abrir_segmento(self._numero_segmento + 1)
+        numero = self._numero_segmento
+
+        ruta = self._ruta(PREFIJO_SNAPSHOT, numero, "json")
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(estado, f, separators=(',', ':'), ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta + ".tmp", ruta)
+
+        for anterior in self._listar(PREFIJO_SNAPSHOT):
+            if anterior < numero:
+                os.remove(self._ruta(PREFIJO_SNAPSHOT, anterior, "json"))
+        for anterior in self._listar(PREFIJO_SEGMENTO):
+            if anterior < numero:
+                os.remove(self._ruta(PREFIJO_SEGMENTO, anterior, "log"))
+
+    def cerrar(self):
+        """Sincroniza y cierra el segmento actual"""
+        if self._archivo:
+            self.sincronizar_disco()
+            self._archivo.close()
+            self._archivo = None
\ No newline at end of file
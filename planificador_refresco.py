@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Planificador de refrescos de la interfaz
+
+Las notificaciones de cambio llegan por cada operación (y desde los hilos
+de red), pero la interfaz solo necesita redibujarse una vez por frame.
+PlanificadorRefresco acumula qué paneles quedaron sucios y programa como
+mucho un refresco cada intervalo_ms, en el que solo se recalculan esos
+paneles. No depende de tkinter: recibe la función de programación
+(root.after en la interfaz).
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Set
+
+
+INTERVALO_FRAME_MS = 33  # ~30 refrescos por segundo como máximo
+
+
+class PlanificadorRefresco:
+    """Agrupa las notificaciones de cambio en un refresco por frame"""
+
+    def __init__(self, programar: Callable[[int, Callable[[], None]], Any],
+                 intervalo_ms: int = INTERVALO_FRAME_MS,
+                 reloj: Callable[[], float] = time.monotonic):
+        self.programar = programar
+        self.intervalo_ms = intervalo_ms
+        self.reloj = reloj
+        self.paneles: Dict[str, Callable[[], None]] = {}
+        self._sucios: Set[str] = set()
+        self._programado = False
+        self._ultimo_frame: Optional[float] = None
+        self._lock = threading.Lock()
+        self.frames = 0  # Refrescos ejecutados
+        self.logger = logging.getLogger(__name__)
+
+    def registrar(self, panel: str, refrescar: Callable[[], None]):
+        """Registra la función que redibuja un panel (se llaman en orden de registro)"""
+        self.paneles[panel] = refrescar
+
+    def marcar(self, *paneles: str):
+        """Marca paneles como sucios; seguro desde cualquier hilo"""
+        with self._lock:
+            self._sucios.update(paneles)
+            if self._programado:
+                return
+            self._programado = True
+            # El primer cambio tras un rato sin refrescos se dibuja ya
+            espera = 0
+            if self._ultimo_frame is not None:
+                transcurrido = (self.reloj() - self._ultimo_frame) * 1000
+                espera = max(0, int(self.intervalo_ms - transcurrido))
+        self.programar(espera, self._ejecutar)
+
+    def _ejecutar(self):
+        with self._lock:
+            sucios, self._sucios = self._sucios, set()
+            self._programado = False
+            self._ultimo_frame = self.reloj()
+        self.frames += 1
+
+        for panel, refrescar in self.paneles.items():
+            if panel in sucios:
+                try:
+                    refrescar()
+                except Exception as e:
+                    self.logger.error(f"Error refrescando el panel {panel}: {e}")
+
+    @property
+    def pendientes(self) -> Set[str]:
+        """Paneles sucios a la espera del próximo refresco"""
+        with self._lock:
+            return set(self._sucios)
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Presencia de usuarios: quién estuvo activo recientemente
+
+RegistroPresencia guarda la última vez que se vio a cada usuario (un
+mensaje suyo, su nodo descubierto o una sincronización con él) en una
+lista ordenada por instante, como LineaTemporal con los mensajes. Los
+usuarios activos en una ventana son la cola de esa lista: se obtienen
+con una búsqueda binaria en O(log U + activos), sin recorrer mensajes ni
+usuarios inactivos. Cada consulta olvida, por la cabeza de la misma
+lista, a quienes no se ven desde hace más que la retención, así que el
+registro no crece con cada usuario que pasó alguna vez. Lleva además el
+conjunto de usuarios con nodo descubierto ahora mismo.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+
+VENTANA_ACTIVIDAD = timedelta(minutes=10)
+RETENCION = timedelta(hours=24)  # Tiempo sin ver a un usuario antes de olvidarlo
+
+
+class RegistroPresencia:
+    """Último instante visto por usuario, ordenado, y usuarios conectados"""
+
+    def __init__(self, ventana: timedelta = VENTANA_ACTIVIDAD, retencion: timedelta = RETENCION):
+        self.ventana = ventana
+        self.retencion = retencion
+        self._claves: List[Tuple[datetime, str]] = []  # (último visto, usuario), ordenadas
+        self._ultimo: Dict[str, datetime] = {}
+        self._conectados: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def registrar(self, usuario: str, instante: Optional[datetime] = None):
+        """Marca al usuario como visto en el instante dado (ahora por defecto)"""
+        instante = instante or datetime.now()
+        with self._lock:
+            anterior = self._ultimo.get(usuario)
+            if anterior is not None:
+                # Un dato viejo (p. ej. un mensaje antiguo sincronizado) no retrasa al usuario
+                if instante <= anterior:
+                    return
+                posicion = bisect_left(self._claves, (anterior, usuario))
+                del self._claves[posicion]
+
+            clave = (instante, usuario)
+            if not self._claves or clave > self._claves[-1]:
+                self._claves.append(clave)
+            else:
+                insort(self._claves, clave)
+            self._ultimo[usuario] = instante
+
+    def conectar(self, usuario: str):
+        """Registra que hay un nodo descubierto de este usuario"""
+        with self._lock:
+            self._conectados.add(usuario)
+        self.registrar(usuario)
+
+    def desconectar(self, usuario: str):
+        """Registra que se perdió el nodo del usuario (sigue activo hasta que expire)"""
+        with self._lock:
+            self._conectados.discard(usuario)
+
+    def activos(self, ventana: Optional[timedelta] = None, ahora: Optional[datetime] = None) -> List[str]:
+        """Usuarios vistos dentro de la ventana (la configurada por defecto), más recientes primero"""
+        ahora = ahora or datetime.now()
+        desde = ahora - (ventana or self.ventana)
+        with self._lock:
+            # Una ventana más larga que la retención conserva lo que consulta
+            self._expirar(min(desde, ahora - self.retencion))
+            inicio = bisect_right(self._claves, (desde, "\U0010ffff"))
+            return [usuario for _, usuario in reversed(self._claves[inicio:])]
+
+    def esta_conectado(self, usuario: str) -> bool:
+        with self._lock:
+            return usuario in self._conectados
+
+    def ultimo_visto(self, usuario: str) -> Optional[datetime]:
+        with self._lock:
+            return self._ultimo.get(usuario)
+
+    def expirar(self, antes_de: datetime) -> int:
+        """Olvida a los usuarios no vistos desde antes_de; devuelve cuántos"""
+        with self._lock:
+            return self._expirar(antes_de)
+
+    def _expirar(self, antes_de: datetime) -> int:
+        fin = bisect_left(self._claves, (antes_de, ""))
+        for _, usuario in self._claves[:fin]:
+            del self._ultimo[usuario]
+        del self._claves[:fin]
+        return fin
+
+    def __len__(self) -> int:
+        return len(self._ultimo)
\ No newline at end of file
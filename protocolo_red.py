@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Protocolo de tramas para la comunicación TCP entre nodos del chat
+
+Cada mensaje se envía como una o más tramas con cabecera binaria:
+    [flags: 1 byte][longitud: 4 bytes big-endian][payload]
+El flag FIN marca la última trama de un mensaje, de modo que un mensaje
+más grande que TAMANO_MAXIMO_TRAMA viaja partido en varias tramas.
+Los flags de compresión indican que el payload del mensaje completo va
+comprimido (zlib, zlib con diccionario predefinido o lzma), y FLAG_BINARIO
+que va en la codificación binaria de codec_binario en lugar de JSON. El
+diccionario predefinido depende del formato: DICCIONARIO_CHAT para JSON y
+DICCIONARIO_BINARIO para el binario.
+"""
+
+import json
+import lzma
+import zlib
+import socket
+import asyncio
+import struct
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+from codec_binario import codificar_mensaje, decodificar_mensaje, ErrorCodec
+
+
+CABECERA = struct.Struct('!BI')
+
+# Flags de trama
+FLAG_FIN = 0x01  # Última trama del mensaje
+FLAG_ZLIB = 0x02  # Payload comprimido con zlib
+FLAG_ZLIB_DICCIONARIO = 0x04  # zlib con el diccionario predefinido del formato
+FLAG_LZMA = 0x08  # Payload comprimido con lzma
+FLAG_BINARIO = 0x10  # Payload en codificación binaria (codec_binario)
+MASCARA_COMPRESION = FLAG_ZLIB | FLAG_ZLIB_DICCIONARIO | FLAG_LZMA
+
+COMPRESIONES = {
+    'zlib': FLAG_ZLIB,
+    'zlib_diccionario': FLAG_ZLIB_DICCIONARIO,
+    'lzma': FLAG_LZMA,
+}
+UMBRAL_COMPRESION = 1024  # Por debajo, comprimir no compensa: el payload va tal cual
+
+# Codificaciones del payload; JSON es la que entiende cualquier nodo
+FORMATOS = ('json', 'binario')
+
+TAMANO_MAXIMO_TRAMA = 1 << 20  # 1 MiB por trama
+TAMANO_MAXIMO_MENSAJE = 256 << 20  # Límite de seguridad para un mensaje completo
+
+
+# Fragmentos que se repiten en todos los registros de sincronización
+# (claves, tipos, separadores), de menos a más frecuentes: zlib encuentra
+# antes lo que está al final. Ambos extremos deben tener los mismos bytes,
+# así que cambiarlo requiere un flag nuevo: nada que envejezca (años,
+# prefijos de fechas o de epoch), solo la estructura de los registros.
+DICCIONARIO_CHAT = ''.join([
+    '{"tipo":"sync_resumen","vector_clock":{', '"hash_estado":"', '"origen":"',
+    '{"tipo":"sync_data","datos":{"tipo_sync":"estado","estado_completo":{"usuario_id":"',
+    '"resumen_operaciones":{', '"canales":{"chat":["',
+    '{"tipo":"sync_push","operaciones":[',
+    '{"tipo":"sync_delta","datos":{"tipo_sync":"operaciones","operaciones":[',
+    '],"vector_clock":{', '"en_sincronia":true,', '"exito":true}',
+    '{"tipo":"eliminar_mensaje","clave":"', '","valor":null,',
+    '{"tipo":"editar_mensaje","clave":"', ' (editado)', '[Mensaje eliminado]',
+    '"mensajes":{"', '":{"mensaje_id":"', '"},"',
+    '{"tipo":"enviar_mensaje","clave":"', '","valor":{"mensaje_id":"',
+    '","contenido":"', '","autor":"', '","timestamp":"', 'T',
+    '","canal":"chat"},"timestamp":{"node_id":"', '","counter":', '},"usuario":"', '"},',
+]).encode('utf-8')
+
+# El formato binario solo deja en JSON el sobre de cada mensaje y el mapa de
+# mensajes del estado completo; las operaciones van en registros binarios
+# (ids de 16 bytes, timestamps en microsegundos) en los que las claves de
+# DICCIONARIO_CHAT no aparecen. Aquí van los sobres tal como los escribe
+# codec_binario, la entrada "chat" de su tabla de cadenas y los textos de
+# ediciones y eliminaciones; al final, lo más frecuente del estado. Las
+# mismas reglas que arriba: mismos bytes en ambos extremos, nada que envejezca.
+DICCIONARIO_BINARIO = b''.join([
+    b'CB\x01',
+    '{"tipo":"sync_data","datos":{"tipo_sync":"estado","estado_completo":{"usuario_id":"'.encode('utf-8'),
+    '"resumen_operaciones":{'.encode('utf-8'), '"canales":{"chat":["'.encode('utf-8'),
+    '"hash_estado":"'.encode('utf-8'),
+    '{"tipo":"sync_delta","datos":{"tipo_sync":"operaciones","operaciones":null,"vector_clock":{'.encode('utf-8'),
+    '}},"exito":true,"$binario":[["datos","operaciones"]]}'.encode('utf-8'),
+    '{"tipo":"sync_push","operaciones":null,"origen":"'.encode('utf-8'),
+    '","$binario":[["operaciones"]]}'.encode('utf-8'),
+    b'\x04chat', ' (editado)'.encode('utf-8'), '[Mensaje eliminado]'.encode('utf-8'),
+    '"mensajes":{"'.encode('utf-8'), '":{"mensaje_id":"'.encode('utf-8'),
+    '","contenido":"'.encode('utf-8'), '","autor":"'.encode('utf-8'), '","timestamp":"'.encode('utf-8'), b'T',
+    '","canal":"chat","version":{"node_id":"'.encode('utf-8'), '","counter":'.encode('utf-8'), b'}},"',
+])
+
+
+def _diccionario(binario: bool) -> bytes:
+    """Diccionario predefinido de zlib para el formato del payload"""
+    return DICCIONARIO_BINARIO if binario else DICCIONARIO_CHAT
+
+
+class ErrorProtocolo(Exception):
+    """Error de formato en las tramas recibidas"""
+    pass
+
+
+def _serializar_objeto(objeto):
+    """Las operaciones pueden viajar como objetos: en JSON van como su to_dict()"""
+    if hasattr(objeto, 'to_dict'):
+        return objeto.to_dict()
+    raise TypeError(f"No serializable: {type(objeto).__name__}")
+
+
+def codificar_payload(mensaje: Dict[str, Any]) -> bytes:
+    """Serializa un mensaje a bytes"""
+    return json.dumps(mensaje, separators=(',', ':'), default=_serializar_objeto).encode('utf-8')
+
+
+def decodificar_payload(payload) -> Dict[str, Any]:
+    """Deserializa un payload (bytes o memoryview) a mensaje"""
+    return json.loads(str(payload, 'utf-8'))
+
+
+def comprimir_payload(payload: bytes, compresion: str, binario: bool = False) -> bytes:
+    """Comprime un payload con el algoritmo indicado (una clave de COMPRESIONES)"""
+    if compresion == 'lzma':
+        return lzma.compress(payload)
+    if compresion == 'zlib_diccionario':
+        compresor = zlib.compressobj(zdict=_diccionario(binario))
+        return compresor.compress(payload) + compresor.flush()
+    if compresion == 'zlib':
+        return zlib.compress(payload)
+    raise ValueError(f"Compresión desconocida: {compresion}")
+
+
+def descomprimir_payload(payload, flags: int) -> bytes:
+    """Descomprime según los flags, sin pasar de TAMANO_MAXIMO_MENSAJE"""
+    try:
+        if flags & FLAG_LZMA:
+            descompresor = lzma.LZMADecompressor()
+            datos = descompresor.decompress(payload, TAMANO_MAXIMO_MENSAJE)
+            completo = descompresor.eof
+        else:
+            if flags & FLAG_ZLIB_DICCIONARIO:
+                descompresor = zlib.decompressobj(zdict=_diccionario(bool(flags & FLAG_BINARIO)))
+            else:
+                descompresor = zlib.decompressobj()
+            datos = descompresor.decompress(payload, TAMANO_MAXIMO_MENSAJE)
+            completo = descompresor.eof and not descompresor.unconsumed_tail
+    except (zlib.error, lzma.LZMAError) as e:
+        raise ErrorProtocolo(f"Payload comprimido inválido: {e}")
+    
+    if not completo:
+        raise ErrorProtocolo("Payload comprimido incompleto o demasiado grande")
+    return datos
+
+
+def preparar_payload(mensaje: Dict[str, Any], compresion: Optional[str] = None,
+                     umbral: int = UMBRAL_COMPRESION, binario: bool = False) -> Tuple[bytes, int]:
+    """
+    Serializa un mensaje (en JSON o binario) y, si supera el umbral, lo comprime.
+    Devuelve el payload y los flags de codificación para sus tramas.
+    """
+    if binario:
+        payload, flags = codificar_mensaje(mensaje), FLAG_BINARIO
+    else:
+        payload, flags = codificar_payload(mensaje), 0
+    if compresion and len(payload) >= umbral:
+        comprimido = comprimir_payload(payload, compresion, binario)
+        if len(comprimido) < len(payload):
+            return comprimido, flags | COMPRESIONES[compresion]
+    return payload, flags
+
+
+def interpretar_payload(payload, flags: int) -> Dict[str, Any]:
+    """Deshace la compresión y la codificación indicadas por los flags del mensaje"""
+    if flags & MASCARA_COMPRESION:
+        payload = descomprimir_payload(payload, flags)
+    if flags & FLAG_BINARIO:
+        try:
+            return decodificar_mensaje(payload)
+        except ErrorCodec as e:
+            raise ErrorProtocolo(str(e))
+    return decodificar_payload(payload)
+
+
+def generar_tramas(payload: bytes, tamano_trama: int = TAMANO_MAXIMO_TRAMA,
+                   flags_mensaje: int = 0) -> Iterator[bytes]:
+    """Parte un payload en tramas con cabecera, sin copiar el payload completo"""
+    vista = memoryview(payload)
+    total = len(vista)
+    inicio = 0
+
+    while True:
+        fin = min(inicio + tamano_trama, total)
+        flags = flags_mensaje | (FLAG_FIN if fin == total else 0)
+        yield CABECERA.pack(flags, fin - inicio)
+        if fin > inicio:
+            yield vista[inicio:fin]
+        if flags & FLAG_FIN:
+            break
+        inicio = fin
+
+
+def enviar_mensaje(sock: socket.socket, mensaje: Dict[str, Any],
+                   tamano_trama: int = TAMANO_MAXIMO_TRAMA,
+                   compresion: Optional[str] = None, umbral: int = UMBRAL_COMPRESION,
+                   binario: bool = False):
+    """Envía un mensaje completo por el socket usando tramas"""
+    payload, flags = preparar_payload(mensaje, compresion, umbral, binario)
+    if len(payload) <= tamano_trama:
+        # Cabecera y payload en un solo envío: dos envíos pequeños seguidos
+        # chocan con Nagle + ACK retardado y suman decenas de ms por mensaje
+        sock.sendall(CABECERA.pack(flags | FLAG_FIN, len(payload)) + payload)
+        return
+    for fragmento in generar_tramas(payload, tamano_trama, flags):
+        sock.sendall(fragmento)
+
+
+async def enviar_mensaje_async(writer: asyncio.StreamWriter, mensaje: Dict[str, Any],
+                               tamano_trama: int = TAMANO_MAXIMO_TRAMA,
+                               compresion: Optional[str] = None, umbral: int = UMBRAL_COMPRESION,
+                               binario: bool = False):
+    """
+    Envía un mensaje completo por un stream de asyncio usando tramas.
+    drain() tras cada trama acota lo que queda pendiente en el buffer de envío.
+    """
+    payload, flags = preparar_payload(mensaje, compresion, umbral, binario)
+    if len(payload) <= tamano_trama:
+        writer.write(CABECERA.pack(flags | FLAG_FIN, len(payload)) + payload)
+        await writer.drain()
+        return
+    for fragmento in generar_tramas(payload, tamano_trama, flags):
+        writer.write(fragmento)
+        await writer.drain()
+
+
+async def recibir_mensaje_async(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """Recibe y deserializa el siguiente mensaje, o None si la conexión se cerró"""
+    partes = []
+    total = 0
+    flags_mensaje = 0
+
+    while True:
+        try:
+            cabecera = await reader.readexactly(CABECERA.size)
+        except asyncio.IncompleteReadError as e:
+            if not partes and not e.partial:
+                return None
+            raise ErrorProtocolo("Conexión cerrada a mitad de un mensaje")
+
+        flags, longitud = CABECERA.unpack(cabecera)
+        if longitud > TAMANO_MAXIMO_TRAMA:
+            raise ErrorProtocolo(f"Trama demasiado grande: {longitud} bytes")
+
+        try:
+            datos = await reader.readexactly(longitud)
+        except asyncio.IncompleteReadError:
+            raise ErrorProtocolo("Conexión cerrada antes del payload")
+
+        if not partes:
+            flags_mensaje = flags & ~FLAG_FIN
+            if flags & FLAG_FIN:
+                return interpretar_payload(datos, flags_mensaje)
+
+        partes.append(datos)
+        total += longitud
+        if total > TAMANO_MAXIMO_MENSAJE:
+            raise ErrorProtocolo("Mensaje demasiado grande")
+
+        if flags & FLAG_FIN:
+            return interpretar_payload(b''.join(partes), flags_mensaje)
+
+
+class LectorTramas:
+    """
+    Lee mensajes enmarcados de un socket.
+    Reutiliza el mismo buffer entre lecturas para evitar reservas por mensaje.
+    """
+
+    def __init__(self, sock: socket.socket, tamano_inicial: int = 64 * 1024):
+        self.sock = sock
+        self._buffer = bytearray(tamano_inicial)
+        self._cabecera = bytearray(CABECERA.size)
+        self._mensaje = bytearray()
+        # Flags de compresión y codificación del último mensaje recibido
+        self.compresion = 0
+        self.binario = False
+
+    def _leer_exacto(self, destino: bytearray, n: int, limite: Optional[float] = None) -> bool:
+        """Lee exactamente n bytes en el destino. Devuelve False si el socket se cerró al inicio"""
+        vista = memoryview(destino)
+        recibidos = 0
+
+        while recibidos < n:
+            if limite is not None:
+                # Cada lectura espera solo lo que queda: un par que manda
+                # los bytes de a poco no estira el plazo de la petición
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise socket.timeout("Plazo agotado a mitad de un mensaje")
+                self.sock.settimeout(restante)
+            leidos = self.sock.recv_into(vista[recibidos:n], n - recibidos)
+            if leidos == 0:
+                if recibidos == 0:
+                    return False
+                raise ErrorProtocolo("Conexión cerrada a mitad de una trama")
+            recibidos += leidos
+
+        return True
+
+    def recibir_payload(self, limite: Optional[float] = None) -> Optional[memoryview]:
+        """
+        Recibe el payload completo del siguiente mensaje.
+        Devuelve None si el otro extremo cerró la conexión limpiamente.
+        Con limite (instante de time.monotonic()) lanza socket.timeout al
+        llegar a él, aunque sigan llegando bytes.
+        La vista devuelta solo es válida hasta la siguiente lectura.
+        """
+        del self._mensaje[:]
+        primera = True
+
+        while True:
+            if not self._leer_exacto(self._cabecera, CABECERA.size, limite):
+                if primera:
+                    return None
+                raise ErrorProtocolo("Conexión cerrada en un mensaje multi-trama")
+
+            flags, longitud = CABECERA.unpack(self._cabecera)
+            if longitud > TAMANO_MAXIMO_TRAMA:
+                raise ErrorProtocolo(f"Trama demasiado grande: {longitud} bytes")
+
+            if len(self._buffer) < longitud:
+                self._buffer = bytearray(max(longitud, 2 * len(self._buffer)))
+
+            if longitud and not self._leer_exacto(self._buffer, longitud, limite):
+                raise ErrorProtocolo("Conexión cerrada antes del payload")
+
+            datos = memoryview(self._buffer)[:longitud]
+
+            if primera:
+                self.compresion = flags & MASCARA_COMPRESION
+                self.binario = bool(flags & FLAG_BINARIO)
+            if primera and flags & FLAG_FIN:
+                # Caso habitual: mensaje de una sola trama, sin copias extra
+                return datos
+
+            self._mensaje += datos
+            if len(self._mensaje) > TAMANO_MAXIMO_MENSAJE:
+                raise ErrorProtocolo("Mensaje demasiado grande")
+
+            primera = False
+            if flags & FLAG_FIN:
+                return memoryview(self._mensaje)
+
+    def recibir_mensaje(self, limite: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Recibe y deserializa el siguiente mensaje, o None si la conexión se cerró"""
+        payload = self.recibir_payload(limite)
+        if payload is None:
+            return None
+        try:
+            return interpretar_payload(payload, self.compresion | (FLAG_BINARIO if self.binario else 0))
+        finally:
+            # Liberar la vista para poder reutilizar el buffer
+            payload.release()
\ No newline at end of file
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Simulación de difusión por gossip entre muchos nodos en un mismo proceso
+
+Cada ronda, cada nodo elige k pares al azar y hace con ellos el mismo
+intercambio push-pull que ClienteP2PChat por la red (resumen -> delta ->
+delta de vuelta). Se mide cuántas rondas tarda en converger la red
+comparado con log2(N), sin sockets de por medio.
+
+Uso:
+    python simulacion_gossip.py [--nodos 10 50 100 200] [--fanout 1 2 3] [--repeticiones 3]
+"""
+
+import math
+import random
+import argparse
+import logging
+import statistics
+from typing import List
+from chat_crdt import ChatCRDT
+from sincronizacion_chat import SincronizadorChat
+
+
+def intercambiar(origen: SincronizadorChat, destino: SincronizadorChat):
+    """Push-pull entre dos nodos, igual que _sincronizar_con_nodo"""
+    resumen_origen = origen.obtener_resumen()
+    respuesta = destino.obtener_actualizaciones_para(resumen_origen)
+    resumen_destino = destino.obtener_resumen()
+    if destino.hay_actualizaciones(respuesta):
+        origen.aplicar_actualizaciones(respuesta)
+    
+    datos = origen.obtener_actualizaciones_para(resumen_destino)
+    if origen.hay_actualizaciones(datos):
+        destino.aplicar_actualizaciones(datos)
+
+
+def convergido(nodos: List[SincronizadorChat], total: int) -> bool:
+    return all(len(nodo.chat.mensajes) == total for nodo in nodos)
+
+
+def simular_gossip(n: int, fanout: int, semilla: int = 0, max_rondas: int = 100) -> int:
+    """
+    Crea n nodos, cada uno con un mensaje propio, y devuelve las rondas de
+    gossip hasta que todos tienen los n mensajes (max_rondas si no convergen)
+    """
+    aleatorio = random.Random(semilla)
+    nodos = []
+    for i in range(n):
+        chat = ChatCRDT(f"nodo{i}")
+        chat.enviar_mensaje(f"Mensaje de nodo{i}")
+        nodos.append(SincronizadorChat(chat))
+    
+    for ronda in range(1, max_rondas + 1):
+        # Los pares de la ronda se eligen antes de intercambiar nada
+        parejas = []
+        for i, nodo in enumerate(nodos):
+            otros = [j for j in range(n) if j != i]
+            parejas.extend((nodo, nodos[j]) for j in aleatorio.sample(otros, min(fanout, len(otros))))
+        aleatorio.shuffle(parejas)
+        
+        for origen, destino in parejas:
+            intercambiar(origen, destino)
+        
+        if convergido(nodos, n):
+            return ronda
+    
+    return max_rondas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rondas de gossip hasta converger")
+    parser.add_argument("--nodos", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--fanout", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    
+    print("=== SIMULACIÓN DE GOSSIP (rondas hasta converger) ===")
+    print(f"{'Nodos':>6} {'log2(N)':>8} " + " ".join(f"{'k=' + str(k):>6}" for k in args.fanout))
+    for n in args.nodos:
+        columnas = []
+        for fanout in args.fanout:
+            rondas = [simular_gossip(n, fanout, semilla) for semilla in range(args.repeticiones)]
+            columnas.append(f"{statistics.mean(rondas):6.1f}")
+        print(f"{n:>6} {math.log2(n):8.1f} " + " ".join(columnas))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
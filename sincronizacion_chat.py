@@ -4,17 +4,26 @@ Sistema de sincronización P2P para el chat cooperativo
 """
 
 import asyncio
-import json
 import uuid
 import socket
 import threading
 import logging
 import time
+import random
+from concurrent.futures import ThreadPoolExecutor, Future
 from typing import Dict, Set, Optional, List, Any
 from dataclasses import asdict
 from chat_crdt import ChatCRDT, Mensaje, Operacion
+from bloom_chat import FiltroBloom
 from crdt_base import Timestamp
 from descubrimiento_nodos import GestorDescubrimiento, TipoDescubrimiento, InfoNodo
+from protocolo_red import (LectorTramas, enviar_mensaje, enviar_mensaje_async, recibir_mensaje_async,
+                          COMPRESIONES, UMBRAL_COMPRESION, FORMATOS)
+
+
+# Nodos encontrados por escaneo de puertos: su id es inventado (scan_<ip>_<puerto>),
+# así que no se confía en resúmenes causales asociados a él
+PREFIJO_NODO_ESCANEADO = "scan_"
 
 
 class SincronizadorChat:
@@ -35,11 +44,65 @@ class SincronizadorChat:
         
     def obtener_actualizaciones_desde(self, timestamp: Optional[Timestamp] = None) -> Dict:
         """Obtiene el estado completo para sincronización por estado"""
-        return {
-            'tipo_sync': 'estado',
-            'estado_completo': self.chat.obtener_estado_completo(),
-            'vector_clock': self.chat.vector_clock.copy()
-        }
+        with self.chat.lock:
+            return {
+                'tipo_sync': 'estado',
+                'estado_completo': self.chat.obtener_estado_completo(),
+                'vector_clock': self.chat.vector_clock.copy()
+            }
+    
+    def obtener_resumen(self) -> Dict[str, int]:
+        """
+        Obtiene el resumen que se intercambia antes del delta: el watermark
+        de operaciones aplicadas por nodo (no el vector clock, que también
+        cuenta lo aprendido por estado sin tener las operaciones en el log)
+        """
+        return self.chat.obtener_resumen_operaciones()
+    
+    def obtener_actualizaciones_para(self, vector_clock_remoto: Optional[Dict[str, int]],
+                                     permitir_merkle: bool = False) -> Dict:
+        """
+        Obtiene solo lo que le falta a un nodo según su vector clock.
+        Para nodos nuevos se recurre al estado completo; si el log local no
+        cubre la diferencia, al estado completo o (si el nodo lo admite) al
+        descenso por el árbol de Merkle.
+        """
+        if not vector_clock_remoto or not any(vector_clock_remoto.values()):
+            return self.obtener_actualizaciones_desde(None)
+        
+        with self.chat.lock:
+            operaciones = self.chat.obtener_operaciones_desde(vector_clock_remoto)
+            if operaciones is None:
+                if permitir_merkle:
+                    return self.obtener_inicio_merkle()
+                return self.obtener_actualizaciones_desde(None)
+            
+            return {
+                'tipo_sync': 'operaciones',
+                # Objetos Operacion: el protocolo los codifica en JSON o en binario
+                'operaciones': operaciones,
+                'vector_clock': self.chat.vector_clock.copy()
+            }
+    
+    def obtener_inicio_merkle(self) -> Dict:
+        """
+        Primer paso del descenso por el árbol de Merkle: los hashes del primer
+        nivel, junto con el vector clock y el resumen de operaciones tomados
+        ahora (el estado que se transfiera después es igual o más reciente)
+        """
+        with self.chat.lock:
+            return {
+                'tipo_sync': 'merkle',
+                'hashes': self.chat.obtener_hashes_merkle(['']),
+                'vector_clock': self.chat.vector_clock.copy(),
+                'resumen_operaciones': self.chat.obtener_resumen_operaciones()
+            }
+    
+    def hay_actualizaciones(self, datos_sync: Dict) -> bool:
+        """Indica si unos datos de sincronización contienen algo para aplicar"""
+        if datos_sync.get('tipo_sync') in ('estado', 'merkle'):
+            return True
+        return bool(datos_sync.get('operaciones'))
     
     def aplicar_actualizaciones(self, datos_sync: Dict) -> bool:
         """Aplica actualizaciones recibidas de otros clientes"""
@@ -50,40 +113,17 @@ class SincronizadorChat:
             # Sincronización por estado
             cambios = self.chat.sincronizar_por_estado(datos_sync['estado_completo'])
         elif 'operaciones' in datos_sync:
-            # Sincronización por operaciones (fallback)
+            # Sincronización por operaciones (delta)
             operaciones = [self._deserializar_operacion(op) for op in datos_sync['operaciones']]
-            self.chat.sincronizar_con(operaciones)
-            cambios = len(operaciones) > 0
+            cambios = self.chat.sincronizar_con(operaciones)
             
         return cambios
     
-    def _serializar_operacion(self, operacion: Operacion) -> Dict:
-        """Convierte una operación a formato JSON"""
-        return {
-            'tipo': operacion.tipo,
-            'clave': operacion.clave,
-            'valor': operacion.valor,
-            'timestamp': {
-                'node_id': operacion.timestamp.node_id,
-                'counter': operacion.timestamp.counter
-            },
-            'usuario': operacion.usuario
-        }
-    
-    def _deserializar_operacion(self, datos: Dict) -> Operacion:
-        """Convierte datos JSON a operación"""
-        timestamp = Timestamp(
-            datos['timestamp']['node_id'],
-            datos['timestamp']['counter']
-        )
-        
-        return Operacion(
-            tipo=datos['tipo'],
-            clave=datos['clave'],
-            valor=datos['valor'],
-            timestamp=timestamp,
-            usuario=datos['usuario']
-        )
+    def _deserializar_operacion(self, datos) -> Operacion:
+        """Convierte datos JSON a operación (el formato binario ya llega como Operacion)"""
+        if isinstance(datos, Operacion):
+            return datos
+        return Operacion.from_dict(datos)
 
 
 class ClienteP2PChat:
@@ -93,7 +133,16 @@ class ClienteP2PChat:
     """
     
     def __init__(self, chat: ChatCRDT, nombre_usuario: str = None, 
-                 puerto: int = 0, habilitar_autodescubrimiento: bool = True):
+                 puerto: int = 0, habilitar_autodescubrimiento: bool = True,
+                 max_sincronizaciones: int = 8, timeout_sincronizacion: float = 10.0,
+                 intervalo_sincronizacion: float = 3.0, habilitar_push: bool = True,
+                 ventana_push: float = 0.005, fanout_gossip: Optional[int] = None,
+                 compresion: Optional[str] = 'zlib_diccionario',
+                 umbral_compresion: int = UMBRAL_COMPRESION, formato: str = 'binario'):
+        if compresion is not None and compresion not in COMPRESIONES:
+            raise ValueError(f"Compresión desconocida: {compresion} (disponibles: {', '.join(COMPRESIONES)})")
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato desconocido: {formato} (disponibles: {', '.join(FORMATOS)})")
         self.chat = chat
         self.nombre_usuario = nombre_usuario or chat.usuario_id
         # Usar puerto base estándar o el especificado
@@ -104,6 +153,50 @@ class ClienteP2PChat:
         self.activo = False
         self.nodos_conocidos: Dict[str, InfoNodo] = {}
         self.conexiones_activas: Dict[str, socket.socket] = {}
+        self.lectores: Dict[str, LectorTramas] = {}
+        # Las conexiones se modifican desde el servidor, la sincronización y el descubrimiento
+        self._lock_conexiones = threading.Lock()
+        # El lock del propio chat: las escrituras de la red se serializan con
+        # las locales de la interfaz, no solo entre los hilos de red
+        self._lock_chat = chat.lock
+        
+        # Sincronización periódica en paralelo: cada par tiene su propio plazo
+        self.max_sincronizaciones = max_sincronizaciones
+        self.timeout_sincronizacion = timeout_sincronizacion
+        self.intervalo_sincronizacion = intervalo_sincronizacion
+        self._pool_sincronizacion: Optional[ThreadPoolExecutor] = None
+        self._trabajos_par: Dict[str, Future] = {}
+        self._sincronizando: Set[str] = set()
+        self.latencias: Dict[str, Dict[str, float]] = {}
+        # Una sola petición en vuelo por conexión: las respuestas no llevan id
+        self._locks_nodo: Dict[str, threading.Lock] = {}
+        
+        # Envío inmediato de las operaciones locales; el bucle periódico
+        # queda como reparación de lo que no llegue por esta vía
+        self.habilitar_push = habilitar_push
+        self.ventana_push = ventana_push
+        self._push_pendientes: List[Operacion] = []
+        # Mensajes push a la espera de cada par: se envían en orden, de a uno
+        self._push_por_nodo: Dict[str, List[Dict]] = {}
+        # Pool propio: una ráfaga de push no deja sin hilos a la anti-entropía
+        self._pool_push: Optional[ThreadPoolExecutor] = None
+        self._lock_push = threading.Lock()
+        self._evento_push = threading.Event()
+        self.push_thread = None
+        if habilitar_push:
+            chat.agregar_callback_operacion_local(self._encolar_push)
+        
+        # Modo gossip: en cada ronda se sincroniza con fanout_gossip pares al
+        # azar (conectando bajo demanda) en lugar de con todos los nodos
+        self.fanout_gossip = fanout_gossip
+        self._ultimo_uso: Dict[str, float] = {}
+        
+        # Compresión y formato negociados: cada lado anuncia en su primer
+        # mensaje lo que sabe leer, y solo se usa hacia quien lo anunció
+        self.compresion = compresion
+        self.umbral_compresion = umbral_compresion
+        self.formato = formato
+        self._capacidades_pares: Dict[str, Dict[str, List[str]]] = {}
         
         # Autodescubrimiento
         self.habilitar_autodescubrimiento = habilitar_autodescubrimiento
@@ -158,9 +251,21 @@ class ClienteP2PChat:
         self.servidor_thread.start()
         
         # Iniciar sincronización periódica
+        self._pool_sincronizacion = ThreadPoolExecutor(
+            max_workers=self.max_sincronizaciones,
+            thread_name_prefix=f"sync-{self.nombre_usuario}"
+        )
         self.sync_thread = threading.Thread(target=self._bucle_sincronizacion, daemon=True)
         self.sync_thread.start()
         
+        if self.habilitar_push:
+            self._pool_push = ThreadPoolExecutor(
+                max_workers=self.max_sincronizaciones,
+                thread_name_prefix=f"push-{self.nombre_usuario}"
+            )
+            self.push_thread = threading.Thread(target=self._bucle_push, daemon=True)
+            self.push_thread.start()
+        
         # Iniciar autodescubrimiento si está habilitado
         if self.habilitar_autodescubrimiento:
             self.iniciar_autodescubrimiento()
@@ -168,14 +273,16 @@ class ClienteP2PChat:
     def detener(self):
         """Detiene el cliente P2P"""
         self.activo = False
+        self._evento_push.set()
         
         # Cerrar conexiones
-        for conexion in self.conexiones_activas.values():
-            try:
-                conexion.close()
-            except:
-                pass
-        self.conexiones_activas.clear()
+        for nodo_id in self._nodos_conectados():
+            self._cerrar_conexion(nodo_id)
+        
+        if self._pool_sincronizacion:
+            self._pool_sincronizacion.shutdown(wait=False, cancel_futures=True)
+        if self._pool_push:
+            self._pool_push.shutdown(wait=False, cancel_futures=True)
         
         # Detener autodescubrimiento
         if self.gestor_descubrimiento:
@@ -225,19 +332,22 @@ class ClienteP2PChat:
         """Callback cuando se descubre un nuevo nodo"""
         if nodo.node_id != self.chat.usuario_id and nodo.node_id not in self.nodos_conocidos:
             self.nodos_conocidos[nodo.node_id] = nodo
+            self.chat.presencia.conectar(nodo.nombre_usuario)
             self.logger.info(f"Descubierto nodo: {nodo.nombre_usuario} ({nodo.ip_address}:{nodo.puerto})")
             
             # Notificar a la UI
             if self.callback_nodo_conectado:
                 self.callback_nodo_conectado(nodo)
             
-            # Intentar conectar al nodo
-            self._conectar_a_nodo(nodo)
+            # Intentar conectar al nodo (en modo gossip se conecta bajo demanda)
+            if not self.fanout_gossip:
+                self._conectar_a_nodo(nodo)
     
     def _nodo_perdido(self, nodo: InfoNodo):
         """Callback cuando se pierde un nodo"""
         if nodo.node_id in self.nodos_conocidos:
             del self.nodos_conocidos[nodo.node_id]
+            self.chat.presencia.desconectar(nodo.nombre_usuario)
             self.logger.info(f"Nodo perdido: {nodo.nombre_usuario}")
             
             # Notificar a la UI
@@ -245,12 +355,28 @@ class ClienteP2PChat:
                 self.callback_nodo_desconectado(nodo)
             
             # Cerrar conexión si existe
-            if nodo.node_id in self.conexiones_activas:
-                try:
-                    self.conexiones_activas[nodo.node_id].close()
-                except:
-                    pass
-                del self.conexiones_activas[nodo.node_id]
+            self._cerrar_conexion(nodo.node_id)
+            
+            # Un nodo perdido ya no frena la compactación del log
+            self.chat.olvidar_par(nodo.node_id)
+    
+    def _nodos_conectados(self) -> List[str]:
+        """Obtiene una copia de los ids de nodos con conexión activa"""
+        with self._lock_conexiones:
+            return list(self.conexiones_activas.keys())
+    
+    def _cerrar_conexion(self, nodo_id: str):
+        """Cierra y olvida la conexión saliente hacia un nodo"""
+        with self._lock_conexiones:
+            sock = self.conexiones_activas.pop(nodo_id, None)
+            self.lectores.pop(nodo_id, None)
+            self._locks_nodo.pop(nodo_id, None)
+            self._capacidades_pares.pop(nodo_id, None)
+        if sock:
+            try:
+                sock.close()
+            except:
+                pass
     
     def _conectar_a_nodo(self, nodo: InfoNodo):
         """Intenta conectarse a un nodo descubierto"""
@@ -259,7 +385,15 @@ class ClienteP2PChat:
             sock.settimeout(5)
             sock.connect((nodo.ip_address, nodo.puerto))
             
-            self.conexiones_activas[nodo.node_id] = sock
+            with self._lock_conexiones:
+                duplicada = nodo.node_id in self.conexiones_activas
+                if not duplicada:
+                    self.conexiones_activas[nodo.node_id] = sock
+                    self.lectores[nodo.node_id] = LectorTramas(sock)
+            if duplicada:
+                # Otro hilo se conectó a la vez (descubrimiento y reconexión)
+                sock.close()
+                return
             self.sincronizador.registrar_cliente(nodo.node_id)
             
             # Realizar sincronización inicial
@@ -308,34 +442,92 @@ class ClienteP2PChat:
         """Maneja una conexión de cliente entrante"""
         try:
             cliente_sock.settimeout(30)
+            lector = LectorTramas(cliente_sock)
+            capacidades = {}
             
             while self.activo:
-                # Recibir mensaje
-                data = cliente_sock.recv(8192)  # Aumentar buffer para estado completo
-                if not data:
+                # Recibir mensaje completo (puede ocupar varias tramas)
+                mensaje = lector.recibir_mensaje()
+                if mensaje is None:
                     break
                 
-                mensaje = json.loads(data.decode())
                 respuesta = self._procesar_mensaje(mensaje)
+                capacidades = self._negociar_capacidades(mensaje, respuesta, capacidades)
                 
                 # Enviar respuesta
-                respuesta_json = json.dumps(respuesta).encode()
-                cliente_sock.send(respuesta_json)
-                
-                # Para sync_data, no necesitamos respuesta adicional
-                # La confirmación ya se envió arriba
+                enviar_mensaje(cliente_sock, respuesta, **self._opciones_envio(capacidades))
                 
         except Exception as e:
             self.logger.error(f"Error manejando cliente {direccion}: {e}")
         finally:
             cliente_sock.close()
     
+    def _capacidades(self) -> Dict[str, List[str]]:
+        """Lo que este nodo sabe leer: se anuncia en el primer mensaje de cada conexión"""
+        return {'compresion': list(COMPRESIONES), 'formatos': list(FORMATOS)}
+    
+    def _leer_capacidades(self, mensaje: Dict) -> Dict[str, List[str]]:
+        # Un nodo antiguo no envía las claves: ni compresión ni binario
+        return {'compresion': mensaje.get('compresion', []), 'formatos': mensaje.get('formatos', [])}
+    
+    def _negociar_capacidades(self, mensaje: Dict, respuesta: Dict,
+                              capacidades: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """
+        Si el mensaje anuncia lo que sabe leer el remoto, responde con lo
+        nuestro. Devuelve las capacidades del remoto en esta conexión.
+        """
+        if 'compresion' not in mensaje:
+            return capacidades
+        respuesta.update(self._capacidades())
+        return self._leer_capacidades(mensaje)
+    
+    def _opciones_envio(self, capacidades: Optional[Dict[str, List[str]]]) -> Dict[str, Any]:
+        """Compresión y formato a usar hacia un par según lo que anunció"""
+        capacidades = capacidades or {}
+        compresion = self.compresion if self.compresion in capacidades.get('compresion', ()) else None
+        return {
+            'compresion': compresion,
+            'umbral': self.umbral_compresion,
+            'binario': self.formato == 'binario' and 'binario' in capacidades.get('formatos', ())
+        }
+    
     def _procesar_mensaje(self, mensaje: Dict) -> Dict:
         """Procesa un mensaje recibido"""
+        with self._lock_chat:
+            return self._procesar_mensaje_sin_lock(mensaje)
+    
+    def _procesar_mensaje_sin_lock(self, mensaje: Dict) -> Dict:
         try:
             tipo = mensaje.get('tipo')
             
-            if tipo == 'sync_request':
+            if tipo == 'sync_resumen':
+                # El nodo remoto nos envía su vector clock: respondemos con
+                # lo que le falta y con nuestro propio resumen
+                vector_clock_remoto = mensaje.get('vector_clock', {})
+                if mensaje.get('origen'):
+                    self.chat.registrar_resumen_par(mensaje['origen'], vector_clock_remoto)
+                
+                # Misma raíz de Merkle: nada que intercambiar
+                if mensaje.get('hash_estado') == self.chat.ultimo_estado_hash:
+                    return {
+                        'tipo': 'sync_delta',
+                        'datos': {'tipo_sync': 'operaciones', 'operaciones': []},
+                        'vector_clock': self.sincronizador.obtener_resumen(),
+                        'en_sincronia': True,
+                        'exito': True
+                    }
+                
+                actualizaciones = self.sincronizador.obtener_actualizaciones_para(
+                    vector_clock_remoto, permitir_merkle='hash_estado' in mensaje
+                )
+                return {
+                    'tipo': 'sync_delta',
+                    'datos': actualizaciones,
+                    'vector_clock': self.sincronizador.obtener_resumen(),
+                    'exito': True
+                }
+            
+            elif tipo == 'sync_request':
                 timestamp_desde = None
                 if 'timestamp_desde' in mensaje and mensaje['timestamp_desde'] is not None:
                     ts_data = mensaje['timestamp_desde']
@@ -348,6 +540,51 @@ class ClienteP2PChat:
                     'exito': True
                 }
             
+            elif tipo == 'sync_push':
+                # Operaciones enviadas por el nodo origen en cuanto se generaron
+                operaciones = [self.sincronizador._deserializar_operacion(datos)
+                               for datos in mensaje.get('operaciones', [])]
+                # Un push puede adelantarse a otro o al envío que edita: solo se
+                # aplica lo que sigue en orden causal, el resto llega por anti-entropía
+                aplicadas = self.chat.sincronizar_en_orden(operaciones)
+                
+                # Difusión epidémica: cada nodo reenvía una sola vez lo que aplicó,
+                # en el mismo orden, así que tampoco propaga huecos
+                if self.fanout_gossip:
+                    for operacion in aplicadas:
+                        self._encolar_push(operacion)
+                return {
+                    'tipo': 'sync_ack',
+                    'exito': True
+                }
+            
+            elif tipo == 'sync_bloom':
+                # El remoto no confía en los metadatos causales: le enviamos lo
+                # que no está en su filtro, y nuestro filtro para el camino inverso
+                filtro_remoto = FiltroBloom.from_dict(mensaje['filtro'])
+                return {
+                    'tipo': 'sync_bloom',
+                    'mensajes': self.chat.obtener_mensajes_fuera_de(filtro_remoto),
+                    'filtro': self.chat.obtener_filtro_bloom(filtro_remoto.semilla).to_dict(),
+                    'exito': True
+                }
+            
+            elif tipo == 'sync_merkle':
+                # Descenso por el árbol: hashes de los hijos de los prefijos distintos
+                return {
+                    'tipo': 'sync_merkle',
+                    'hashes': self.chat.obtener_hashes_merkle(mensaje.get('prefijos', [])),
+                    'exito': True
+                }
+            
+            elif tipo == 'sync_merkle_mensajes':
+                # Hojas distintas: se envían sus mensajes
+                return {
+                    'tipo': 'sync_merkle_mensajes',
+                    'mensajes': self.chat.obtener_mensajes_merkle(mensaje.get('prefijos', [])),
+                    'exito': True
+                }
+            
             elif tipo == 'sync_data':
                 self.sincronizador.aplicar_actualizaciones(mensaje['datos'])
                 return {
@@ -374,58 +611,425 @@ class ClienteP2PChat:
         """Bucle que ejecuta sincronización periódica"""
         while self.activo:
             try:
-                time.sleep(3)  # Sincronizar cada 3 segundos para chat
+                time.sleep(self.intervalo_sincronizacion)
+                
+                if self.fanout_gossip:
+                    pares = self._elegir_pares_gossip()
+                    self._limitar_conexiones_gossip(pares)
+                    for nodo in pares:
+                        self._programar(nodo.node_id, self._gossip_con_nodo, nodo)
+                else:
+                    # Sincronizar con todos los nodos a la vez sin esperar la ronda:
+                    # un par lento solo ocupa un hilo del pool hasta que vence su plazo
+                    for nodo_id in self._nodos_conectados():
+                        self._programar(nodo_id, self._sincronizar_con_nodo, nodo_id)
+                    for nodo in self._nodos_sin_conexion():
+                        self._programar(nodo.node_id, self._conectar_a_nodo, nodo)
                 
-                # Sincronizar con todos los nodos conectados
-                for nodo_id in list(self.conexiones_activas.keys()):
-                    self._sincronizar_con_nodo(nodo_id)
+                self._compactar_log()
                     
             except Exception as e:
                 self.logger.error(f"Error en bucle de sincronización: {e}")
     
-    def _sincronizar_con_nodo(self, nodo_id: str):
-        """Sincroniza con un nodo específico usando protocolo simplificado"""
-        if nodo_id not in self.conexiones_activas:
+    def _encolar_push(self, operacion: Operacion):
+        """Callback del chat: encola una operación local para enviarla a los pares"""
+        if not self.activo:
             return
+        with self._lock_push:
+            self._push_pendientes.append(operacion)
+        self._evento_push.set()
+    
+    def _tomar_push_pendientes(self) -> List[Operacion]:
+        with self._lock_push:
+            operaciones, self._push_pendientes = self._push_pendientes, []
+        return operaciones
+    
+    def _mensaje_push(self, operaciones: List[Operacion]) -> Dict:
+        return {
+            'tipo': 'sync_push',
+            'operaciones': operaciones,
+            'origen': self.chat.usuario_id
+        }
+    
+    def _bucle_push(self):
+        """Envía las operaciones locales en cuanto se generan, agrupando ráfagas"""
+        while self.activo:
+            if not self._evento_push.wait(timeout=1) or not self.activo:
+                continue
+            
+            # Las operaciones que lleguen durante la ventana viajan en el mismo mensaje
+            time.sleep(self.ventana_push)
+            self._evento_push.clear()
+            operaciones = self._tomar_push_pendientes()
+            if not operaciones:
+                continue
+            
+            mensaje = self._mensaje_push(operaciones)
+            for nodo_id in self._destinos_push():
+                self._programar_push(nodo_id, mensaje)
+    
+    def _programar_push(self, nodo_id: str, mensaje: Dict):
+        """
+        Encola el push para el par. Dos hilos del pool podrían adelantar un
+        lote al anterior, y el receptor descarta lo que llega tras un hueco:
+        un único trabajo por par los envía en el orden en que se generaron.
+        """
+        with self._lock_push:
+            cola = self._push_por_nodo.get(nodo_id)
+            if cola is not None:
+                cola.append(mensaje)
+                return
+            self._push_por_nodo[nodo_id] = [mensaje]
+        self._pool_push.submit(self._vaciar_push, nodo_id)
+    
+    def _vaciar_push(self, nodo_id: str):
+        while True:
+            with self._lock_push:
+                cola = self._push_por_nodo[nodo_id]
+                if not cola:
+                    del self._push_por_nodo[nodo_id]
+                    return
+                mensaje = cola.pop(0)
+            if not self._enviar_push(nodo_id, mensaje):
+                # Sin conexión el resto tampoco llegaría: la anti-entropía lo repara
+                with self._lock_push:
+                    cola.clear()
+    
+    def _enviar_push(self, nodo_id: str, mensaje: Dict) -> bool:
+        try:
+            respuesta = self._solicitar(nodo_id, mensaje, time.monotonic() + self.timeout_sincronizacion)
+            if not respuesta.get('exito'):
+                self.logger.warning(f"Nodo {nodo_id} rechazó el push")
+            return True
+        except Exception as e:
+            # La anti-entropía periódica repara lo que no haya llegado
+            self.logger.warning(f"Push fallido a {nodo_id}: {e}")
+            self._cerrar_conexion(nodo_id)
+            return False
+    
+    def _destinos_push(self) -> List[str]:
+        """Pares a los que se envían las operaciones: todos, o fanout_gossip al azar"""
+        conectados = self._nodos_conectados()
+        if self.fanout_gossip and len(conectados) > self.fanout_gossip:
+            return random.sample(conectados, self.fanout_gossip)
+        return conectados
+    
+    def _elegir_pares_gossip(self) -> List[InfoNodo]:
+        """Elige al azar los pares de esta ronda de gossip"""
+        with self._lock_conexiones:
+            conocidos = list(self.nodos_conocidos.values())
+        return random.sample(conocidos, min(self.fanout_gossip, len(conocidos)))
+    
+    def _gossip_con_nodo(self, nodo: InfoNodo):
+        """Push-pull de resúmenes con un par, abriendo la conexión si hace falta"""
+        self._ultimo_uso[nodo.node_id] = time.monotonic()
+        if nodo.node_id in self.conexiones_activas:
+            self._sincronizar_con_nodo(nodo.node_id)
+        else:
+            # La conexión nueva hace la sincronización inicial
+            self._conectar_a_nodo(nodo)
+    
+    def _conexiones_gossip_sobrantes(self, pares: List[InfoNodo]) -> List[str]:
+        """
+        Conexiones menos usadas por encima del límite (2 * fanout) que no
+        tienen trabajo en curso: así el número de sockets no crece con la red.
+        Se calcula antes de la ronda, dejando sitio a las conexiones que
+        abrirán los pares elegidos y sin cerrar las que van a usar.
+        """
+        conectados = self._nodos_conectados()
+        elegidos = {nodo.node_id for nodo in pares}
+        limite = 2 * self.fanout_gossip - len(elegidos.difference(conectados))
+        if len(conectados) <= limite:
+            return []
+        candidatos = [nodo_id for nodo_id in conectados if nodo_id not in elegidos]
+        candidatos.sort(key=lambda nodo_id: self._ultimo_uso.get(nodo_id, 0.0))
+        return [nodo_id for nodo_id in candidatos[:len(conectados) - limite]
+                if nodo_id not in self._sincronizando]
+    
+    def _limitar_conexiones_gossip(self, pares: List[InfoNodo]):
+        for nodo_id in self._conexiones_gossip_sobrantes(pares):
+            trabajo = self._trabajos_par.get(nodo_id)
+            if trabajo is None or trabajo.done():
+                self._cerrar_conexion(nodo_id)
+    
+    def _programar(self, nodo_id: str, funcion, *args):
+        """Envía trabajo al pool, salvo que el anterior de ese par siga en curso"""
+        anterior = self._trabajos_par.get(nodo_id)
+        if anterior is not None and not anterior.done():
+            return
+        self._trabajos_par[nodo_id] = self._pool_sincronizacion.submit(funcion, *args)
+    
+    def _compactar_log(self):
+        """Descarta las operaciones que ya vieron todos los nodos conocidos"""
+        if self.nodos_conocidos:
+            # Los hilos del servidor y del pool leen piso_log y el log bajo este lock
+            with self._lock_chat:
+                metricas = self.chat.compactar_log(list(self.nodos_conocidos.keys()))
+            if metricas['descartadas']:
+                self.logger.debug(f"Log compactado: {metricas['antes']} -> {metricas['despues']} operaciones")
+    
+    def _nodos_sin_conexion(self) -> List[InfoNodo]:
+        """Nodos conocidos cuya conexión se cerró (p.ej. tras un timeout)"""
+        with self._lock_conexiones:
+            return [nodo for nodo_id, nodo in list(self.nodos_conocidos.items())
+                    if nodo_id not in self.conexiones_activas]
+    
+    def _sincronizar_con_nodo(self, nodo_id: str):
+        """
+        Sincroniza con un nodo específico usando anti-entropía por deltas:
+        se intercambian vector clocks y solo viajan las operaciones faltantes.
+        Todo el intercambio tiene un plazo de timeout_sincronizacion segundos.
+        """
+        with self._lock_conexiones:
+            # Una sola sincronización en curso por conexión
+            if nodo_id not in self.conexiones_activas or nodo_id in self._sincronizando:
+                return
+            self._sincronizando.add(nodo_id)
         
+        inicio = time.monotonic()
+        limite = inicio + self.timeout_sincronizacion
+        exito = False
         try:
-            sock = self.conexiones_activas[nodo_id]
-            sock.settimeout(10)  # Timeout más corto para evitar colgarse
-            
-            # Paso 1: Enviar nuestro estado completo al nodo remoto
-            nuestro_estado = self.sincronizador.obtener_actualizaciones_desde(None)
-            mensaje = {
-                'tipo': 'sync_data',
-                'datos': nuestro_estado,
-                'origen': self.chat.usuario_id
-            }
-            
-            mensaje_json = json.dumps(mensaje)
-            sock.send(mensaje_json.encode())
+            # Paso 1: Enviar nuestro resumen y recibir lo que nos falta
+            if self._usar_bloom(nodo_id):
+                respuesta = self._solicitar(nodo_id, self._mensaje_bloom(), limite)
+            else:
+                respuesta = self._solicitar(nodo_id, self._mensaje_resumen(), limite)
             
-            # Paso 2: Recibir confirmación
-            ack_data = sock.recv(1024)
-            if ack_data:
-                ack = json.loads(ack_data.decode())
-                if ack.get('exito'):
-                    self.logger.debug(f"Estado enviado exitosamente a {nodo_id}")
-                else:
-                    self.logger.warning(f"Nodo {nodo_id} rechazó nuestros datos")
+            # Paso 2: Enviar solo lo que le falta al nodo remoto
+            if respuesta.get('tipo') == 'sync_bloom':
+                mensaje_datos = self._procesar_respuesta_bloom(nodo_id, respuesta)
+            elif self._es_inicio_merkle(respuesta):
+                # El log remoto no cubre nuestro vector clock: bajar por el árbol
+                descenso = self._descenso_merkle(nodo_id, respuesta)
+                mensaje_datos = next(descenso)
+                while mensaje_datos['tipo'] != 'sync_data':
+                    mensaje_datos = descenso.send(self._solicitar(nodo_id, mensaje_datos, limite))
+            else:
+                mensaje_datos = self._procesar_respuesta_resumen(nodo_id, respuesta)
             
-            # No necesitamos solicitar de vuelta - cada nodo envía a todos los demás
-            # La sincronización bidireccional ya se maneja automáticamente
+            # Paso 3: Verificar confirmación
+            if mensaje_datos is not None:
+                self._verificar_ack(nodo_id, self._solicitar(nodo_id, mensaje_datos, limite))
+            exito = True
             
         except socket.timeout:
             self.logger.warning(f"Timeout sincronizando con {nodo_id}")
+            # Una respuesta tardía desordenaría la conexión: se reabre en la siguiente ronda
+            self._cerrar_conexion(nodo_id)
         except Exception as e:
             self.logger.error(f"Error sincronizando con nodo {nodo_id}: {e}")
             # Eliminar conexión problemática
-            if nodo_id in self.conexiones_activas:
-                try:
-                    self.conexiones_activas[nodo_id].close()
-                except:
-                    pass
-                del self.conexiones_activas[nodo_id]
+            self._cerrar_conexion(nodo_id)
+        finally:
+            with self._lock_conexiones:
+                self._sincronizando.discard(nodo_id)
+            self._registrar_latencia(nodo_id, time.monotonic() - inicio, exito)
+    
+    def _registrar_latencia(self, nodo_id: str, segundos: float, exito: bool):
+        """Actualiza las estadísticas de latencia de sincronización de un par"""
+        milisegundos = segundos * 1000
+        with self._lock_conexiones:
+            stats = self.latencias.setdefault(nodo_id, {
+                'sincronizaciones': 0, 'fallos': 0,
+                'ultima_ms': 0.0, 'media_ms': 0.0, 'maxima_ms': 0.0
+            })
+            stats['sincronizaciones'] += 1
+            if not exito:
+                stats['fallos'] += 1
+            stats['ultima_ms'] = milisegundos
+            # Media móvil exponencial: refleja el estado reciente del par
+            if stats['sincronizaciones'] == 1:
+                stats['media_ms'] = milisegundos
+            else:
+                stats['media_ms'] = 0.8 * stats['media_ms'] + 0.2 * milisegundos
+            stats['maxima_ms'] = max(stats['maxima_ms'], milisegundos)
+        
+        # Un par que responde sigue presente aunque no escriba
+        nodo = self.nodos_conocidos.get(nodo_id)
+        if exito and nodo is not None:
+            self.chat.presencia.registrar(nodo.nombre_usuario)
+    
+    def obtener_latencias(self) -> Dict[str, Dict[str, float]]:
+        """Obtiene las estadísticas de latencia de sincronización por par"""
+        with self._lock_conexiones:
+            return {nodo_id: stats.copy() for nodo_id, stats in self.latencias.items()}
+    
+    def _mensaje_resumen(self) -> Dict:
+        """Mensaje que abre la sincronización: nuestro resumen de operaciones"""
+        return {
+            'tipo': 'sync_resumen',
+            'vector_clock': self.sincronizador.obtener_resumen(),
+            'hash_estado': self.chat.ultimo_estado_hash,
+            'origen': self.chat.usuario_id
+        }
+    
+    def _procesar_respuesta_resumen(self, nodo_id: str, respuesta: Dict) -> Optional[Dict]:
+        """
+        Aplica lo que nos envió el nodo remoto y prepara lo que le falta.
+        Devuelve el mensaje sync_data a enviar, o None si no hay nada.
+        """
+        if not respuesta.get('exito'):
+            self.logger.warning(f"Nodo {nodo_id} rechazó el resumen de sincronización")
+            return None
+        
+        with self._lock_chat:
+            self.chat.registrar_resumen_par(nodo_id, respuesta.get('vector_clock', {}))
+            if respuesta.get('en_sincronia'):
+                return None
+            
+            datos_remotos = respuesta.get('datos', {})
+            if self.sincronizador.hay_actualizaciones(datos_remotos):
+                self.sincronizador.aplicar_actualizaciones(datos_remotos)
+            
+            nuestros_datos = self.sincronizador.obtener_actualizaciones_para(
+                respuesta.get('vector_clock', {})
+            )
+        if not self.sincronizador.hay_actualizaciones(nuestros_datos):
+            return None
+        
+        return {
+            'tipo': 'sync_data',
+            'datos': nuestros_datos,
+            'origen': self.chat.usuario_id
+        }
+    
+    def _usar_bloom(self, nodo_id: str) -> bool:
+        """Los nodos escaneados se reconcilian por filtro de Bloom, sin vector clocks"""
+        return nodo_id.startswith(PREFIJO_NODO_ESCANEADO)
+    
+    def _mensaje_bloom(self) -> Dict:
+        # Semilla nueva en cada ronda: los falsos positivos no se repiten
+        with self._lock_chat:
+            filtro = self.chat.obtener_filtro_bloom(random.getrandbits(32))
+        return {
+            'tipo': 'sync_bloom',
+            'filtro': filtro.to_dict(),
+            'origen': self.chat.usuario_id
+        }
+    
+    def _procesar_respuesta_bloom(self, nodo_id: str, respuesta: Dict) -> Optional[Dict]:
+        """
+        Aplica los mensajes que nos faltaban y prepara los que le faltan al
+        remoto según su filtro. Solo viajan mensajes: ni vector clock ni
+        resumen de operaciones, que no serían fiables para este par.
+        """
+        if not respuesta.get('exito'):
+            self.logger.warning(f"Nodo {nodo_id} rechazó la negociación por filtro de Bloom")
+            return None
+        
+        with self._lock_chat:
+            if respuesta.get('mensajes'):
+                self.chat.sincronizar_por_estado({'mensajes': respuesta['mensajes']})
+            nuestros_mensajes = self.chat.obtener_mensajes_fuera_de(
+                FiltroBloom.from_dict(respuesta['filtro'])
+            )
+        if not nuestros_mensajes:
+            return None
+        
+        return {
+            'tipo': 'sync_data',
+            'datos': {
+                'tipo_sync': 'estado',
+                'estado_completo': {'usuario_id': self.chat.usuario_id, 'mensajes': nuestros_mensajes}
+            },
+            'origen': self.chat.usuario_id
+        }
+    
+    def _es_inicio_merkle(self, respuesta: Dict) -> bool:
+        return bool(respuesta.get('exito')) and respuesta.get('datos', {}).get('tipo_sync') == 'merkle'
+    
+    def _descenso_merkle(self, nodo_id: str, respuesta: Dict):
+        """
+        Generador con los pasos del descenso por el árbol de Merkle: produce
+        cada petición para el nodo remoto y recibe su respuesta por send().
+        Lo último que produce es el sync_data con nuestros mensajes de las
+        hojas distintas. Son profundidad + 1 idas y vueltas como mucho.
+        """
+        datos = respuesta['datos']
+        arbol = self.chat.arbol_merkle
+        with self._lock_chat:
+            self.chat.registrar_resumen_par(nodo_id, respuesta.get('vector_clock', {}))
+            # Nuestro resumen se toma antes de comparar, igual que el remoto
+            vector_clock = self.chat.vector_clock.copy()
+            resumen = self.chat.obtener_resumen_operaciones()
+            prefijos = arbol.hijos_distintos([''], datos.get('hashes', {}))
+        
+        while prefijos and not arbol.es_hoja(prefijos[0]):
+            respuesta = yield {'tipo': 'sync_merkle', 'prefijos': prefijos}
+            if not respuesta.get('exito'):
+                raise RuntimeError(f"Nodo {nodo_id} rechazó el descenso de Merkle")
+            with self._lock_chat:
+                prefijos = arbol.hijos_distintos(prefijos, respuesta.get('hashes', {}))
+        
+        mensajes_remotos = {}
+        if prefijos:
+            respuesta = yield {'tipo': 'sync_merkle_mensajes', 'prefijos': prefijos}
+            if not respuesta.get('exito'):
+                raise RuntimeError(f"Nodo {nodo_id} rechazó el descenso de Merkle")
+            mensajes_remotos = respuesta.get('mensajes', {})
+        
+        with self._lock_chat:
+            # Las hojas iguales ya coincidían: con las distintas tenemos todo
+            # lo que el remoto tenía al empezar, y su resumen cuenta como aplicado
+            self.chat.sincronizar_por_estado({
+                'mensajes': mensajes_remotos,
+                'vector_clock': datos.get('vector_clock', {}),
+                'resumen_operaciones': datos.get('resumen_operaciones', {})
+            })
+            nuestros_mensajes = self.chat.obtener_mensajes_merkle(prefijos)
+        
+        yield {
+            'tipo': 'sync_data',
+            'datos': {
+                'tipo_sync': 'estado',
+                'estado_completo': {
+                    'usuario_id': self.chat.usuario_id,
+                    'mensajes': nuestros_mensajes,
+                    'vector_clock': vector_clock,
+                    'resumen_operaciones': resumen
+                }
+            },
+            'origen': self.chat.usuario_id
+        }
+    
+    def _verificar_ack(self, nodo_id: str, ack: Dict):
+        if ack.get('exito'):
+            self.logger.debug(f"Delta enviado exitosamente a {nodo_id}")
+        else:
+            self.logger.warning(f"Nodo {nodo_id} rechazó nuestros datos")
+    
+    def _solicitar(self, nodo_id: str, mensaje: Dict, limite: Optional[float] = None) -> Dict:
+        """Envía un mensaje enmarcado a un nodo y espera su respuesta (hasta el instante límite)"""
+        with self._lock_conexiones:
+            sock = self.conexiones_activas[nodo_id]
+            lector = self.lectores[nodo_id]
+            lock = self._locks_nodo.setdefault(nodo_id, threading.Lock())
+        
+        if limite is None:
+            limite = time.monotonic() + self.timeout_sincronizacion
+        # Push y sincronización comparten la conexión: una petición a la vez
+        if not lock.acquire(timeout=max(0.0, limite - time.monotonic())):
+            raise socket.timeout(f"Plazo de sincronización agotado con {nodo_id}")
+        try:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise socket.timeout(f"Plazo de sincronización agotado con {nodo_id}")
+            sock.settimeout(restante)
+            
+            anunciar = nodo_id not in self._capacidades_pares
+            if anunciar:
+                mensaje = dict(mensaje, **self._capacidades())
+            enviar_mensaje(sock, mensaje, **self._opciones_envio(self._capacidades_pares.get(nodo_id)))
+            respuesta = lector.recibir_mensaje(limite)
+            if respuesta is None:
+                raise ConnectionError(f"El nodo {nodo_id} cerró la conexión")
+            if anunciar:
+                # Un nodo antiguo responde sin las claves: no se le vuelve a anunciar
+                self._capacidades_pares[nodo_id] = self._leer_capacidades(respuesta)
+            return respuesta
+        finally:
+            lock.release()
     
     def _serializar_timestamp(self, timestamp: Optional[Timestamp]) -> Optional[Dict]:
         """Serializa un timestamp a diccionario"""
@@ -448,10 +1052,363 @@ class ClienteP2PChat:
             'conexiones_activas': len(self.conexiones_activas),
             'puerto_local': self.puerto,
             'usuario': self.nombre_usuario,
-            'autodescubrimiento_activo': self.gestor_descubrimiento is not None
+            'autodescubrimiento_activo': self.gestor_descubrimiento is not None,
+            'latencias': self.obtener_latencias()
         }
 
 
+class ClienteP2PChatAsync(ClienteP2PChat):
+    """
+    Cliente P2P sobre un único event loop de asyncio.
+    Servidor, conexiones con pares y bucle de sincronización son corrutinas
+    que corren en un solo hilo: no hay un hilo por conexión y la ronda de
+    sincronización habla con todos los pares a la vez (acotada por
+    max_sincronizaciones). La API pública y los callbacks son los mismos que
+    en ClienteP2PChat; conexiones_activas y lectores guardan los
+    StreamWriter y StreamReader de cada par.
+    """
+    
+    def __init__(self, chat: ChatCRDT, nombre_usuario: str = None,
+                 puerto: int = 0, habilitar_autodescubrimiento: bool = True,
+                 max_sincronizaciones: int = 32, timeout_sincronizacion: float = 10.0,
+                 intervalo_sincronizacion: float = 3.0, habilitar_push: bool = True,
+                 ventana_push: float = 0.005, fanout_gossip: Optional[int] = None,
+                 compresion: Optional[str] = 'zlib_diccionario',
+                 umbral_compresion: int = UMBRAL_COMPRESION, formato: str = 'binario',
+                 max_conexiones: int = 512):
+        super().__init__(chat, nombre_usuario, puerto, habilitar_autodescubrimiento,
+                         max_sincronizaciones, timeout_sincronizacion, intervalo_sincronizacion,
+                         habilitar_push, ventana_push, fanout_gossip, compresion, umbral_compresion,
+                         formato)
+        self.max_conexiones = max_conexiones
+        
+        # Event loop propio (la GUI y el descubrimiento siguen en sus hilos)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread = None
+        self._servidor = None
+        self._tareas: Set[asyncio.Task] = set()
+        self._tareas_par: Dict[str, asyncio.Task] = {}
+        self._clientes: Set[asyncio.StreamWriter] = set()
+        self._locks_nodo: Dict[str, asyncio.Lock] = {}
+        self._limite_sincronizaciones = None
+        self._envio_push_programado: Optional[asyncio.TimerHandle] = None
+        
+        self.logger = logging.getLogger(f"ClienteP2PChatAsync-{self.nombre_usuario}")
+    
+    def iniciar(self):
+        """Inicia el event loop, el servidor y la sincronización periódica"""
+        if self.activo:
+            return
+        
+        self.activo = True
+        self.logger.info(f"Iniciando cliente P2P (asyncio) en puerto {self.puerto}")
+        
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self._ejecutar_loop, daemon=True)
+        self.loop_thread.start()
+        
+        # Esperar a que el servidor esté escuchando
+        asyncio.run_coroutine_threadsafe(self._iniciar_async(), self.loop).result()
+        
+        if self.habilitar_autodescubrimiento:
+            self.iniciar_autodescubrimiento()
+    
+    def detener(self):
+        """Detiene el cliente P2P y el event loop"""
+        if not self.activo:
+            return
+        self.activo = False
+        
+        # Detener autodescubrimiento
+        if self.gestor_descubrimiento:
+            self.gestor_descubrimiento.detener_todos()
+        
+        if self.loop and self.loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self._detener_async(), self.loop).result(timeout=5)
+            except Exception as e:
+                self.logger.error(f"Error deteniendo el event loop: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join(timeout=5)
+        
+        self.logger.info("Cliente P2P detenido")
+    
+    def _ejecutar_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+    
+    def _en_loop(self) -> bool:
+        return threading.current_thread() is self.loop_thread
+    
+    def _crear_tarea(self, corrutina) -> asyncio.Task:
+        """Crea una tarea en el loop y la registra para cancelarla al detener"""
+        tarea = self.loop.create_task(corrutina)
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+        return tarea
+    
+    async def _iniciar_async(self):
+        self._limite_sincronizaciones = asyncio.Semaphore(self.max_sincronizaciones)
+        try:
+            self._servidor = await asyncio.start_server(
+                self._manejar_cliente_async, host='', port=self.puerto, reuse_address=True
+            )
+            self.logger.info(f"Servidor escuchando en puerto {self.puerto}")
+        except Exception as e:
+            self.logger.error(f"Error fatal en servidor: {e}")
+        
+        self._crear_tarea(self._bucle_sincronizacion_async())
+    
+    async def _detener_async(self):
+        if self._servidor:
+            self._servidor.close()
+        
+        for nodo_id in self._nodos_conectados():
+            self._cerrar_conexion(nodo_id)
+        for writer in list(self._clientes):
+            writer.close()
+        
+        tareas = [tarea for tarea in self._tareas if tarea is not asyncio.current_task()]
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+    
+    def _cerrar_conexion(self, nodo_id: str):
+        """Cierra la conexión con un nodo (desde cualquier hilo)"""
+        if self.loop and self.loop.is_running() and not self._en_loop():
+            self.loop.call_soon_threadsafe(self._cerrar_conexion, nodo_id)
+            return
+        
+        with self._lock_conexiones:
+            writer = self.conexiones_activas.pop(nodo_id, None)
+            self.lectores.pop(nodo_id, None)
+            self._capacidades_pares.pop(nodo_id, None)
+        self._locks_nodo.pop(nodo_id, None)
+        if writer:
+            writer.close()
+    
+    def _conectar_a_nodo(self, nodo: InfoNodo):
+        """Programa la conexión a un nodo descubierto (llamado desde el descubrimiento)"""
+        if self.activo and self.loop:
+            self.loop.call_soon_threadsafe(self._crear_tarea, self._conectar_a_nodo_async(nodo))
+    
+    async def _conectar_a_nodo_async(self, nodo: InfoNodo):
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(nodo.ip_address, nodo.puerto), timeout=5
+            )
+        except Exception as e:
+            self.logger.error(f"Error conectando a nodo {nodo.nombre_usuario}: {e}")
+            return
+        
+        with self._lock_conexiones:
+            duplicada = nodo.node_id in self.conexiones_activas
+            if not duplicada:
+                self.conexiones_activas[nodo.node_id] = writer
+                self.lectores[nodo.node_id] = reader
+        if duplicada:
+            writer.close()
+            return
+        self.sincronizador.registrar_cliente(nodo.node_id)
+        
+        # Realizar sincronización inicial
+        await self._sincronizar_con_nodo_async(nodo.node_id)
+        
+        self.logger.info(f"Conectado a nodo {nodo.nombre_usuario}")
+    
+    async def _manejar_cliente_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Atiende una conexión entrante: una corrutina por conexión, no un hilo"""
+        direccion = writer.get_extra_info('peername')
+        if len(self._clientes) >= self.max_conexiones:
+            self.logger.warning(f"Conexión rechazada de {direccion}: límite de {self.max_conexiones}")
+            writer.close()
+            return
+        
+        self._clientes.add(writer)
+        capacidades = {}
+        try:
+            while self.activo:
+                mensaje = await asyncio.wait_for(recibir_mensaje_async(reader), timeout=30)
+                if mensaje is None:
+                    break
+                
+                respuesta = self._procesar_mensaje(mensaje)
+                capacidades = self._negociar_capacidades(mensaje, respuesta, capacidades)
+                await enviar_mensaje_async(writer, respuesta, **self._opciones_envio(capacidades))
+                
+        except asyncio.TimeoutError:
+            self.logger.debug(f"Conexión inactiva cerrada: {direccion}")
+        except Exception as e:
+            self.logger.error(f"Error manejando cliente {direccion}: {e}")
+        finally:
+            self._clientes.discard(writer)
+            writer.close()
+    
+    async def _bucle_sincronizacion_async(self):
+        """Sincroniza periódicamente con todos los nodos conectados a la vez"""
+        while self.activo:
+            try:
+                await asyncio.sleep(self.intervalo_sincronizacion)
+                
+                # Igual que con hilos: no se espera la ronda, y a un par con
+                # la sincronización anterior en curso no se le lanza otra
+                if self.fanout_gossip:
+                    pares = self._elegir_pares_gossip()
+                    for nodo_id in self._conexiones_gossip_sobrantes(pares):
+                        tarea = self._tareas_par.get(nodo_id)
+                        if tarea is None or tarea.done():
+                            self._cerrar_conexion(nodo_id)
+                    for nodo in pares:
+                        self._programar_async(nodo.node_id, self._gossip_con_nodo_async(nodo))
+                else:
+                    for nodo_id in self._nodos_conectados():
+                        self._programar_async(nodo_id, self._sincronizar_con_nodo_async(nodo_id))
+                    for nodo in self._nodos_sin_conexion():
+                        self._programar_async(nodo.node_id, self._conectar_a_nodo_async(nodo))
+                
+                self._compactar_log()
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error en bucle de sincronización: {e}")
+    
+    def _encolar_push(self, operacion: Operacion):
+        """Callback del chat (desde cualquier hilo): encola la operación en el loop"""
+        if self.activo and self.loop:
+            self.loop.call_soon_threadsafe(self._encolar_push_en_loop, operacion)
+    
+    def _encolar_push_en_loop(self, operacion: Operacion):
+        with self._lock_push:
+            self._push_pendientes.append(operacion)
+        # Las operaciones que lleguen durante la ventana viajan en el mismo mensaje
+        if self._envio_push_programado is None:
+            self._envio_push_programado = self.loop.call_later(self.ventana_push, self._difundir_push_async)
+    
+    def _difundir_push_async(self):
+        self._envio_push_programado = None
+        operaciones = self._tomar_push_pendientes()
+        if not operaciones:
+            return
+        
+        mensaje = self._mensaje_push(operaciones)
+        for nodo_id in self._destinos_push():
+            self._crear_tarea(self._enviar_push_async(nodo_id, mensaje))
+    
+    async def _enviar_push_async(self, nodo_id: str, mensaje: Dict):
+        lock = self._locks_nodo.setdefault(nodo_id, asyncio.Lock())
+        try:
+            async with lock:
+                respuesta = await asyncio.wait_for(self._solicitar_async(nodo_id, mensaje),
+                                                   self.timeout_sincronizacion)
+            if not respuesta.get('exito'):
+                self.logger.warning(f"Nodo {nodo_id} rechazó el push")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # La anti-entropía periódica repara lo que no haya llegado
+            self.logger.warning(f"Push fallido a {nodo_id}: {e!r}")
+            self._cerrar_conexion(nodo_id)
+    
+    async def _gossip_con_nodo_async(self, nodo: InfoNodo):
+        self._ultimo_uso[nodo.node_id] = time.monotonic()
+        if nodo.node_id in self.conexiones_activas:
+            await self._sincronizar_con_nodo_async(nodo.node_id)
+        else:
+            await self._conectar_a_nodo_async(nodo)
+    
+    def _programar_async(self, nodo_id: str, corrutina):
+        anterior = self._tareas_par.get(nodo_id)
+        if anterior is not None and not anterior.done():
+            corrutina.close()
+            return
+        self._tareas_par[nodo_id] = self._crear_tarea(corrutina)
+    
+    def _sincronizar_con_nodo(self, nodo_id: str):
+        """Sincroniza con un nodo desde fuera del loop, esperando el resultado"""
+        if self.loop and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._sincronizar_con_nodo_async(nodo_id), self.loop).result()
+    
+    async def _sincronizar_con_nodo_async(self, nodo_id: str):
+        """Mismo protocolo que _sincronizar_con_nodo, sin bloquear el loop"""
+        if nodo_id not in self.conexiones_activas:
+            return
+        
+        # Una sola petición en vuelo por conexión: las respuestas no llevan id
+        lock = self._locks_nodo.setdefault(nodo_id, asyncio.Lock())
+        async with self._limite_sincronizaciones, lock:
+            inicio = time.monotonic()
+            exito = False
+            try:
+                # Todo el intercambio comparte el plazo del par
+                await asyncio.wait_for(self._intercambio_async(nodo_id), self.timeout_sincronizacion)
+                exito = True
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Timeout sincronizando con {nodo_id}")
+                self._cerrar_conexion(nodo_id)
+            except Exception as e:
+                self.logger.error(f"Error sincronizando con nodo {nodo_id}: {e}")
+                # Eliminar conexión problemática
+                self._cerrar_conexion(nodo_id)
+            finally:
+                self._registrar_latencia(nodo_id, time.monotonic() - inicio, exito)
+    
+    async def _intercambio_async(self, nodo_id: str):
+        if self._usar_bloom(nodo_id):
+            respuesta = await self._solicitar_async(nodo_id, self._mensaje_bloom())
+        else:
+            respuesta = await self._solicitar_async(nodo_id, self._mensaje_resumen())
+        
+        if respuesta.get('tipo') == 'sync_bloom':
+            mensaje_datos = self._procesar_respuesta_bloom(nodo_id, respuesta)
+        elif self._es_inicio_merkle(respuesta):
+            descenso = self._descenso_merkle(nodo_id, respuesta)
+            mensaje_datos = next(descenso)
+            while mensaje_datos['tipo'] != 'sync_data':
+                mensaje_datos = descenso.send(await self._solicitar_async(nodo_id, mensaje_datos))
+        else:
+            mensaje_datos = self._procesar_respuesta_resumen(nodo_id, respuesta)
+        if mensaje_datos is not None:
+            self._verificar_ack(nodo_id, await self._solicitar_async(nodo_id, mensaje_datos))
+    
+    async def _solicitar_async(self, nodo_id: str, mensaje: Dict) -> Dict:
+        """Envía un mensaje enmarcado a un nodo y espera su respuesta"""
+        with self._lock_conexiones:
+            writer = self.conexiones_activas[nodo_id]
+            reader = self.lectores[nodo_id]
+        
+        anunciar = nodo_id not in self._capacidades_pares
+        if anunciar:
+            mensaje = dict(mensaje, **self._capacidades())
+        await enviar_mensaje_async(writer, mensaje, **self._opciones_envio(self._capacidades_pares.get(nodo_id)))
+        respuesta = await recibir_mensaje_async(reader)
+        if respuesta is None:
+            raise ConnectionError(f"El nodo {nodo_id} cerró la conexión")
+        if anunciar:
+            self._capacidades_pares[nodo_id] = self._leer_capacidades(respuesta)
+        return respuesta
+
+
+# Implementaciones de red disponibles
+MODOS_RED = {
+    'hilos': ClienteP2PChat,
+    'asyncio': ClienteP2PChatAsync,
+}
+
+
+def crear_cliente_p2p(chat: ChatCRDT, nombre_usuario: str = None, puerto: int = 0,
+                      habilitar_autodescubrimiento: bool = True, modo: str = 'hilos',
+                      **opciones) -> ClienteP2PChat:
+    """
+    Crea el cliente P2P con la implementación de red elegida ('hilos' o 'asyncio').
+    Las opciones adicionales se pasan al constructor (p.ej. habilitar_push).
+    """
+    if modo not in MODOS_RED:
+        raise ValueError(f"Modo de red desconocido: {modo} (disponibles: {', '.join(MODOS_RED)})")
+    return MODOS_RED[modo](chat, nombre_usuario, puerto, habilitar_autodescubrimiento, **opciones)
+
+
 def crear_cliente_simulado(nombre_usuario: str) -> ClienteP2PChat:
     """Crea un cliente simulado para pruebas"""
     chat = ChatCRDT(nombre_usuario)
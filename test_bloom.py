@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test de la negociación por filtro de Bloom con nodos escaneados
+"""
+
+import json
+from chat_crdt import ChatCRDT
+from bloom_chat import FiltroBloom
+from sincronizacion_chat import ClienteP2PChat
+from conftest import conectar_en_memoria
+
+
+def test_filtro_bloom():
+    print("=== TEST FILTRO DE BLOOM ===")
+    filtro = FiltroBloom.para(10000, 0.01, semilla=7)
+    for i in range(10000):
+        filtro.agregar(f"dentro{i}")
+    
+    copia = FiltroBloom.from_dict(json.loads(json.dumps(filtro.to_dict())))
+    assert all(f"dentro{i}" in copia for i in range(10000))
+    
+    falsos = sum(f"fuera{i}" in copia for i in range(10000))
+    print(f"{len(filtro.bits)} bytes para 10000 claves; falsos positivos: {falsos / 100:.2f}%")
+    assert falsos < 200
+    print("SUCCESS: Sin falsos negativos y ~1% de falsos positivos")
+
+
+def test_negociacion_nodo_escaneado():
+    print("=== TEST NEGOCIACIÓN BLOOM CON NODO ESCANEADO ===")
+    alice = ChatCRDT("alice")
+    for i in range(1000):
+        alice.enviar_mensaje(f"Mensaje {i}")
+    
+    bob = ChatCRDT("bob")
+    bob.sincronizar_por_estado(alice.obtener_estado_completo())
+    alice.enviar_mensaje("Solo en Alice")
+    bob.enviar_mensaje("Solo en Bob")
+    
+    cliente_alice = ClienteP2PChat(alice, "Alice", habilitar_autodescubrimiento=False, habilitar_push=False)
+    cliente_bob = ClienteP2PChat(bob, "Bob", habilitar_autodescubrimiento=False, habilitar_push=False)
+    nodo_escaneado = "scan_127.0.0.1_12345"
+    trafico = conectar_en_memoria(cliente_alice, cliente_bob, nodo_escaneado)
+    
+    # Un falso positivo puede dejar un mensaje para la ronda siguiente
+    for _ in range(3):
+        cliente_alice._sincronizar_con_nodo(nodo_escaneado)
+        if alice.ultimo_estado_hash == bob.ultimo_estado_hash:
+            break
+    
+    estado = len(json.dumps(alice.obtener_estado_completo()))
+    primera = sum(bytes_ for _, bytes_ in trafico[:2])
+    print(f"Pasos: {[tipo for tipo, _ in trafico]}")
+    print(f"Tráfico de la primera ronda: {primera} bytes (estado completo: {estado} bytes)")
+    
+    assert trafico[0][0] == 'sync_bloom'
+    assert len(alice.mensajes) == len(bob.mensajes) == 1002
+    assert alice.ultimo_estado_hash == bob.ultimo_estado_hash
+    assert primera < estado / 20
+    # Sin resumen causal registrado a nombre del id inventado
+    assert nodo_escaneado not in alice.resumenes_pares
+    print("SUCCESS: Solo viajan los filtros y la diferencia")
+
+
+if __name__ == "__main__":
+    test_filtro_bloom()
+    test_negociacion_nodo_escaneado()
\ No newline at end of file
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test de la codificación binaria de las operaciones de sincronización
+"""
+
+from datetime import datetime, timezone
+from chat_crdt import ChatCRDT, Operacion
+from crdt_base import Timestamp
+from codec_binario import codificar_mensaje, decodificar_mensaje, ErrorCodec
+from protocolo_red import codificar_payload, decodificar_payload
+
+
+def test_ida_y_vuelta():
+    print("=== TEST CODEC BINARIO IDA Y VUELTA ===")
+    chat = ChatCRDT("alice")
+    ids = [chat.enviar_mensaje(f"Mensaje {i} con acentos: ñandú") for i in range(50)]
+    chat.editar_mensaje(ids[0], "Editado")
+    chat.eliminar_mensaje(ids[1])
+    operaciones = chat.obtener_operaciones_desde({})
+    
+    # Casos que no siguen el camino rápido: id que no es UUID, timestamp con
+    # zona horaria, tipo desconocido y valores arbitrarios
+    operaciones += [
+        Operacion("enviar_mensaje", "id-manual", {
+            'mensaje_id': "id-manual", 'contenido': "Con zona", 'autor': "bob",
+            'timestamp': datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc).isoformat(),
+            'canal': "general"}, Timestamp("bob", 1), "bob"),
+        Operacion("editar_mensaje", "id-manual", {
+            'mensaje_id': "id-manual", 'contenido': "Versión propia", 'autor': "bob",
+            'timestamp': datetime(2024, 5, 1, 12, 0).isoformat(), 'canal': "general",
+            'version': {'node_id': "carol", 'counter': 300}}, Timestamp("bob", 4), "bob"),
+        Operacion("reaccion", "id-manual", {'emoji': "👍", 'n': 3}, Timestamp("bob", 2), "bob"),
+        Operacion("eliminar_mensaje", "id-manual", None, Timestamp("bob", 3), "bob"),
+    ]
+    
+    mensaje = {'tipo': 'sync_delta', 'datos': {'operaciones': operaciones, 'vector_clock': {'alice': 52}}}
+    binario = codificar_mensaje(mensaje)
+    recibido = decodificar_mensaje(binario)
+    json_ = codificar_payload(mensaje)
+    print(f"Tamaño binario: {len(binario)} bytes, JSON: {len(json_)} bytes")
+    
+    assert recibido['tipo'] == 'sync_delta'
+    assert recibido['datos']['vector_clock'] == {'alice': 52}
+    assert recibido['datos']['operaciones'] == operaciones
+    # Lo mismo que llega por JSON, una vez convertido a dicts
+    assert [op.to_dict() for op in recibido['datos']['operaciones']] == \
+        decodificar_payload(json_)['datos']['operaciones']
+    assert len(binario) < len(json_) / 2
+    
+    # Las operaciones también pueden entrar como dicts, y los mensajes sin listas pasan igual
+    assert decodificar_mensaje(codificar_mensaje(
+        {'tipo': 'sync_push', 'operaciones': [op.to_dict() for op in operaciones]}))['operaciones'] == operaciones
+    assert decodificar_mensaje(codificar_mensaje({'tipo': 'sync_ack', 'exito': True})) == \
+        {'tipo': 'sync_ack', 'exito': True}
+    print("SUCCESS: Las operaciones vuelven idénticas")
+
+
+def test_payload_mal_formado():
+    print("=== TEST CODEC BINARIO CON PAYLOAD MAL FORMADO ===")
+    chat = ChatCRDT("alice")
+    for i in range(10):
+        chat.enviar_mensaje(f"Mensaje {i}")
+    binario = codificar_mensaje({'tipo': 'sync_push', 'operaciones': chat.obtener_operaciones_desde({})})
+    
+    for nombre, payload in (("vacío", b''), ("sin marca", b'{}'), ("versión", binario[:2] + b'\x09' + binario[3:]),
+                            ("truncado", binario[:-5]), ("sobrante", binario + b'\x00')):
+        try:
+            decodificar_mensaje(payload)
+            assert False, f"Se esperaba ErrorCodec ({nombre})"
+        except ErrorCodec as e:
+            print(f"[OK] {nombre}: {e}")
+    print("SUCCESS: Los payloads inválidos se rechazan con ErrorCodec")
+
+
+if __name__ == "__main__":
+    test_ida_y_vuelta()
+    test_payload_mal_formado()
\ No newline at end of file
@@ -248,6 +248,59 @@ def test_concurrencia_intensivo():
     if not orden_consistente:
         print("   ORDEN INCONSISTENTE DETECTADO!")
 
+def test_escrituras_locales_con_sincronizacion():
+    """Mensajes locales (hilo de la interfaz) mientras llegan sincronizaciones de la red"""
+    
+    print("\n\n=== TEST ESCRITURAS LOCALES DURANTE LA SINCRONIZACIÓN ===\n")
+    
+    alice = ChatCRDT("alice")
+    bob = ChatCRDT("bob")
+    for i in range(300):
+        bob.enviar_mensaje(f"Mensaje de Bob {i}")
+    operaciones_bob = bob.obtener_operaciones()
+    errores = []
+    
+    def interfaz():
+        try:
+            for i in range(1000):
+                mensaje_id = alice.enviar_mensaje(f"Mensaje de Alice {i}")
+                if i % 10 == 0:
+                    alice.editar_mensaje(mensaje_id, f"Editado {i}")
+        except Exception as e:
+            errores.append(e)
+    
+    def red():
+        try:
+            for inicio in range(0, len(operaciones_bob), 10):
+                alice.sincronizar_con(operaciones_bob[inicio:inicio + 10])
+                # Lo que se serializa para los pares recorre los mensajes
+                alice.obtener_estado_completo()
+                alice.obtener_filtro_bloom()
+                alice.obtener_operaciones_desde({'bob': inicio})
+        except Exception as e:
+            errores.append(e)
+    
+    hilos = [threading.Thread(target=interfaz), threading.Thread(target=red)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    
+    print(f"Errores: {errores}")
+    print(f"Mensajes: {len(alice.mensajes)}, vector clock: {alice.vector_clock}")
+    assert not errores
+    assert len(alice.mensajes) == 1300
+    assert alice.vector_clock == {'alice': 1100, 'bob': 300}
+    # Los índices vieron cada mensaje una vez
+    assert len(alice.linea_temporal) == len(alice.indice_busqueda) == len(alice.arbol_merkle) == 1300
+    assert alice.estadisticas.total_mensajes == 1300
+    
+    # La réplica resultante converge con otra que recibe lo mismo sin concurrencia
+    carol = ChatCRDT("carol")
+    carol.sincronizar_con(alice.obtener_operaciones())
+    assert carol.ultimo_estado_hash == alice.ultimo_estado_hash
+    print("SUCCESS: Las escrituras locales y las de la red no se pisan")
+
 def main():
     """Función principal que ejecuta todos los tests"""
     
@@ -261,6 +314,8 @@ def main():
         # Test intensivo 
         test_concurrencia_intensivo()
         
+        test_escrituras_locales_con_sincronizacion()
+        
         print("\n" + "=" * 60)
         print("TESTS DE CONCURRENCIA COMPLETADOS")
         
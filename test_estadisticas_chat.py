@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test de las estadísticas incrementales del chat
+"""
+
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from chat_crdt import ChatCRDT
+
+
+class MensajesSinRecorrer(dict):
+    """Dict de mensajes que falla si alguien lo recorre entero"""
+    
+    def values(self):
+        raise AssertionError("Las estadísticas no deberían recorrer los mensajes")
+    
+    items = values
+    __iter__ = values
+
+
+def test_estadisticas_incrementales():
+    print("=== TEST ESTADÍSTICAS INCREMENTALES ===")
+    alice = ChatCRDT("alice")
+    bob = ChatCRDT("bob")
+    ids = [alice.enviar_mensaje(f"Mensaje {i}") for i in range(20)]
+    alice.editar_mensaje(ids[0], "Editado")
+    alice.eliminar_mensaje(ids[1])
+    alice.eliminar_mensaje(ids[2])
+    for i in range(10):
+        bob.enviar_mensaje(f"Hola {i}")
+    
+    # Mensajes antiguos de Carol, llegados por estado
+    carol = ChatCRDT("carol")
+    carol.enviar_mensaje("De hace tres días")
+    estado = carol.obtener_estado_completo()
+    hace_tres_dias = datetime.now() - timedelta(days=3)
+    for datos in estado['mensajes'].values():
+        datos['timestamp'] = hace_tres_dias.isoformat()
+    
+    bob.sincronizar_con(alice.obtener_operaciones_desde({}))
+    bob.sincronizar_por_estado(estado)
+    bob.sincronizar_por_estado(alice.obtener_estado_completo())
+    
+    # Los contadores coinciden con recorrer todo el historial
+    mensajes = list(bob.mensajes.values())
+    assert bob.estadisticas.total_mensajes == len(mensajes) == 31
+    assert bob.estadisticas.mensajes_eliminados == 2
+    assert bob.estadisticas.por_autor == Counter(m.autor for m in mensajes)
+    assert bob.estadisticas.por_dia == Counter(m.timestamp.date() for m in mensajes)
+    
+    bob.mensajes = MensajesSinRecorrer(bob.mensajes)
+    stats = bob.obtener_estadisticas()
+    print(f"Estadísticas: {stats}")
+    assert stats['total_mensajes'] == 31
+    assert stats['mensajes_hoy'] == stats['mensajes_ultimos_10_min'] == 30
+    assert stats['mensajes_eliminados'] == 2
+    assert stats['usuarios_activos'] == 2
+    # Los histogramas se exponen listos para exportar a JSON
+    assert stats['mensajes_por_autor'] == {'alice': 20, 'bob': 10, 'carol': 1}
+    assert list(stats['mensajes_por_autor']) == ['alice', 'bob', 'carol']  # Más mensajes primero
+    assert stats['mensajes_por_dia'] == {hace_tres_dias.date().isoformat(): 1,
+                                         datetime.now().date().isoformat(): 30}
+    json.dumps(stats)
+    assert sorted(bob.obtener_usuarios_activos()) == ["alice", "bob"]
+    print("SUCCESS: Las estadísticas se leen sin recorrer el historial")
+
+
+if __name__ == "__main__":
+    test_estadisticas_incrementales()
\ No newline at end of file
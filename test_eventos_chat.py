@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test del flujo de eventos de cambio del chat
+"""
+
+import asyncio
+import threading
+from chat_crdt import ChatCRDT
+from eventos_chat import MENSAJE_AGREGADO, MENSAJE_EDITADO, MENSAJE_ELIMINADO
+
+
+def test_eventos_y_lotes():
+    print("=== TEST EVENTOS DE CAMBIO ===")
+    alice = ChatCRDT("alice")
+    lotes, otros, avisos = [], [], []
+    alice.agregar_suscriptor_cambios(lotes.append)
+    alice.agregar_suscriptor_cambios(lambda eventos: 1 / 0)  # Un suscriptor roto no afecta al resto
+    alice.agregar_suscriptor_cambios(otros.append)
+    alice.establecer_callback_cambio(lambda: avisos.append(1))
+    
+    # Operaciones locales: un lote por operación, con id y versión
+    mensaje_id = alice.enviar_mensaje("Hola")
+    alice.editar_mensaje(mensaje_id, "Hola a todos")
+    alice.eliminar_mensaje(mensaje_id)
+    assert [[(e.tipo, e.mensaje_id) for e in lote] for lote in lotes] == [
+        [(MENSAJE_AGREGADO, mensaje_id)], [(MENSAJE_EDITADO, mensaje_id)], [(MENSAJE_ELIMINADO, mensaje_id)]]
+    assert lotes[-1][0].version == alice.mensajes[mensaje_id].version
+    assert otros == lotes and len(avisos) == 3
+    
+    # Una sincronización de 200 operaciones: un solo lote y un solo aviso
+    bob = ChatCRDT("bob")
+    ids = [bob.enviar_mensaje(f"Mensaje {i}") for i in range(200)]
+    bob.editar_mensaje(ids[0], "Editado")
+    del lotes[:], avisos[:]
+    assert alice.sincronizar_con(bob.obtener_operaciones_desde({}))
+    print(f"Lotes tras sincronizar: {len(lotes)} con {len(lotes[0])} eventos")
+    assert len(lotes) == 1 and len(avisos) == 1
+    assert [e.tipo for e in lotes[0]].count(MENSAJE_AGREGADO) == 200
+    assert lotes[0][-1].tipo == MENSAJE_EDITADO
+    
+    # Sin cambios de mensajes no hay lote
+    del lotes[:]
+    alice.sincronizar_con(bob.obtener_operaciones_desde({}))
+    alice.sincronizar_por_estado(bob.obtener_estado_completo())
+    assert lotes == []
+    
+    alice.quitar_suscriptor_cambios(lotes.append)
+    alice.enviar_mensaje("Ya no escucha")
+    assert lotes == [] and len(otros) == 5
+    print("SUCCESS: Cada cambio llega como evento, y cada sincronización en un lote")
+
+
+def test_iteracion_async():
+    print("=== TEST EVENTOS CON ASYNC FOR ===")
+    chat = ChatCRDT("alice")
+    
+    async def consumir():
+        recibidos = []
+        async with chat.suscribir_eventos_async() as eventos:
+            # Los cambios se producen en otro hilo, como los que llegan por la red
+            hilo = threading.Thread(target=lambda: [chat.enviar_mensaje(f"Mensaje {i}") for i in range(5)])
+            hilo.start()
+            async for lote in eventos:
+                recibidos.extend(lote)
+                if len(recibidos) == 5:
+                    break
+            hilo.join()
+        return recibidos
+    
+    recibidos = asyncio.run(asyncio.wait_for(consumir(), timeout=5))
+    print(f"Eventos recibidos: {len(recibidos)}")
+    assert [e.tipo for e in recibidos] == [MENSAJE_AGREGADO] * 5
+    assert chat.suscriptores_cambios == []
+    print("SUCCESS: Los lotes se pueden recorrer con async for")
+
+
+if __name__ == "__main__":
+    test_eventos_y_lotes()
+    test_iteracion_async()
\ No newline at end of file
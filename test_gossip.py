@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test de la difusión por gossip con fan-out acotado
+"""
+
+import math
+import time
+from chat_crdt import ChatCRDT
+from descubrimiento_nodos import InfoNodo
+from sincronizacion_chat import crear_cliente_p2p
+from simulacion_gossip import simular_gossip
+from conftest import esperar
+
+
+def test_simulacion_converge():
+    print("=== TEST SIMULACIÓN DE GOSSIP ===")
+    n = 64
+    for fanout in (1, 2):
+        rondas = simular_gossip(n, fanout, semilla=1)
+        print(f"N={n}, k={fanout}: {rondas} rondas (log2(N) = {math.log2(n):.0f})")
+        assert rondas <= 2 * math.log2(n)
+    print("SUCCESS: La red converge en O(log N) rondas")
+
+
+def probar_gossip(modo: str, puerto_base: int, n: int = 8, fanout: int = 2):
+    clientes = [crear_cliente_p2p(ChatCRDT(f"nodo{i}"), f"Nodo{i}", puerto=puerto_base + i,
+                                  habilitar_autodescubrimiento=False, modo=modo,
+                                  intervalo_sincronizacion=0.2, fanout_gossip=fanout)
+                for i in range(n)]
+    try:
+        for cliente in clientes:
+            cliente.iniciar()
+        # Todos conocen a todos, pero nadie se conecta hasta que el gossip lo elige
+        for i, cliente in enumerate(clientes):
+            for j in range(n):
+                if i != j:
+                    nodo_id = f"nodo{j}"
+                    cliente.nodos_conocidos[nodo_id] = InfoNodo(nodo_id, f"Nodo{j}", "127.0.0.1",
+                                                                puerto_base + j, time.time())
+        
+        for cliente in clientes:
+            cliente.chat.enviar_mensaje(f"Hola desde {cliente.chat.usuario_id}")
+        
+        assert esperar(lambda: all(len(c.chat.mensajes) == n for c in clientes), timeout=10.0)
+        
+        # Se cierran las conexiones ociosas por encima de 2 * fan-out
+        time.sleep(0.5)
+        maximo = max(len(c._nodos_conectados()) for c in clientes)
+        print(f"[{modo}] {n} nodos convergieron; máximo de conexiones por nodo: {maximo}")
+        assert maximo <= 2 * fanout
+    finally:
+        for cliente in clientes:
+            cliente.detener()
+
+
+def test_gossip_hilos():
+    print("=== TEST GOSSIP (HILOS) ===")
+    probar_gossip("hilos", 12080)
+    print("SUCCESS: Todos los nodos reciben todos los mensajes")
+
+
+def test_gossip_asyncio():
+    print("=== TEST GOSSIP (ASYNCIO) ===")
+    probar_gossip("asyncio", 12090)
+    print("SUCCESS: Todos los nodos reciben todos los mensajes")
+
+
+if __name__ == "__main__":
+    test_simulacion_converge()
+    test_gossip_hilos()
+    test_gossip_asyncio()
\ No newline at end of file
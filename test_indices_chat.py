@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test de los índices incrementales del chat
+"""
+
+from datetime import datetime, timedelta
+from chat_crdt import ChatCRDT, Mensaje
+from indices_chat import IndiceBusqueda
+
+
+def test_linea_temporal():
+    print("=== TEST LINEA TEMPORAL ===")
+
+    alice = ChatCRDT("alice")
+    bob = ChatCRDT("bob")
+
+    base = datetime.now() - timedelta(hours=1)
+    for i in range(10):
+        alice.enviar_mensaje(f"Alice {i}")
+
+    # Bob recibe mensajes antiguos fuera de orden por sincronización de estado
+    estado = {
+        'usuario_id': 'carol',
+        'vector_clock': {'carol': 3},
+        'mensajes': {
+            f"carol-{i}": Mensaje(f"carol-{i}", f"Carol {i}", "carol",
+                                  base + timedelta(minutes=i * 10)).to_dict()
+            for i in (2, 0, 1)
+        },
+        'canales': {}
+    }
+    alice.sincronizar_por_estado(estado)
+
+    mensajes = alice.obtener_mensajes_canal()
+    timestamps = [m.timestamp for m in mensajes]
+    print(f"1. Mensajes en la línea temporal: {len(mensajes)}")
+    assert timestamps == sorted(timestamps)
+    assert [m.contenido for m in mensajes[:3]] == ["Carol 0", "Carol 1", "Carol 2"]
+
+    ultimos = alice.obtener_mensajes_canal(limite=3)
+    print(f"2. Últimos 3: {[m.contenido for m in ultimos]}")
+    assert [m.contenido for m in ultimos] == ["Alice 7", "Alice 8", "Alice 9"]
+
+    recientes = alice.obtener_mensajes_ordenados(limite=2)
+    assert [m.contenido for m in recientes] == ["Alice 9", "Alice 8"]
+
+    rango = alice.obtener_mensajes_entre(base, base + timedelta(minutes=15))
+    print(f"3. Entre t1 y t2: {[m.contenido for m in rango]}")
+    assert [m.contenido for m in rango] == ["Carol 0", "Carol 1"]
+
+    # Una edición no cambia la posición del mensaje
+    mensaje_id = mensajes[5].mensaje_id
+    alice.editar_mensaje(mensaje_id, "Cambiado")
+    assert alice.obtener_mensajes_canal()[5].mensaje_id == mensaje_id
+    print("SUCCESS: La línea temporal se mantiene ordenada")
+
+
+def test_canal_sin_duplicados():
+    print("=== TEST PERTENENCIA AL CANAL ===")
+
+    alice = ChatCRDT("alice")
+    bob = ChatCRDT("bob")
+    for i in range(50):
+        alice.enviar_mensaje(f"Mensaje {i}")
+
+    estado = alice.obtener_estado_completo()
+    print(f"1. Primera sincronización: {bob.sincronizar_por_estado(estado)}")
+
+    # Reenviar el mismo estado no agrega nada al canal
+    cambios = bob.sincronizar_por_estado(estado)
+    print(f"2. Segunda sincronización: {cambios}")
+    assert not cambios
+    assert len(bob.canales[bob.canal_unico]) == 50
+
+    # El estado serializado conserva el orden de inserción
+    canal = bob.obtener_estado_completo()['canales'][bob.canal_unico]
+    assert canal == estado['canales'][alice.canal_unico]
+    print("SUCCESS: El canal no acumula duplicados")
+
+
+def test_busqueda_indexada():
+    print("=== TEST BUSQUEDA INDEXADA ===")
+
+    alice = ChatCRDT("alice")
+    bob = ChatCRDT("bob")
+    alice.enviar_mensaje("Hola mundo, los CRDTs convergen")
+    alice.enviar_mensaje("CRDT aquí, CRDT allá")
+    id_editar = alice.enviar_mensaje("Mensaje que será editado")
+    bob.enviar_mensaje("Bob dice hola!")
+    alice.sincronizar_por_estado(bob.obtener_estado_completo())
+
+    def busqueda_lineal(query):
+        query = query.lower()
+        return {m.mensaje_id for m in alice.mensajes.values()
+                if query in m.contenido.lower() or query in m.autor.lower()}
+
+    for query in ["hola", "OLA", "crdt", "mundo, los", "bob", "!", "no existe", "dt"]:
+        resultados = alice.buscar_mensajes(query)
+        print(f"'{query}': {len(resultados)} resultados")
+        assert {m.mensaje_id for m in resultados} == busqueda_lineal(query)
+
+    # Más ocurrencias primero
+    assert alice.buscar_mensajes("crdt")[0].contenido == "CRDT aquí, CRDT allá"
+
+    # El índice sigue a las ediciones y eliminaciones
+    alice.editar_mensaje(id_editar, "Texto nuevo")
+    assert not alice.buscar_mensajes("editado que")
+    assert [m.mensaje_id for m in alice.buscar_mensajes("nuevo")] == [id_editar]
+    alice.eliminar_mensaje(id_editar)
+    assert not alice.buscar_mensajes("nuevo")
+    print("SUCCESS: La búsqueda indexada coincide con la lineal")
+
+
+class VocabularioSinRecorrido(list):
+    """Lista ordenada que falla si alguien la recorre entera"""
+    def __iter__(self):
+        raise AssertionError("la búsqueda recorrió el vocabulario")
+
+
+def test_busqueda_sin_recorrer_vocabulario():
+    print("=== TEST BUSQUEDA DE UNA PALABRA POR ÍNDICE ===")
+    indice = IndiceBusqueda()
+    indice._claves = VocabularioSinRecorrido()
+    indice._claves_trigramas = VocabularioSinRecorrido()
+    textos = {
+        "1": ("Hola a todos", "alice"),
+        "2": ("Holanda queda lejos", "bob"),
+        "3": ("Dijo hola y se fue", "carol"),
+        "4": ("Quién sigue ahí?", "dave"),
+        "5": ("Equipo listo, ¡vamos!", "alice"),
+    }
+    for mensaje_id, (contenido, autor) in textos.items():
+        indice.indexar(mensaje_id, contenido, autor)
+    indice.eliminar("3")
+    del textos["3"]
+
+    # Prefijos, infijos, palabras completas y consultas de una o dos letras
+    for query in ["hol", "ola", "holanda", "q", "Q", "ui", "o", "alice", "lic", "os", "ahí?", "xyz"]:
+        esperados = {mensaje_id for mensaje_id, (contenido, autor) in textos.items()
+                     if query.lower() in contenido.lower() or query.lower() in autor.lower()}
+        resultados = indice.buscar(query)
+        print(f"'{query}': {sorted(resultados)}")
+        assert set(resultados) == esperados
+    print("SUCCESS: Las consultas de una palabra usan el índice, no un recorrido")
+
+
+if __name__ == "__main__":
+    test_linea_temporal()
+    test_canal_sin_duplicados()
+    test_busqueda_indexada()
+    test_busqueda_sin_recorrer_vocabulario()
\ No newline at end of file
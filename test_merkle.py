@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test del árbol de Merkle y de la reconciliación por descenso
+"""
+
+import json
+import random
+from chat_crdt import ChatCRDT
+from merkle_chat import ArbolMerkle
+from sincronizacion_chat import ClienteP2PChat
+from conftest import conectar_en_memoria
+
+
+def test_arbol_incremental():
+    print("=== TEST ÁRBOL DE MERKLE INCREMENTAL ===")
+    aleatorio = random.Random(3)
+    arbol = ArbolMerkle()
+    versiones = {}
+    for _ in range(3000):
+        clave = f"m{aleatorio.randrange(500)}"
+        if aleatorio.random() < 0.1:
+            arbol.eliminar(clave)
+            versiones.pop(clave, None)
+        else:
+            versiones[clave] = str(aleatorio.randrange(5))
+            arbol.actualizar(clave, versiones[clave])
+    
+    # Construido de una vez (y en otro orden) da la misma raíz
+    reconstruido = ArbolMerkle()
+    for clave in sorted(versiones, reverse=True):
+        reconstruido.actualizar(clave, versiones[clave])
+    assert arbol.raiz() == reconstruido.raiz()
+    assert len(arbol) == len(versiones)
+    
+    # Un solo cambio se localiza bajando por un único camino
+    cambiada = min(versiones)
+    reconstruido.actualizar(cambiada, "otra")
+    prefijos = ['']
+    while prefijos and not arbol.es_hoja(prefijos[0]):
+        prefijos = arbol.hijos_distintos(prefijos, reconstruido.hashes_hijos(prefijos))
+        assert len(prefijos) == 1
+    assert cambiada in arbol.claves(prefijos)
+    
+    vacio = ArbolMerkle()
+    vacio.actualizar("x", "1")
+    vacio.eliminar("x")
+    assert vacio.raiz() == ArbolMerkle().raiz()
+    print("SUCCESS: El árbol incremental coincide con el reconstruido")
+
+
+def test_descenso_merkle():
+    print("=== TEST DESCENSO POR EL ÁRBOL DE MERKLE ===")
+    alice = ChatCRDT("alice")
+    for i in range(1000):
+        alice.enviar_mensaje(f"Mensaje {i}")
+    
+    bob = ChatCRDT("bob")
+    carol = ChatCRDT("carol")
+    bob.sincronizar_por_estado(alice.obtener_estado_completo())
+    carol.sincronizar_por_estado(alice.obtener_estado_completo())
+    
+    # Bob recibe un mensaje más también por estado: su log no cubre a Carol
+    alice.enviar_mensaje("Uno más")
+    bob.sincronizar_por_estado(alice.obtener_estado_completo())
+    carol.enviar_mensaje("Hola desde Carol")
+    assert bob.obtener_operaciones_desde(carol.obtener_resumen_operaciones()) is None
+    
+    cliente_bob = ClienteP2PChat(bob, "Bob", habilitar_autodescubrimiento=False, habilitar_push=False)
+    cliente_carol = ClienteP2PChat(carol, "Carol", habilitar_autodescubrimiento=False, habilitar_push=False)
+    trafico = conectar_en_memoria(cliente_carol, cliente_bob, "bob")
+    
+    cliente_carol._sincronizar_con_nodo("bob")
+    total = sum(bytes_ for _, bytes_ in trafico)
+    estado = len(json.dumps(bob.obtener_estado_completo()))
+    print(f"Pasos: {[tipo for tipo, _ in trafico]}")
+    print(f"Tráfico: {total} bytes (estado completo: {estado} bytes)")
+    
+    assert len(carol.mensajes) == len(bob.mensajes) == 1002
+    assert carol.ultimo_estado_hash == bob.ultimo_estado_hash
+    assert [tipo for tipo, _ in trafico].count('sync_merkle') == carol.arbol_merkle.profundidad - 1
+    assert total < estado / 10
+    
+    # Ya en sincronía: la comprobación es un único intercambio de raíces
+    del trafico[:]
+    cliente_carol._sincronizar_con_nodo("bob")
+    print(f"En sincronía: {trafico}")
+    assert [tipo for tipo, _ in trafico] == ['sync_resumen']
+    print("SUCCESS: Solo viajan las hojas distintas")
+
+
+if __name__ == "__main__":
+    test_arbol_incremental()
+    test_descenso_merkle()
\ No newline at end of file
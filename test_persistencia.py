@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test de la persistencia en disco: log de operaciones y snapshots
+"""
+
+import os
+import tempfile
+from chat_crdt import ChatCRDT
+from persistencia import LogPersistente, PREFIJO_SEGMENTO, PREFIJO_SNAPSHOT
+
+
+def test_restaurar_tras_reinicio():
+    print("=== TEST RESTAURAR TRAS REINICIO ===")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        alice = ChatCRDT("alice", directorio_datos=directorio, intervalo_snapshot=10)
+        bob = ChatCRDT("bob")
+
+        ids = [alice.enviar_mensaje(f"Mensaje {i}") for i in range(25)]
+        alice.editar_mensaje(ids[0], "Primero editado")
+        alice.eliminar_mensaje(ids[1])
+        bob.enviar_mensaje("Hola desde Bob")
+        alice.sincronizar_con(bob.obtener_operaciones())
+        alice.cerrar()
+
+        archivos = sorted(os.listdir(directorio))
+        print(f"1. Archivos en disco: {archivos}")
+        assert any(nombre.startswith("snapshot_") for nombre in archivos)
+
+        restaurada = ChatCRDT("alice", directorio_datos=directorio, intervalo_snapshot=10)
+        print(f"2. Mensajes restaurados: {len(restaurada.mensajes)}")
+        assert set(restaurada.mensajes) == set(alice.mensajes)
+        assert restaurada.mensajes[ids[0]].contenido == "Primero editado (editado)"
+        assert restaurada.mensajes[ids[1]].contenido == "[Mensaje eliminado]"
+        assert restaurada.obtener_resumen_operaciones() == alice.obtener_resumen_operaciones()
+        assert restaurada.vector_clock == alice.vector_clock
+
+        # Los nuevos mensajes siguen la numeración anterior
+        restaurada.enviar_mensaje("Después del reinicio")
+        print(f"3. Vector clock tras reinicio: {restaurada.vector_clock}")
+        assert restaurada.vector_clock["alice"] == alice.vector_clock["alice"] + 1
+
+        # Las operaciones cubiertas por el snapshot ya no están en el log:
+        # un nodo que las necesite recibe el estado completo
+        assert restaurada.obtener_operaciones_desde({}) is None
+        restaurada.cerrar()
+        print("SUCCESS: El chat se restaura desde disco")
+
+
+def test_linea_truncada():
+    print("=== TEST LINEA TRUNCADA ===")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        alice = ChatCRDT("alice", directorio_datos=directorio)
+        for i in range(5):
+            alice.enviar_mensaje(f"Mensaje {i}")
+        alice.cerrar()
+
+        # Simular una caída a mitad de escritura
+        segmento = os.path.join(directorio, sorted(
+            nombre for nombre in os.listdir(directorio) if nombre.startswith(PREFIJO_SEGMENTO))[-1])
+        with open(segmento, "ab") as f:
+            f.write(b'{"tipo":"enviar_mens')
+
+        log = LogPersistente(directorio)
+        snapshot, operaciones = log.cargar()
+        log.cerrar()
+        print(f"1. Operaciones recuperadas: {len(operaciones)}")
+        assert snapshot is None
+        assert len(operaciones) == 5
+
+        restaurada = ChatCRDT("alice", directorio_datos=directorio)
+        restaurada.enviar_mensaje("Mensaje 5")
+        restaurada.cerrar()
+        restaurada = ChatCRDT("alice", directorio_datos=directorio)
+        print(f"2. Mensajes tras reescribir: {len(restaurada.mensajes)}")
+        assert len(restaurada.mensajes) == 6
+        restaurada.cerrar()
+        print("SUCCESS: La línea a medio escribir se descarta")
+
+
+def test_estado_sincronizado_persiste():
+    print("=== TEST ESTADO SINCRONIZADO SOBREVIVE AL REINICIO ===")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        alice = ChatCRDT("alice")
+        for i in range(50):
+            alice.enviar_mensaje(f"Mensaje {i}")
+
+        # Arranque normal de un nodo nuevo: estado completo y luego actividad propia
+        bob = ChatCRDT("bob", directorio_datos=directorio)
+        bob.sincronizar_por_estado(alice.obtener_estado_completo())
+        bob.enviar_mensaje("Hola desde Bob")
+        bob.cerrar()
+
+        restaurado = ChatCRDT("bob", directorio_datos=directorio)
+        print(f"Mensajes tras reiniciar: {len(restaurado.mensajes)}")
+        print(f"Resumen tras reiniciar: {restaurado.obtener_resumen_operaciones()}")
+        assert len(restaurado.mensajes) == 51
+        assert restaurado.obtener_resumen_operaciones() == {'alice': 50, 'bob': 1}
+        assert restaurado.ultimo_estado_hash == bob.ultimo_estado_hash
+
+        # Solo le falta lo nuevo: Alice le responde con un delta, no con el estado
+        alice.enviar_mensaje("Después del reinicio")
+        operaciones = alice.obtener_operaciones_desde(restaurado.obtener_resumen_operaciones())
+        assert operaciones is not None and len(operaciones) == 1
+        restaurado.cerrar()
+        print("SUCCESS: Lo aprendido por estado se guarda en disco")
+
+
+def test_snapshot_por_umbral_en_estado():
+    print("=== TEST SNAPSHOTS DE ESTADO POR UMBRAL ===")
+
+    def snapshots(directorio):
+        return [nombre for nombre in os.listdir(directorio) if nombre.startswith(PREFIJO_SNAPSHOT)]
+
+    with tempfile.TemporaryDirectory() as directorio:
+        alice = ChatCRDT("alice")
+        bob = ChatCRDT("bob", directorio_datos=directorio, intervalo_snapshot=100)
+
+        # Rondas de estado que traen pocos cambios: ninguna escribe un snapshot
+        for ronda in range(10):
+            for i in range(5):
+                alice.enviar_mensaje(f"Ronda {ronda} mensaje {i}")
+            bob.sincronizar_por_estado(alice.obtener_estado_completo())
+        print(f"1. Snapshots tras 50 cambios: {snapshots(directorio)}")
+        assert snapshots(directorio) == []
+
+        # Al llegar al umbral se guarda, como con las operaciones locales
+        for i in range(60):
+            alice.enviar_mensaje(f"Extra {i}")
+        bob.sincronizar_por_estado(alice.obtener_estado_completo())
+        print(f"2. Snapshots tras 110 cambios: {snapshots(directorio)}")
+        assert len(snapshots(directorio)) == 1
+
+        # Lo que llegó después del último snapshot lo guarda cerrar()
+        alice.enviar_mensaje("Último")
+        bob.sincronizar_por_estado(alice.obtener_estado_completo())
+        bob.cerrar()
+
+        restaurado = ChatCRDT("bob", directorio_datos=directorio, intervalo_snapshot=100)
+        assert len(restaurado.mensajes) == 111
+        assert restaurado.obtener_resumen_operaciones() == {'alice': 111}
+        restaurado.cerrar()
+        print("SUCCESS: Los cambios por estado esperan al umbral de snapshot")
+
+
+if __name__ == "__main__":
+    test_restaurar_tras_reinicio()
+    test_linea_truncada()
+    test_estado_sincronizado_persiste()
+    test_snapshot_por_umbral_en_estado()
\ No newline at end of file
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test del planificador de refrescos de la interfaz (sin tkinter)
+"""
+
+import threading
+from chat_crdt import ChatCRDT
+from planificador_refresco import PlanificadorRefresco
+
+
+class BucleFalso:
+    """Sustituye a root.after: guarda lo programado y lo ejecuta a demanda"""
+    
+    def __init__(self):
+        self.ahora = 0.0
+        self.programados = []
+    
+    def after(self, ms, funcion):
+        self.programados.append((self.ahora + ms / 1000, funcion))
+    
+    def avanzar(self, segundos: float):
+        self.ahora += segundos
+        listos = [f for t, f in self.programados if t <= self.ahora]
+        self.programados = [(t, f) for t, f in self.programados if t > self.ahora]
+        for funcion in listos:
+            funcion()
+
+
+def test_agrupa_por_frame():
+    print("=== TEST REFRESCOS AGRUPADOS POR FRAME ===")
+    bucle = BucleFalso()
+    planificador = PlanificadorRefresco(bucle.after, intervalo_ms=33, reloj=lambda: bucle.ahora)
+    refrescos = {"mensajes": 0, "info": 0, "nodos": 0}
+    for panel in refrescos:
+        planificador.registrar(panel, lambda panel=panel: refrescos.__setitem__(panel, refrescos[panel] + 1))
+    
+    # Una sincronización de 500 operaciones notifica por cada una
+    chat = ChatCRDT("bob")
+    chat.establecer_callback_cambio(lambda: planificador.marcar("mensajes", "info"))
+    alice = ChatCRDT("alice")
+    for i in range(500):
+        alice.enviar_mensaje(f"Mensaje {i}")
+    chat.sincronizar_con(alice.obtener_operaciones_desde({}))
+    
+    # El primer cambio tras un rato sin refrescos se dibuja en el siguiente ciclo
+    assert len(bucle.programados) == 1 and bucle.programados[0][0] == 0
+    bucle.avanzar(0)
+    print(f"Refrescos tras 500 operaciones: {refrescos} en {planificador.frames} frame(s)")
+    assert refrescos == {"mensajes": 1, "info": 1, "nodos": 0}
+    
+    # Los cambios seguidos esperan al siguiente frame, y solo van los paneles sucios
+    planificador.marcar("nodos")
+    planificador.marcar("nodos")
+    assert bucle.programados[0][0] == 0.033
+    bucle.avanzar(0.02)
+    assert refrescos["nodos"] == 0 and planificador.pendientes == {"nodos"}
+    bucle.avanzar(0.02)
+    assert refrescos == {"mensajes": 1, "info": 1, "nodos": 1}
+    assert planificador.frames == 2 and not bucle.programados
+    
+    # Un panel que falla no impide refrescar los demás
+    planificador.registrar("info", lambda: 1 / 0)
+    bucle.avanzar(1)
+    planificador.marcar("info", "mensajes")
+    bucle.avanzar(0)
+    assert refrescos["mensajes"] == 2
+    print("SUCCESS: Las notificaciones se agrupan en un refresco por frame")
+
+
+def test_marcar_desde_hilos():
+    print("=== TEST MARCAR DESDE VARIOS HILOS ===")
+    programados = []
+    planificador = PlanificadorRefresco(lambda ms, f: programados.append(f))
+    hilos = [threading.Thread(target=lambda: [planificador.marcar("mensajes") for _ in range(1000)])
+             for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    print(f"Refrescos programados por 8000 notificaciones: {len(programados)}")
+    assert len(programados) == 1
+    print("SUCCESS: Un solo refresco pendiente aunque marquen varios hilos")
+
+
+if __name__ == "__main__":
+    test_agrupa_por_frame()
+    test_marcar_desde_hilos()
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test del registro de presencia de usuarios
+"""
+
+import time
+from datetime import datetime, timedelta
+from chat_crdt import ChatCRDT
+from presencia_chat import RegistroPresencia
+from descubrimiento_nodos import InfoNodo
+from sincronizacion_chat import ClienteP2PChat
+
+
+def test_ventana_deslizante():
+    print("=== TEST PRESENCIA CON VENTANA DESLIZANTE ===")
+    ahora = datetime(2024, 5, 1, 12, 0)
+    presencia = RegistroPresencia()
+    for minutos, usuario in ((30, "ana"), (9, "bob"), (5, "carol"), (1, "dave")):
+        presencia.registrar(usuario, ahora - timedelta(minutes=minutos))
+    
+    assert presencia.activos(ahora=ahora) == ["dave", "carol", "bob"]
+    assert presencia.activos(timedelta(minutes=6), ahora=ahora) == ["dave", "carol"]
+    assert presencia.activos(timedelta(hours=1), ahora=ahora) == ["dave", "carol", "bob", "ana"]
+    
+    # Un dato más viejo no retrasa a nadie; uno más nuevo lo adelanta
+    presencia.registrar("dave", ahora - timedelta(minutes=50))
+    presencia.registrar("ana", ahora)
+    assert presencia.activos(ahora=ahora) == ["ana", "dave", "carol", "bob"]
+    assert presencia.ultimo_visto("dave") == ahora - timedelta(minutes=1)
+    
+    # Los que no se ven desde hace rato se pueden olvidar
+    assert presencia.expirar(ahora - timedelta(minutes=6)) == 1
+    assert len(presencia) == 3 and presencia.ultimo_visto("bob") is None
+    print("SUCCESS: Los activos salen de la cola ordenada, sin recorrer a los demás")
+
+
+def test_usuarios_expiran():
+    print("=== TEST PRESENCIA: LOS USUARIOS VIEJOS SE OLVIDAN ===")
+    ahora = datetime(2024, 5, 1, 12, 0)
+    presencia = RegistroPresencia(retencion=timedelta(hours=1))
+    presencia.registrar("ana", ahora - timedelta(hours=3))
+    presencia.registrar("bob", ahora - timedelta(minutes=30))
+    presencia.registrar("carol", ahora - timedelta(minutes=2))
+    
+    # Consultar los activos ya poda a quien pasó la retención
+    assert presencia.activos(ahora=ahora) == ["carol"]
+    print(f"Tras consultar: {len(presencia)} usuarios registrados")
+    assert len(presencia) == 2 and presencia.ultimo_visto("ana") is None
+    
+    # Una ventana más larga que la retención no pierde lo que pide
+    assert presencia.activos(timedelta(hours=2), ahora=ahora + timedelta(minutes=45)) == ["carol", "bob"]
+    assert presencia.activos(ahora=ahora + timedelta(hours=2)) == []
+    assert len(presencia) == 0
+    
+    # En el chat, un autor que no escribe desde hace más que la retención desaparece
+    chat = ChatCRDT("alice")
+    chat.presencia.retencion = timedelta(minutes=30)
+    chat.presencia.registrar("viejo", datetime.now() - timedelta(hours=1))
+    chat.enviar_mensaje("Hola")
+    assert chat.obtener_usuarios_activos() == ["alice"]
+    assert chat.presencia.ultimo_visto("viejo") is None
+    print("SUCCESS: El registro de presencia no crece con usuarios inactivos")
+
+
+def test_presencia_desde_mensajes_y_red():
+    print("=== TEST PRESENCIA DESDE MENSAJES Y DESCUBRIMIENTO ===")
+    chat = ChatCRDT("alice")
+    chat.enviar_mensaje("Hola")
+    
+    # Un mensaje antiguo sincronizado no vuelve activo a su autor
+    viejo = ChatCRDT("viejo")
+    viejo.enviar_mensaje("De hace una hora")
+    estado = viejo.obtener_estado_completo()
+    for datos in estado['mensajes'].values():
+        datos['timestamp'] = (datetime.now() - timedelta(hours=1)).isoformat()
+    chat.sincronizar_por_estado(estado)
+    assert chat.obtener_usuarios_activos() == ["alice"]
+    assert chat.obtener_usuarios_activos(timedelta(hours=2)) == ["alice", "viejo"]
+    
+    # Un nodo descubierto cuenta como activo y conectado aunque no escriba
+    cliente = ClienteP2PChat(chat, "Alice", habilitar_autodescubrimiento=False, habilitar_push=False)
+    nodo = InfoNodo("bob", "bob", "127.0.0.1", 1, time.time())
+    cliente._nodo_descubierto(nodo)
+    print(f"Usuarios activos: {chat.obtener_usuarios_activos()}")
+    assert chat.obtener_usuarios_activos()[0] == "bob"
+    assert chat.presencia.esta_conectado("bob")
+    assert chat.obtener_estadisticas()['usuarios_activos'] == 2
+    
+    cliente._nodo_perdido(nodo)
+    assert not chat.presencia.esta_conectado("bob")
+    assert "bob" in chat.obtener_usuarios_activos()
+    print("SUCCESS: La presencia se alimenta de mensajes y de la red")
+
+
+if __name__ == "__main__":
+    test_ventana_deslizante()
+    test_usuarios_expiran()
+    test_presencia_desde_mensajes_y_red()
\ No newline at end of file
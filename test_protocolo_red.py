@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Test del protocolo de tramas con mensajes grandes y multi-trama
+"""
+
+import time
+import socket
+import asyncio
+import threading
+from chat_crdt import ChatCRDT
+from protocolo_red import (LectorTramas, ErrorProtocolo, enviar_mensaje, CABECERA,
+                           enviar_mensaje_async, recibir_mensaje_async, COMPRESIONES,
+                           FLAG_FIN, FLAG_ZLIB, DICCIONARIO_CHAT, DICCIONARIO_BINARIO,
+                           comprimir_payload)
+from codec_binario import codificar_mensaje
+
+
+def test_mensajes_enmarcados():
+    print("=== TEST PROTOCOLO DE TRAMAS ===")
+
+    emisor, receptor = socket.socketpair()
+    lector = LectorTramas(receptor, tamano_inicial=16)
+
+    # Estado grande: varias veces mayor que el antiguo buffer de 8 KB
+    chat = ChatCRDT("alice")
+    for i in range(2000):
+        chat.enviar_mensaje(f"Mensaje numero {i} con algo de texto de relleno")
+    estado = chat.obtener_estado_completo()
+
+    mensajes = [
+        {'tipo': 'sync_ack', 'exito': True},
+        {'tipo': 'sync_data', 'datos': estado},
+        {'tipo': 'sync_ack', 'exito': True},
+    ]
+
+    def enviar():
+        for mensaje in mensajes:
+            # Tramas pequeñas para forzar mensajes multi-trama
+            enviar_mensaje(emisor, mensaje, tamano_trama=64 * 1024)
+        emisor.close()
+
+    hilo = threading.Thread(target=enviar)
+    hilo.start()
+
+    recibidos = []
+    while True:
+        mensaje = lector.recibir_mensaje()
+        if mensaje is None:
+            break
+        recibidos.append(mensaje)
+
+    hilo.join()
+    receptor.close()
+
+    print(f"Mensajes recibidos: {len(recibidos)}")
+    print(f"Mensajes en estado: {len(recibidos[1]['datos']['mensajes'])}")
+    assert recibidos == mensajes
+    print("SUCCESS: Mensajes grandes llegan completos")
+
+
+def test_trama_truncada():
+    print("=== TEST TRAMA TRUNCADA ===")
+
+    emisor, receptor = socket.socketpair()
+    lector = LectorTramas(receptor)
+
+    emisor.sendall(CABECERA.pack(1, 100) + b'{"tipo"')
+    emisor.close()
+
+    try:
+        lector.recibir_mensaje()
+        assert False, "Se esperaba ErrorProtocolo"
+    except ErrorProtocolo as e:
+        print(f"[OK] Error detectado: {e}")
+    finally:
+        receptor.close()
+
+
+def test_tramas_async():
+    print("=== TEST TRAMAS CON ASYNCIO ===")
+
+    mensaje = {'tipo': 'sync_data', 'datos': {'texto': "x" * 200_000}}
+
+    async def ida_y_vuelta():
+        sock_a, sock_b = socket.socketpair()
+        _, writer = await asyncio.open_connection(sock=sock_a)
+        reader, writer_b = await asyncio.open_connection(sock=sock_b)
+
+        # Multi-trama y mensaje de una sola trama
+        await enviar_mensaje_async(writer, mensaje, tamano_trama=16 * 1024)
+        await enviar_mensaje_async(writer, {'tipo': 'sync_ack', 'exito': True})
+        writer.close()
+
+        recibidos = [await recibir_mensaje_async(reader), await recibir_mensaje_async(reader)]
+        fin = await recibir_mensaje_async(reader)
+        writer_b.close()
+        return recibidos, fin
+
+    recibidos, fin = asyncio.run(ida_y_vuelta())
+    print(f"Mensajes recibidos: {len(recibidos)}, fin={fin}")
+    assert recibidos == [mensaje, {'tipo': 'sync_ack', 'exito': True}]
+    assert fin is None
+    print("SUCCESS: Las tramas se leen igual con asyncio")
+
+
+def test_compresion():
+    print("=== TEST COMPRESIÓN DE TRAMAS ===")
+
+    chat = ChatCRDT("alice")
+    for i in range(500):
+        chat.enviar_mensaje(f"Mensaje numero {i}")
+    grande = {'tipo': 'sync_data', 'datos': chat.obtener_estado_completo()}
+    pequeno = {'tipo': 'sync_ack', 'exito': True}
+
+    for compresion in COMPRESIONES:
+        emisor, receptor = socket.socketpair()
+        lector = LectorTramas(receptor)
+        # Multi-trama comprimido y mensaje por debajo del umbral
+        enviar_mensaje(emisor, grande, tamano_trama=4096, compresion=compresion)
+        enviar_mensaje(emisor, pequeno, compresion=compresion)
+        emisor.close()
+
+        assert lector.recibir_mensaje() == grande
+        assert lector.compresion == COMPRESIONES[compresion]
+        assert lector.recibir_mensaje() == pequeno
+        assert lector.compresion == 0
+        receptor.close()
+        print(f"[OK] {compresion}")
+
+    async def ida_y_vuelta():
+        sock_a, sock_b = socket.socketpair()
+        _, writer = await asyncio.open_connection(sock=sock_a)
+        reader, writer_b = await asyncio.open_connection(sock=sock_b)
+        await enviar_mensaje_async(writer, grande, tamano_trama=4096, compresion='zlib_diccionario')
+        recibido = await recibir_mensaje_async(reader)
+        writer.close()
+        writer_b.close()
+        return recibido
+
+    assert asyncio.run(ida_y_vuelta()) == grande
+
+    # Datos corruptos con flag de compresión: error de protocolo, no excepción de zlib
+    emisor, receptor = socket.socketpair()
+    emisor.sendall(CABECERA.pack(FLAG_FIN | FLAG_ZLIB, 4) + b'nope')
+    emisor.close()
+    try:
+        LectorTramas(receptor).recibir_mensaje()
+        assert False, "Se esperaba un error"
+    except ErrorProtocolo as e:
+        print(f"[OK] Payload corrupto rechazado: {e}")
+    finally:
+        receptor.close()
+    print("SUCCESS: Los payloads comprimidos llegan completos")
+
+
+def test_diccionario_binario():
+    print("=== TEST DICCIONARIO DEL FORMATO BINARIO ===")
+
+    chat = ChatCRDT("alice")
+    for i in range(10):
+        chat.enviar_mensaje(f"Mensaje numero {i}")
+    operaciones = chat.obtener_operaciones_desde({})
+    push = {'tipo': 'sync_push', 'operaciones': operaciones[-1:], 'origen': 'alice'}
+    delta = {'tipo': 'sync_delta',
+             'datos': {'tipo_sync': 'operaciones', 'operaciones': operaciones,
+                       'vector_clock': chat.vector_clock.copy()},
+             'exito': True}
+
+    sobres = {
+        'sync_push': [b'{"tipo":"sync_push","operaciones":null,"origen":"',
+                      b'","$binario":[["operaciones"]]}'],
+        'sync_delta': [b'{"tipo":"sync_delta","datos":{"tipo_sync":"operaciones","operaciones":null,"vector_clock":{',
+                       b'}},"exito":true,"$binario":[["datos","operaciones"]]}'],
+    }
+    for mensaje in (push, delta):
+        payload = codificar_mensaje(mensaje)
+        # El diccionario cubre el sobre tal como lo escribe el codec
+        for fragmento in sobres[mensaje['tipo']]:
+            assert fragmento in payload
+            assert fragmento in DICCIONARIO_BINARIO
+
+        con_binario = comprimir_payload(payload, 'zlib_diccionario', binario=True)
+        con_json = comprimir_payload(payload, 'zlib_diccionario')
+        print(f"[OK] {mensaje['tipo']}: {len(payload)} -> {len(con_binario)} bytes "
+              f"(con el diccionario JSON: {len(con_json)})")
+        assert len(con_binario) < len(con_json)
+
+        emisor, receptor = socket.socketpair()
+        enviar_mensaje(emisor, mensaje, compresion='zlib_diccionario', umbral=0, binario=True)
+        emisor.close()
+        assert LectorTramas(receptor).recibir_mensaje() == mensaje
+        receptor.close()
+
+    assert DICCIONARIO_BINARIO != DICCIONARIO_CHAT
+    print("SUCCESS: Cada formato se comprime con su propio diccionario")
+
+
+def test_plazo_con_goteo():
+    print("=== TEST PLAZO CON UN PAR QUE GOTEA BYTES ===")
+    emisor, receptor = socket.socketpair()
+    trama = CABECERA.pack(FLAG_FIN, 100) + b'x' * 100
+    detener = threading.Event()
+
+    def gotear():
+        # Un byte cada 50 ms: ninguna lectura individual agota su timeout
+        for i in range(len(trama)):
+            if detener.wait(0.05):
+                return
+            emisor.sendall(trama[i:i + 1])
+
+    hilo = threading.Thread(target=gotear, daemon=True)
+    hilo.start()
+    inicio = time.monotonic()
+    try:
+        LectorTramas(receptor).recibir_mensaje(limite=inicio + 0.3)
+        assert False, "Se esperaba que se agotara el plazo"
+    except socket.timeout as e:
+        transcurrido = time.monotonic() - inicio
+        print(f"[OK] Plazo agotado a los {transcurrido:.2f}s: {e}")
+        assert transcurrido < 0.5
+    finally:
+        detener.set()
+        hilo.join()
+        emisor.close()
+        receptor.close()
+    print("SUCCESS: El plazo cuenta para todo el mensaje, no para cada lectura")
+
+
+if __name__ == "__main__":
+    test_mensajes_enmarcados()
+    test_trama_truncada()
+    test_tramas_async()
+    test_compresion()
+    test_diccionario_binario()
+    test_plazo_con_goteo()
\ No newline at end of file
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test del núcleo de red con asyncio
+"""
+
+import time
+import asyncio
+import threading
+from chat_crdt import ChatCRDT
+from descubrimiento_nodos import InfoNodo
+from sincronizacion_chat import ClienteP2PChatAsync, crear_cliente_p2p
+from protocolo_red import enviar_mensaje_async, recibir_mensaje_async
+from conftest import esperar
+
+
+def test_sync_asyncio():
+    print("=== TEST SINCRONIZACION CON ASYNCIO ===")
+
+    alice = crear_cliente_p2p(ChatCRDT("alice"), "Alice", puerto=12040,
+                              habilitar_autodescubrimiento=False, modo="asyncio")
+    bob = ClienteP2PChatAsync(ChatCRDT("bob"), "Bob", puerto=12041,
+                              habilitar_autodescubrimiento=False, intervalo_sincronizacion=0.2)
+    assert isinstance(alice, ClienteP2PChatAsync)
+
+    try:
+        alice.iniciar()
+        bob.iniciar()
+
+        alice.chat.enviar_mensaje("Hola Bob desde asyncio!")
+        bob.chat.enviar_mensaje("Hola Alice!")
+
+        alice._conectar_a_nodo(InfoNodo("bob", "Bob", "127.0.0.1", 12041, time.time()))
+        bob._conectar_a_nodo(InfoNodo("alice", "Alice", "127.0.0.1", 12040, time.time()))
+
+        convergido = esperar(lambda: len(alice.chat.mensajes) == 2 and len(bob.chat.mensajes) == 2)
+        print(f"1. Alice={len(alice.chat.mensajes)}, Bob={len(bob.chat.mensajes)}")
+        assert convergido
+
+        # Los cambios posteriores llegan en el bucle periódico de Bob
+        alice.chat.enviar_mensaje("Segundo mensaje")
+        assert esperar(lambda: len(bob.chat.mensajes) == 3)
+        print(f"2. Tras el bucle periódico: Bob={len(bob.chat.mensajes)}")
+        print(f"3. Estadísticas: {bob.obtener_estadisticas_conexion()}")
+        print("SUCCESS: Sincronización con asyncio funciona!")
+    finally:
+        alice.detener()
+        bob.detener()
+
+
+def test_muchos_pares():
+    print("=== TEST MUCHOS PARES EN UN SOLO HILO ===")
+
+    servidor = ClienteP2PChatAsync(ChatCRDT("servidor"), "Servidor", puerto=12042,
+                                   habilitar_autodescubrimiento=False)
+    servidor.chat.enviar_mensaje("Bienvenidos")
+    pares = 200
+
+    async def par(i: int):
+        reader, writer = await asyncio.open_connection("127.0.0.1", 12042)
+        try:
+            await enviar_mensaje_async(writer, {'tipo': 'sync_resumen', 'vector_clock': {}, 'origen': f"par{i}"})
+            return await recibir_mensaje_async(reader)
+        finally:
+            writer.close()
+
+    async def todos():
+        return await asyncio.gather(*(par(i) for i in range(pares)))
+
+    try:
+        servidor.iniciar()
+        hilos_antes = threading.active_count()
+        respuestas = asyncio.run(todos())
+        hilos_despues = threading.active_count()
+
+        print(f"1. Respuestas: {len(respuestas)}, hilos antes={hilos_antes} después={hilos_despues}")
+        assert all(r['tipo'] == 'sync_delta' and r['datos']['tipo_sync'] == 'estado' for r in respuestas)
+        assert hilos_despues <= hilos_antes
+        assert len(servidor.chat.resumenes_pares) == pares
+        print("SUCCESS: Cientos de pares atendidos sin un hilo por conexión")
+    finally:
+        servidor.detener()
+
+
+if __name__ == "__main__":
+    test_sync_asyncio()
+    test_muchos_pares()
\ No newline at end of file
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Test de la sincronización periódica en paralelo con un par lento
+"""
+
+import time
+import socket
+from chat_crdt import ChatCRDT
+from descubrimiento_nodos import InfoNodo
+from sincronizacion_chat import crear_cliente_p2p
+from protocolo_red import COMPRESIONES
+from conftest import esperar
+
+
+def probar_par_lento(modo: str, puerto_alice: int, puerto_bob: int, puerto_lento: int):
+    # Un par que acepta conexiones pero nunca responde
+    lento = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    lento.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    lento.bind(('127.0.0.1', puerto_lento))
+    lento.listen(5)
+
+    alice = crear_cliente_p2p(ChatCRDT("alice"), "Alice", puerto=puerto_alice,
+                              habilitar_autodescubrimiento=False, modo=modo)
+    alice.timeout_sincronizacion = 5.0
+    alice.intervalo_sincronizacion = 0.2
+    bob = crear_cliente_p2p(ChatCRDT("bob"), "Bob", puerto=puerto_bob,
+                            habilitar_autodescubrimiento=False, modo=modo)
+
+    try:
+        alice.iniciar()
+        bob.iniciar()
+
+        # El par lento primero: en la versión secuencial bloquearía a Bob
+        for nodo in (InfoNodo("lento", "Lento", "127.0.0.1", puerto_lento, time.time()),
+                     InfoNodo("bob", "Bob", "127.0.0.1", puerto_bob, time.time())):
+            alice.nodos_conocidos[nodo.node_id] = nodo
+
+        inicio = time.time()
+        alice.chat.enviar_mensaje("Hola Bob")
+        assert esperar(lambda: len(bob.chat.mensajes) == 1, timeout=3.0)
+        primera = time.time() - inicio
+
+        inicio = time.time()
+        alice.chat.enviar_mensaje("Otro mensaje")
+        assert esperar(lambda: len(bob.chat.mensajes) == 2, timeout=3.0)
+        segunda = time.time() - inicio
+
+        # La latencia se registra al recibir el ack, justo después de que Bob aplique
+        assert esperar(lambda: alice.obtener_latencias()['bob']['sincronizaciones'] >= 2, timeout=1.0)
+        latencias = alice.obtener_latencias()
+        print(f"[{modo}] Propagación: {primera:.2f}s y {segunda:.2f}s (plazo del par lento: 5s)")
+        print(f"[{modo}] Latencias de Bob: {latencias['bob']}")
+        assert latencias['bob']['sincronizaciones'] >= 2
+        assert latencias['bob']['fallos'] == 0
+        assert 'lento' not in latencias or latencias['lento']['sincronizaciones'] <= 1
+    finally:
+        alice.detener()
+        bob.detener()
+        lento.close()
+
+
+def test_par_lento_hilos():
+    print("=== TEST PAR LENTO (HILOS) ===")
+    probar_par_lento("hilos", 12060, 12061, 12062)
+    print("SUCCESS: Un par lento no retrasa a los demás")
+
+
+def test_par_lento_asyncio():
+    print("=== TEST PAR LENTO (ASYNCIO) ===")
+    probar_par_lento("asyncio", 12063, 12064, 12065)
+    print("SUCCESS: Un par lento no retrasa a los demás")
+
+
+def probar_push(modo: str, puerto_alice: int, puerto_bob: int):
+    # Sin bucle periódico en la práctica: solo puede llegar por push
+    alice = crear_cliente_p2p(ChatCRDT("alice"), "Alice", puerto=puerto_alice,
+                              habilitar_autodescubrimiento=False, modo=modo,
+                              intervalo_sincronizacion=60)
+    bob = crear_cliente_p2p(ChatCRDT("bob"), "Bob", puerto=puerto_bob,
+                            habilitar_autodescubrimiento=False, modo=modo,
+                            intervalo_sincronizacion=60)
+
+    pushes = []
+    procesar = bob._procesar_mensaje
+    def contar(mensaje):
+        if mensaje.get('tipo') == 'sync_push':
+            pushes.append(len(mensaje['operaciones']))
+        return procesar(mensaje)
+    bob._procesar_mensaje = contar
+
+    try:
+        alice.iniciar()
+        bob.iniciar()
+        alice._conectar_a_nodo(InfoNodo("bob", "Bob", "127.0.0.1", puerto_bob, time.time()))
+        assert esperar(lambda: "bob" in alice.conexiones_activas, timeout=3.0)
+
+        inicio = time.time()
+        ids = [alice.chat.enviar_mensaje(f"Ráfaga {i}") for i in range(20)]
+        alice.chat.editar_mensaje(ids[0], "Editado")
+        assert esperar(lambda: all(i in bob.chat.mensajes for i in ids), timeout=2.0)
+        assert esperar(lambda: bob.chat.mensajes[ids[0]].contenido == "Editado (editado)", timeout=2.0)
+        print(f"[{modo}] 21 operaciones en {time.time() - inicio:.3f}s, mensajes push: {pushes}")
+        assert sum(pushes) == 21
+        assert len(pushes) < 21
+    finally:
+        alice.detener()
+        bob.detener()
+
+
+def test_push_hilos():
+    print("=== TEST PUSH INMEDIATO (HILOS) ===")
+    probar_push("hilos", 12066, 12067)
+    print("SUCCESS: Las operaciones locales llegan sin esperar al bucle periódico")
+
+
+def test_push_asyncio():
+    print("=== TEST PUSH INMEDIATO (ASYNCIO) ===")
+    probar_push("asyncio", 12068, 12069)
+    print("SUCCESS: Las operaciones locales llegan sin esperar al bucle periódico")
+
+
+def probar_compresion(modo: str, puerto_alice: int, puerto_bob: int):
+    # Alice comprime con lzma; Bob no comprime ni usa binario al enviar, pero lee ambos
+    alice = crear_cliente_p2p(ChatCRDT("alice"), "Alice", puerto=puerto_alice,
+                              habilitar_autodescubrimiento=False, modo=modo,
+                              intervalo_sincronizacion=0.2, compresion='lzma')
+    bob = crear_cliente_p2p(ChatCRDT("bob"), "Bob", puerto=puerto_bob,
+                            habilitar_autodescubrimiento=False, modo=modo,
+                            intervalo_sincronizacion=0.2, compresion=None, formato='json')
+    try:
+        for i in range(300):
+            alice.chat.enviar_mensaje(f"Mensaje {i} de Alice")
+            bob.chat.enviar_mensaje(f"Mensaje {i} de Bob")
+        alice.iniciar()
+        bob.iniciar()
+        alice._conectar_a_nodo(InfoNodo("bob", "Bob", "127.0.0.1", puerto_bob, time.time()))
+        bob._conectar_a_nodo(InfoNodo("alice", "Alice", "127.0.0.1", puerto_alice, time.time()))
+
+        assert esperar(lambda: len(alice.chat.mensajes) == len(bob.chat.mensajes) == 600, timeout=5.0)
+        # La negociación de cada conexión termina con su primera respuesta
+        assert esperar(lambda: 'bob' in alice._capacidades_pares and 'alice' in bob._capacidades_pares,
+                       timeout=5.0)
+        print(f"[{modo}] Capacidades anunciadas por Bob: {alice._capacidades_pares.get('bob')}")
+        assert alice._capacidades_pares['bob']['compresion'] == list(COMPRESIONES)
+        assert alice._opciones_envio(alice._capacidades_pares['bob'])['compresion'] == 'lzma'
+        assert bob._opciones_envio(bob._capacidades_pares['alice'])['compresion'] is None
+        # Alice usa el formato binario; Bob lo lee pero envía JSON
+        assert alice._opciones_envio(alice._capacidades_pares['bob'])['binario'] is True
+        assert bob._opciones_envio(bob._capacidades_pares['alice'])['binario'] is False
+        # Un par que no anuncia nada recibe JSON sin comprimir
+        assert alice._opciones_envio(None) == {'compresion': None, 'umbral': alice.umbral_compresion,
+                                               'binario': False}
+    finally:
+        alice.detener()
+        bob.detener()
+
+
+def test_compresion_hilos():
+    print("=== TEST COMPRESIÓN NEGOCIADA (HILOS) ===")
+    probar_compresion("hilos", 12076, 12077)
+    print("SUCCESS: Cada lado comprime solo con lo que el otro anunció")
+
+
+def test_compresion_asyncio():
+    print("=== TEST COMPRESIÓN NEGOCIADA (ASYNCIO) ===")
+    probar_compresion("asyncio", 12078, 12079)
+    print("SUCCESS: Cada lado comprime solo con lo que el otro anunció")
+
+if __name__ == "__main__":
+    test_par_lento_hilos()
+    test_par_lento_asyncio()
+    test_push_hilos()
+    test_push_asyncio()
+    test_compresion_hilos()
+    test_compresion_asyncio()
\ No newline at end of file
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Test de sincronización por deltas (anti-entropía con vector clocks)
+"""
+
+import random
+from chat_crdt import ChatCRDT
+from crdt_base import CRDTMap
+import threading
+from sincronizacion_chat import SincronizadorChat, ClienteP2PChat
+from descubrimiento_nodos import InfoNodo
+
+
+def intercambiar(origen: SincronizadorChat, destino: SincronizadorChat) -> dict:
+    """Simula un paso del protocolo: destino envía su resumen y origen responde"""
+    datos = origen.obtener_actualizaciones_para(destino.obtener_resumen())
+    if destino.hay_actualizaciones(datos):
+        destino.aplicar_actualizaciones(datos)
+    return datos
+
+
+def test_sync_delta():
+    print("=== TEST SYNC POR DELTAS ===")
+
+    alice = SincronizadorChat(ChatCRDT("alice"))
+    bob = SincronizadorChat(ChatCRDT("bob"))
+
+    alice.chat.enviar_mensaje("Hola Bob!")
+    alice.chat.enviar_mensaje("Como estas?")
+    bob.chat.enviar_mensaje("Hola Alice!")
+
+    # Primer intercambio: el otro nodo ya tiene historia, así que viajan deltas
+    datos = intercambiar(alice, bob)
+    print(f"1. Alice -> Bob: tipo={datos['tipo_sync']}, ops={len(datos.get('operaciones', []))}")
+    assert datos['tipo_sync'] == 'operaciones'
+    assert len(datos['operaciones']) == 2
+
+    datos = intercambiar(bob, alice)
+    print(f"2. Bob -> Alice: tipo={datos['tipo_sync']}, ops={len(datos.get('operaciones', []))}")
+    assert len(datos['operaciones']) == 1
+
+    # En régimen estable no viaja nada
+    datos = intercambiar(alice, bob)
+    print(f"3. Sin cambios: ops={len(datos.get('operaciones', []))}")
+    assert not bob.hay_actualizaciones(datos)
+
+    # Solo la operación nueva viaja tras una edición
+    mensaje_id = next(iter(alice.chat.mensajes))
+    alice.chat.editar_mensaje(mensaje_id, "Hola de nuevo")
+    datos = intercambiar(alice, bob)
+    print(f"4. Tras edición: ops={len(datos['operaciones'])}")
+    assert len(datos['operaciones']) == 1
+    assert bob.chat.mensajes[mensaje_id].contenido == "Hola de nuevo (editado)"
+
+    print(f"Alice={len(alice.chat.mensajes)}, Bob={len(bob.chat.mensajes)}")
+    assert set(alice.chat.mensajes) == set(bob.chat.mensajes)
+    print("SUCCESS: Sincronizacion por deltas funciona!")
+
+
+def test_sync_delta_nodo_nuevo():
+    print("=== TEST SYNC DELTA CON NODO NUEVO ===")
+
+    alice = SincronizadorChat(ChatCRDT("alice"))
+    bob = SincronizadorChat(ChatCRDT("bob"))
+    carol = SincronizadorChat(ChatCRDT("carol"))
+
+    alice.chat.enviar_mensaje("Mensaje 1")
+    alice.chat.enviar_mensaje("Mensaje 2")
+
+    # Un nodo sin historia recibe el estado completo
+    datos = intercambiar(alice, bob)
+    print(f"1. Nodo nuevo recibe: {datos['tipo_sync']}")
+    assert datos['tipo_sync'] == 'estado'
+
+    # Bob no tiene las operaciones de Alice en su log: debe recurrir al estado
+    carol.chat.enviar_mensaje("Hola")
+    datos = intercambiar(bob, carol)
+    print(f"2. Log sin cobertura envía: {datos['tipo_sync']}")
+    assert datos['tipo_sync'] == 'estado'
+    assert len(carol.chat.mensajes) == 3
+    print("SUCCESS: Fallback a estado completo funciona!")
+
+
+def test_operaciones_duplicadas():
+    print("=== TEST DETECCION DE OPERACIONES DUPLICADAS ===")
+
+    alice = ChatCRDT("alice")
+    bob = ChatCRDT("bob")
+
+    for i in range(5):
+        alice.enviar_mensaje(f"Mensaje {i}")
+    operaciones = alice.obtener_operaciones()
+
+    # Llegan fuera de orden: el watermark solo avanza cuando no hay huecos
+    bob.sincronizar_con([operaciones[0], operaciones[3], operaciones[4]])
+    print(f"1. Watermark con huecos: {bob.obtener_resumen_operaciones()}")
+    assert bob.obtener_resumen_operaciones()['alice'] == 1
+
+    bob.sincronizar_con(operaciones[1:3])
+    print(f"2. Watermark completo: {bob.obtener_resumen_operaciones()}")
+    assert bob.obtener_resumen_operaciones()['alice'] == 5
+
+    # Reaplicar todo el lote no produce cambios
+    cambios = bob.sincronizar_con(operaciones)
+    print(f"3. Cambios al reaplicar: {cambios}")
+    assert not cambios
+    assert len(bob.operaciones_log) == 5
+    print("SUCCESS: Duplicados detectados correctamente")
+
+
+def test_compactacion_log():
+    print("=== TEST COMPACTACION DEL LOG ===")
+
+    nodos = {nombre: SincronizadorChat(ChatCRDT(nombre)) for nombre in ("alice", "bob", "carol")}
+    for i in range(10):
+        nodos["alice"].chat.enviar_mensaje(f"Alice {i}")
+    nodos["bob"].chat.enviar_mensaje("Bob")
+
+    def ronda():
+        for origen in nodos.values():
+            for destino in nodos.values():
+                if origen is not destino:
+                    intercambiar(origen, destino)
+                    origen.chat.registrar_resumen_par(destino.chat.usuario_id, destino.obtener_resumen())
+
+    alice = nodos["alice"].chat
+    # Sin el resumen de todos los pares no hay nada estable
+    print(f"1. Sin resúmenes: {alice.compactar_log(['bob', 'carol'])}")
+    assert len(alice.operaciones_log) == 10
+
+    ronda()
+    ronda()
+    metricas = alice.compactar_log(["bob", "carol"])
+    print(f"2. Tras converger: {metricas}")
+    assert metricas == {'antes': 11, 'despues': 0, 'descartadas': 11}
+    assert alice.metricas_compactacion['operaciones_descartadas'] == 11
+    assert len(alice.mensajes) == 11
+
+    # Lo nuevo sigue viajando como delta
+    alice.enviar_mensaje("Después de compactar")
+    datos = intercambiar(nodos["alice"], nodos["bob"])
+    print(f"3. Delta tras compactar: tipo={datos['tipo_sync']}, ops={len(datos['operaciones'])}")
+    assert len(datos['operaciones']) == 1
+
+    # Un nodo que no vio lo descartado recibe el estado completo
+    dave = SincronizadorChat(ChatCRDT("dave"))
+    dave.chat.enviar_mensaje("Hola")
+    datos = intercambiar(nodos["alice"], dave)
+    print(f"4. Nodo rezagado recibe: {datos['tipo_sync']}")
+    assert datos['tipo_sync'] == 'estado'
+    assert len(dave.chat.mensajes) == 13
+    print("SUCCESS: El log se compacta sin perder convergencia")
+
+
+def test_compactacion_bajo_lock():
+    print("=== TEST COMPACTACIÓN BAJO EL LOCK DEL CHAT ===")
+    chat = ChatCRDT("alice")
+    cliente = ClienteP2PChat(chat, "Alice", habilitar_autodescubrimiento=False, habilitar_push=False)
+    cliente.nodos_conocidos["bob"] = InfoNodo("bob", "Bob", "127.0.0.1", 1, 0)
+    
+    # Otro hilo no debe poder tomar el lock mientras se compacta
+    bloqueado = []
+    compactar = chat.compactar_log
+    def comprobar(nodos):
+        hilo = threading.Thread(target=lambda: bloqueado.append(not cliente._lock_chat.acquire(blocking=False)))
+        hilo.start()
+        hilo.join()
+        return compactar(nodos)
+    chat.compactar_log = comprobar
+    
+    cliente._compactar_log()
+    assert bloqueado == [True]
+    print("SUCCESS: Las lecturas del log no ven una compactación a medias")
+
+def test_push_fuera_de_orden():
+    print("=== TEST PUSH FUERA DE ORDEN CAUSAL ===")
+    alice = SincronizadorChat(ChatCRDT("alice"))
+    bob = ClienteP2PChat(ChatCRDT("bob"), "Bob", habilitar_autodescubrimiento=False, habilitar_push=False)
+    
+    primero = alice.chat.enviar_mensaje("Hola")
+    alice.chat.editar_mensaje(primero, "Hola Bob")
+    segundo = alice.chat.enviar_mensaje("Mensaje equivocado")
+    alice.chat.eliminar_mensaje(segundo)
+    enviar_1, editar_1, enviar_2, eliminar_2 = alice.chat.operaciones_log.desde({})
+    
+    def push(*operaciones):
+        respuesta = bob._procesar_mensaje({'tipo': 'sync_push', 'operaciones': list(operaciones), 'origen': 'alice'})
+        assert respuesta['exito']
+    
+    # La edición llega antes que su envío: no se aplica ni se da por aplicada
+    push(editar_1)
+    assert not bob.chat.operaciones_aplicadas.contiene(editar_1.timestamp)
+    push(enviar_1)
+    # Lo que viene detrás de un hueco tampoco, aunque el lote traiga el envío
+    push(eliminar_2, enviar_2)
+    print(f"Tras los push: resumen={bob.chat.obtener_resumen_operaciones()}, mensajes={len(bob.chat.mensajes)}")
+    assert bob.chat.obtener_resumen_operaciones() == {'alice': 1}
+    assert not bob.chat.operaciones_aplicadas.contiene(eliminar_2.timestamp)
+    
+    # La anti-entropía trae lo que faltaba y las réplicas convergen
+    datos = intercambiar(alice, bob.sincronizador)
+    assert len(datos['operaciones']) == 3
+    assert bob.chat.mensajes[primero].contenido == alice.chat.mensajes[primero].contenido
+    assert bob.chat.mensajes[segundo].contenido == "[Mensaje eliminado]"
+    assert bob.chat.ultimo_estado_hash == alice.chat.ultimo_estado_hash
+    print("SUCCESS: Un push adelantado no deja divergencias permanentes")
+
+def test_log_por_nodo():
+    print("=== TEST LOG INDEXADO POR NODO ===")
+
+    nodos = [CRDTMap(nombre) for nombre in ("alice", "bob", "carol")]
+    operaciones = []
+    for i in range(300):
+        nodo = nodos[i % 3]
+        operaciones.append(nodo.set((i, 0), f"valor {i}", nodo.node_id))
+
+    # Las operaciones remotas llegan desordenadas
+    receptor = CRDTMap("dave")
+    random.seed(7)
+    random.shuffle(operaciones)
+    receptor.merge(operaciones)
+
+    for vector_clock in ({}, {'alice': 50}, {'alice': 100, 'bob': 3, 'carol': 99}, {'alice': 100, 'bob': 100, 'carol': 100}):
+        faltantes = receptor.get_operations_since(vector_clock)
+        esperadas = {(op.timestamp.node_id, op.timestamp.counter) for op in operaciones
+                     if op.timestamp.counter > vector_clock.get(op.timestamp.node_id, 0)}
+        print(f"vector clock {vector_clock}: {len(faltantes)} faltantes")
+        assert {(op.timestamp.node_id, op.timestamp.counter) for op in faltantes} == esperadas
+        # Dentro de cada nodo, ordenadas por counter
+        for nombre in ("alice", "bob", "carol"):
+            counters = [op.timestamp.counter for op in faltantes if op.timestamp.node_id == nombre]
+            assert counters == sorted(counters)
+
+    print(f"Descartadas al compactar: {receptor.compactar({'alice': 100, 'bob': 50})}")
+    assert len(receptor.operation_log) == 150
+    assert len(receptor.get_operations_since({'bob': 50})) == 150
+    print("SUCCESS: El log por nodo devuelve solo lo que falta")
+
+if __name__ == "__main__":
+    test_sync_delta()
+    test_sync_delta_nodo_nuevo()
+    test_operaciones_duplicadas()
+    test_compactacion_log()
+    test_compactacion_bajo_lock()
+    test_push_fuera_de_orden()
+    test_log_por_nodo()
\ No newline at end of file
@@ -4,6 +4,7 @@ Test específico para sincronización por estado
 """
 
 import time
+import chat_crdt
 from chat_crdt import ChatCRDT
 
 
@@ -108,5 +109,79 @@ def test_sincronizacion_estado():
         print(f"[ERROR] Diferentes numeros de mensajes: Alice({len(chat_alice.mensajes)}) vs Bob({len(chat_bob.mensajes)})")
 
 
+def test_sincronizacion_perezosa():
+    print("=== TEST DECODIFICACIÓN PEREZOSA DEL ESTADO ===")
+    alice = ChatCRDT("alice")
+    for i in range(1000):
+        alice.enviar_mensaje(f"Mensaje {i}")
+    bob = ChatCRDT("bob")
+    bob.sincronizar_por_estado(alice.obtener_estado_completo())
+    
+    decodificados = []
+    original = chat_crdt.Mensaje.__dict__['from_dict']
+    from_dict = chat_crdt.Mensaje.from_dict
+    def contar(datos):
+        decodificados.append(datos['mensaje_id'])
+        return from_dict(datos)
+    chat_crdt.Mensaje.from_dict = contar
+    try:
+        # Mismo hash de Merkle: ni se recorren los mensajes
+        assert not bob.sincronizar_por_estado(alice.obtener_estado_completo())
+        assert decodificados == []
+        
+        # Un mensaje nuevo entre mil conocidos: solo se decodifica ese,
+        # también si el remoto no envía el hash
+        nuevo = alice.enviar_mensaje("Solo este es nuevo")
+        estado = alice.obtener_estado_completo()
+        del estado['hash_estado']
+        assert bob.sincronizar_por_estado(estado)
+        print(f"Mensajes decodificados: {len(decodificados)} de {len(estado['mensajes'])}")
+        assert decodificados == [nuevo]
+    finally:
+        chat_crdt.Mensaje.from_dict = original
+    
+    assert bob.ultimo_estado_hash == alice.ultimo_estado_hash
+    print("SUCCESS: Solo se construyen los mensajes nuevos o más recientes")
+
+
+def test_version_logica():
+    print("=== TEST LAST WRITER WINS POR VERSIÓN LÓGICA ===")
+    alice = ChatCRDT("alice")
+    bob = ChatCRDT("bob")
+    editado = alice.enviar_mensaje("Original")
+    eliminado = alice.enviar_mensaje("Se eliminará")
+    bob.sincronizar_por_estado(alice.obtener_estado_completo())
+    
+    # Edición y eliminación mantienen el timestamp original, pero la versión avanza
+    alice.editar_mensaje(editado, "Nuevo texto")
+    alice.eliminar_mensaje(eliminado)
+    assert alice.mensajes[editado].timestamp == bob.mensajes[editado].timestamp
+    assert bob.mensajes[editado].version < alice.mensajes[editado].version
+    
+    assert bob.sincronizar_por_estado(alice.obtener_estado_completo())
+    assert bob.mensajes[editado].contenido == "Nuevo texto (editado)"
+    assert bob.mensajes[eliminado].contenido == "[Mensaje eliminado]"
+    assert bob.ultimo_estado_hash == alice.ultimo_estado_hash
+    
+    # Una vez iguales, el estado de vuelta no cambia nada
+    assert not alice.sincronizar_por_estado(bob.obtener_estado_completo())
+    
+    # Una edición que llega después de la eliminación no la deshace
+    carol = ChatCRDT("carol")
+    id_carol = carol.enviar_mensaje("Borrador")
+    carol.editar_mensaje(id_carol, "Casi final")
+    carol.eliminar_mensaje(id_carol)
+    envio, edicion, eliminacion = carol.obtener_operaciones_desde({})
+    dave = ChatCRDT("dave")
+    for operacion in (envio, eliminacion, edicion):
+        dave.aplicar_operacion_remota(operacion)
+    print(f"Contenido en Dave: {dave.mensajes[id_carol].contenido}")
+    assert dave.mensajes[id_carol].contenido == "[Mensaje eliminado]"
+    assert dave.ultimo_estado_hash == carol.ultimo_estado_hash
+    print("SUCCESS: Ediciones y eliminaciones ganan por versión, no por reloj")
+
+
 if __name__ == "__main__":
-    test_sincronizacion_estado()
\ No newline at end of file
+    test_sincronizacion_estado()
+    test_sincronizacion_perezosa()
+    test_version_logica()
\ No newline at end of file
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test del renderizado incremental de mensajes (sin tkinter)
+"""
+
+from datetime import datetime, timedelta
+from chat_crdt import ChatCRDT
+from vista_mensajes import VistaMensajes, QUITAR, REEMPLAZAR, INSERTAR
+
+
+def aplicar(dibujado: list, cambios: list) -> list:
+    """Aplica los cambios sobre una lista de (id, contenido), como haría el widget"""
+    for tipo, mensaje_id, mensaje in cambios:
+        ids = [i for i, _ in dibujado]
+        if tipo == QUITAR:
+            del dibujado[ids.index(mensaje_id)]
+        elif tipo == REEMPLAZAR:
+            dibujado[ids.index(mensaje_id)] = (mensaje_id, mensaje.contenido)
+        elif tipo == INSERTAR:
+            posicion = len(dibujado) if mensaje_id is None else ids.index(mensaje_id)
+            dibujado.insert(posicion, (mensaje.mensaje_id, mensaje.contenido))
+    return dibujado
+
+
+def test_diferencias_incrementales():
+    print("=== TEST RENDERIZADO INCREMENTAL ===")
+    alice = ChatCRDT("alice")
+    vista = VistaMensajes(limite=50)
+    dibujado = []
+    
+    def refrescar():
+        cambios = vista.diferencias(alice.obtener_mensajes_canal(limite=vista.limite))
+        aplicar(dibujado, cambios)
+        esperado = [(m.mensaje_id, m.contenido) for m in alice.obtener_mensajes_canal(limite=vista.limite)]
+        assert dibujado == esperado
+        return [tipo for tipo, _, _ in cambios]
+    
+    ids = [alice.enviar_mensaje(f"Mensaje {i}") for i in range(30)]
+    assert refrescar().count(INSERTAR) == 30
+    
+    # Sin cambios no se toca nada; un mensaje nuevo es un solo insert al final
+    assert refrescar() == []
+    alice.enviar_mensaje("Uno más")
+    assert refrescar() == [INSERTAR]
+    
+    # Edición y eliminación se parchean en su sitio
+    alice.editar_mensaje(ids[3], "Cambiado")
+    alice.eliminar_mensaje(ids[7])
+    assert sorted(refrescar()) == [REEMPLAZAR, REEMPLAZAR]
+    
+    # Un mensaje antiguo que llega por sincronización se inserta en medio
+    bob = ChatCRDT("bob")
+    bob.enviar_mensaje("Llego tarde")
+    estado = bob.obtener_estado_completo()
+    for datos in estado['mensajes'].values():
+        datos['timestamp'] = (alice.mensajes[ids[10]].timestamp + timedelta(microseconds=1)).isoformat()
+    alice.sincronizar_por_estado(estado)
+    assert refrescar() == [INSERTAR]
+    
+    # Al pasar del límite, los más antiguos salen de la ventana
+    for i in range(40):
+        alice.enviar_mensaje(f"Ráfaga {i}")
+    tipos = refrescar()
+    print(f"Cambios tras la ráfaga: {tipos.count(INSERTAR)} inserciones, {tipos.count(QUITAR)} quitados")
+    assert tipos.count(INSERTAR) == 40 and tipos.count(QUITAR) == 22
+    assert len(vista) == len(dibujado) == 50
+    
+    # Tras limpiar el widget se vuelve a dibujar la ventana entera
+    vista.reiniciar()
+    dibujado.clear()
+    assert refrescar().count(INSERTAR) == 50
+    print("SUCCESS: Solo se dibujan los mensajes que cambian")
+
+
+if __name__ == "__main__":
+    test_diferencias_incrementales()
\ No newline at end of file
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Renderizado incremental de la lista de mensajes
+
+VistaMensajes recuerda qué mensajes (y en qué versión) están dibujados y,
+dada la ventana actual de los últimos N mensajes, calcula solo los cambios
+necesarios: quitar los que salieron de la ventana, reemplazar en su sitio
+los editados o eliminados e insertar los nuevos antes del mensaje que los
+sigue. No depende de tkinter: la interfaz aplica los cambios sobre su
+widget.
+"""
+
+from typing import Dict, List, Optional, Tuple, Any
+from chat_crdt import Mensaje
+
+
+LIMITE_VENTANA = 500  # Mensajes que se mantienen dibujados
+
+# Tipos de cambio
+QUITAR = "quitar"  # (QUITAR, mensaje_id, None)
+REEMPLAZAR = "reemplazar"  # (REEMPLAZAR, mensaje_id, mensaje)
+INSERTAR = "insertar"  # (INSERTAR, id del mensaje siguiente o None para el final, mensaje)
+
+
+class VistaMensajes:
+    """Estado de lo dibujado y cálculo de diferencias por id de mensaje"""
+
+    def __init__(self, limite: int = LIMITE_VENTANA):
+        self.limite = limite
+        self._mostrados: Dict[str, Tuple[Any, str]] = {}  # mensaje_id -> firma dibujada
+
+    @staticmethod
+    def _firma(mensaje: Mensaje) -> Tuple[Any, str]:
+        # El contenido distingue también los mensajes antiguos sin versión
+        return mensaje.version, mensaje.contenido
+
+    def diferencias(self, ventana: List[Mensaje]) -> List[Tuple[str, Optional[str], Optional[Mensaje]]]:
+        """
+        Cambios para pasar de lo dibujado a la ventana dada (en orden
+        cronológico), y los da por aplicados. Primero van las eliminaciones;
+        las inserciones se listan de atrás hacia delante, de modo que el
+        mensaje siguiente de cada una ya está dibujado al aplicarla.
+        """
+        en_ventana = {mensaje.mensaje_id for mensaje in ventana}
+        cambios = [(QUITAR, mensaje_id, None) for mensaje_id in self._mostrados
+                   if mensaje_id not in en_ventana]
+        for _, mensaje_id, _ in cambios:
+            del self._mostrados[mensaje_id]
+
+        siguiente = None
+        for mensaje in reversed(ventana):
+            firma = self._firma(mensaje)
+            anterior = self._mostrados.get(mensaje.mensaje_id)
+            if anterior is None:
+                cambios.append((INSERTAR, siguiente, mensaje))
+            elif anterior != firma:
+                cambios.append((REEMPLAZAR, mensaje.mensaje_id, mensaje))
+            self._mostrados[mensaje.mensaje_id] = firma
+            siguiente = mensaje.mensaje_id
+        return cambios
+
+    def reiniciar(self):
+        """Olvida lo dibujado (p. ej. al limpiar el widget)"""
+        self._mostrados.clear()
+
+    def __contains__(self, mensaje_id: str) -> bool:
+        return mensaje_id in self._mostrados
+
+    def __len__(self) -> int:
+        return len(self._mostrados)
\ No newline at end of file